@@ -0,0 +1,45 @@
+"""Parse a corpus of problem/plan pairs headlessly across all cores.
+
+    python batch_parse.py ../pddl ../plans -o data/batch_summary.csv
+    python batch_parse.py "corpus/**/*.pddl" "corpus/**/*.txt" -j 8
+"""
+import argparse
+import sys
+
+from shared.cache import CACHE_DIR
+from shared.batch import discover, iter_batch, write_summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('paths', nargs='+', help='directories or glob patterns holding problems and plans')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--in-flight', type=int, default=None, help='max queued pairs (default: 2 per worker)')
+    parser.add_argument('-o', '--output', default='data/batch_summary.csv', help='summary CSV path')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='parse cache directory')
+    parser.add_argument('--no-cache', action='store_true', help='do not read or write the parse cache')
+    args = parser.parse_args(argv)
+
+    pairs, unmatched = discover(args.paths)
+    for plan in unmatched:
+        print(f"No problem found for {plan}", file=sys.stderr)
+    if not pairs:
+        print("No problem/plan pairs found", file=sys.stderr)
+        return 1
+
+    results = []
+    failed = 0
+    cache_dir = None if args.no_cache else args.cache_dir
+    for n, result in enumerate(iter_batch(pairs, args.workers, args.in_flight, cache_dir), 1):
+        results.append(result)
+        if result['error']:
+            failed += 1
+            print(f"[{n}/{len(pairs)}] {result['plan']}: {result['error']}", file=sys.stderr)
+        else:
+            print(f"[{n}/{len(pairs)}] {result['plan']}: {result['actions']} actions "
+                  f"({result['seconds'] * 1000:.1f} ms)")
+    write_summary(results, args.output)
+    print(f"Parsed {len(results) - failed}/{len(results)} pairs -> {args.output}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,7 +7,8 @@ matplotlib.use('TkAgg')
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import numpy as np
-from .core import parse_plan_actions
+from .core import load_plan_log
+from shared.actions import Symbols
 
 class ComparatorApp(ttk.Frame):
     def __init__(self, parent):
@@ -15,6 +16,8 @@ class ComparatorApp(ttk.Frame):
         self.parent = parent
         self.plan_data = {}
         self.files = []
+        # Shared by both plans so equal actions get equal row keys in the diff
+        self.symbols = Symbols()
         self.create_widgets()
         self.style = ttk.Style()
         self.style.configure('TButton', font=('Segoe UI', 10))
@@ -105,9 +108,7 @@ class ComparatorApp(ttk.Frame):
             return
         
         try:
-            with open(path) as f: 
-                text = f.read()
-            actions, metrics = parse_plan_actions(text)
+            actions, metrics = load_plan_log(path, self.symbols)
             self.plan_data[idx] = {'actions': actions, 'metrics': metrics}
             
             label = getattr(self, f'label{idx}')
@@ -183,24 +184,25 @@ class ComparatorApp(ttk.Frame):
         self.txt1.delete('1.0', tk.END)
         self.txt2.delete('1.0', tk.END)
         
-        diff = difflib.SequenceMatcher(None, a1, a2)
+        diff = difflib.SequenceMatcher(None, a1.row_keys(), a2.row_keys())
         l1 = l2 = 0
         
         for tag, i1, i2, j1, j2 in diff.get_opcodes():
             if tag == 'equal':
                 for i in range(i1, i2):
                     l1 += 1; l2 += 1
-                    self.txt1.insert(tk.END, f"{l1:02d}: {a1[i]}\n")
-                    self.txt2.insert(tk.END, f"{l2:02d}: {a1[i]}\n")
+                    act = a1.text(i)
+                    self.txt1.insert(tk.END, f"{l1:02d}: {act}\n")
+                    self.txt2.insert(tk.END, f"{l2:02d}: {act}\n")
             else:
                 if tag in ('delete', 'replace'):
-                    for act in a1[i1:i2]:
+                    for i in range(i1, i2):
                         l1 += 1
-                        self.txt1.insert(tk.END, f"{l1:02d}: {act}\n", 'delete')
+                        self.txt1.insert(tk.END, f"{l1:02d}: {a1.text(i)}\n", 'delete')
                 if tag in ('insert', 'replace'):
-                    for act in a2[j1:j2]:
+                    for j in range(j1, j2):
                         l2 += 1
-                        self.txt2.insert(tk.END, f"{l2:02d}: {act}\n", 'insert')
+                        self.txt2.insert(tk.END, f"{l2:02d}: {a2.text(j)}\n", 'insert')
         
         self.txt1.config(state='disabled')
         self.txt2.config(state='disabled')
\ No newline at end of file
@@ -0,0 +1,56 @@
+"""Render plan animations headlessly across all cores.
+
+    python export_plans.py ../pddl ../plans -o data/exports
+    python export_plans.py ../pddl/problems/problem-classic.pddl plan_classic.txt --format png -j 8
+"""
+import argparse
+import sys
+
+from shared.cache import CACHE_DIR
+from shared.batch import discover
+from visualizer.core import SUBSTEPS
+from visualizer.export import FORMATS, DPI, iter_export
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('paths', nargs='+', help='directories or glob patterns holding problems and plans')
+    parser.add_argument('-o', '--output', default='data/exports', help='output directory')
+    parser.add_argument('-f', '--format', choices=FORMATS, default='gif',
+                        help='gif (Pillow), png (numbered frames) or mp4 (needs ffmpeg)')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--substeps', type=int, default=SUBSTEPS, help='frames per plan step')
+    parser.add_argument('--fps', type=float, default=None, help='frame rate (default: playback speed)')
+    parser.add_argument('--dpi', type=int, default=DPI, help='output resolution')
+    parser.add_argument('--parts', type=int, default=None,
+                        help='worker jobs each plan is split into (default: one per worker)')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='parse cache directory')
+    parser.add_argument('--no-cache', action='store_true', help='do not read or write the parse cache')
+    args = parser.parse_args(argv)
+
+    pairs, unmatched = discover(args.paths)
+    for plan in unmatched:
+        print(f"No problem found for {plan}", file=sys.stderr)
+    if not pairs:
+        print("No problem/plan pairs found", file=sys.stderr)
+        return 1
+
+    failed = 0
+    cache_dir = None if args.no_cache else args.cache_dir
+    try:
+        results = iter_export(pairs, args.output, args.format, args.workers, args.substeps, args.fps,
+                              args.parts, cache_dir, args.dpi)
+        for n, result in enumerate(results, 1):
+            if result['error']:
+                failed += 1
+                print(f"[{n}/{len(pairs)}] {result['plan']}: {result['error']}", file=sys.stderr)
+            else:
+                print(f"[{n}/{len(pairs)}] {result['plan']}: {result['frames']} frames -> "
+                      f"{result['output']} ({result['seconds']:.1f} s)")
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"Exported {len(pairs) - failed}/{len(pairs)} plans -> {args.output}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+from array import array
+
+from shared.parsing import parse_loc
+
+OP_UNKNOWN = 0
+OP_MOVE_CHARACTER = 1
+OP_MOVE_BALL = 2
+OP_GOAL = 3
+
+OPCODES = {
+    'move_character': OP_MOVE_CHARACTER,
+    'move': OP_MOVE_CHARACTER,
+    'move_to': OP_MOVE_CHARACTER,
+    'move_char': OP_MOVE_CHARACTER,
+    'move_ball': OP_MOVE_BALL,
+    'push': OP_MOVE_BALL,
+    'roll': OP_MOVE_BALL,
+    'roll_ball': OP_MOVE_BALL,
+    'goal': OP_GOAL,
+}
+
+NO_ID = -1
+
+class Symbols:
+    """Interning table mapping action tokens to small ints.
+
+    Two tables built on the same ``Symbols`` give equal row keys for equal
+    actions, which is what the plan comparator diffs on.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+
+    def intern(self, name):
+        i = self.ids.get(name)
+        if i is None:
+            i = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return i
+
+class ActionTable:
+    """A plan parsed once into parallel typed columns.
+
+    Row ``i`` holds the opcode, the interned ball id and up to three location
+    indices in the order the action lists them (``move_character from to``,
+    ``move_ball ball ppos from to``, ``goal b0 b1 b2 loc``). Unused or
+    unparsable slots hold ``NO_ID``. Coordinates are in ``locations`` and
+    ball names in ``balls``; the original action text is rebuilt on demand
+    from the interned tokens.
+    """
+
+    def __init__(self, actions=(), symbols=None):
+        self.symbols = symbols if symbols is not None else Symbols()
+        self.opcode = array('b')
+        self.verb = array('i')
+        self.ball = array('i')
+        self.loc_a = array('i')
+        self.loc_b = array('i')
+        self.loc_c = array('i')
+        self.args = array('i')
+        self.arg_start = array('i', [0])
+        self.balls = []
+        self.ball_ids = {}
+        self.locations = []
+        self.location_ids = {}
+        for action in actions:
+            self.append(action)
+
+    def __len__(self):
+        return len(self.opcode)
+
+    def __getitem__(self, i):
+        return self.text(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.text(i)
+
+    def _ball_id(self, tokens, k):
+        if k >= len(tokens):
+            return NO_ID
+        name = tokens[k]
+        i = self.ball_ids.get(name)
+        if i is None:
+            i = self.ball_ids[name] = len(self.balls)
+            self.balls.append(name)
+        return i
+
+    def _loc_id(self, tokens, k):
+        if k >= len(tokens):
+            return NO_ID
+        name = tokens[k]
+        i = self.location_ids.get(name)
+        if i is None:
+            try:
+                coord = parse_loc(name)
+            except ValueError:
+                i = NO_ID
+            else:
+                i = len(self.locations)
+                self.locations.append(coord)
+            self.location_ids[name] = i
+        return i
+
+    def append(self, action):
+        """Add one action string and return its row index."""
+        tokens = action.split()
+        if not tokens:
+            raise ValueError("Empty action")
+        intern = self.symbols.intern
+        self.verb.append(intern(tokens[0]))
+        for tok in tokens[1:]:
+            self.args.append(intern(tok))
+        self.arg_start.append(len(self.args))
+
+        op = OPCODES.get(tokens[0], OP_UNKNOWN)
+        ball = loc_a = loc_b = loc_c = NO_ID
+        if op == OP_MOVE_CHARACTER:
+            loc_a = self._loc_id(tokens, 1)
+            loc_b = self._loc_id(tokens, 2)
+        elif op == OP_MOVE_BALL:
+            ball = self._ball_id(tokens, 1)
+            loc_a = self._loc_id(tokens, 2)
+            loc_b = self._loc_id(tokens, 3)
+            loc_c = self._loc_id(tokens, 4)
+        elif op == OP_GOAL:
+            ball = self._ball_id(tokens, 1)
+            loc_a = self._loc_id(tokens, 4)
+        self.opcode.append(op)
+        self.ball.append(ball)
+        self.loc_a.append(loc_a)
+        self.loc_b.append(loc_b)
+        self.loc_c.append(loc_c)
+        return len(self.opcode) - 1
+
+    def arity(self, i):
+        return self.arg_start[i + 1] - self.arg_start[i]
+
+    def row_key(self, i):
+        """Hashable identity of row ``i`` (ints only, comparable across shared Symbols)."""
+        return (self.verb[i],) + tuple(self.args[self.arg_start[i]:self.arg_start[i + 1]])
+
+    def row_keys(self):
+        return [self.row_key(i) for i in range(len(self))]
+
+    def text(self, i):
+        names = self.symbols.names
+        parts = [names[self.verb[i]]]
+        parts.extend(names[s] for s in self.args[self.arg_start[i]:self.arg_start[i + 1]])
+        return ' '.join(parts)
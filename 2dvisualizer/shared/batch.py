@@ -0,0 +1,156 @@
+import csv
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from shared.cache import ParseCache, CACHE_DIR
+from shared.planlog import METRIC_PATTERNS, mapped, find_plan_block
+
+PROBLEM_SUFFIXES = ('.pddl',)
+PLAN_SUFFIXES = ('.txt', '.plan')
+HEAD_BYTES = 4096
+# Characters that end a problem key inside a longer plan key.
+KEY_SEPARATORS = '_-.'
+
+SUMMARY_FIELDS = ['problem', 'plan', 'locations', 'balls', 'actions', 'seconds', 'error'] + list(METRIC_PATTERNS)
+
+def expand(patterns, suffixes):
+    """Resolve directories (searched recursively) and glob patterns to sorted files."""
+    found = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, names in os.walk(pattern):
+                found.update(os.path.join(root, n) for n in names if n.endswith(suffixes))
+        else:
+            found.update(p for p in glob.glob(pattern, recursive=True)
+                         if os.path.isfile(p) and p.endswith(suffixes))
+    return sorted(found)
+
+def is_problem_file(path):
+    """True for PDDL problem files; domains are skipped."""
+    with open(path, 'rb') as f:
+        head = f.read(HEAD_BYTES).lower()
+    return b'(problem' in head
+
+def pairing_key(path):
+    """``problem-classic.pddl`` and ``plan_classic_lama.txt`` -> ``classic``/``classic_lama``."""
+    stem = os.path.splitext(os.path.basename(path))[0].lower()
+    for prefix in ('problem', 'plan'):
+        if stem.startswith(prefix):
+            stem = stem[len(prefix):].lstrip('-_.')
+            break
+    return stem
+
+def key_matches(key, problem_key):
+    """True if ``key`` is ``problem_key`` or extends it after a separator."""
+    if not key.startswith(problem_key):
+        return False
+    return key == problem_key or (bool(problem_key) and key[len(problem_key)] in KEY_SEPARATORS)
+
+def pair_corpus(problems, plans):
+    """Pair every plan with the problem whose key is the longest prefix of its own.
+
+    A key only prefixes another up to a separator, so ``classic`` matches
+    ``classic_lama`` but neither ``classical`` nor ``classic2``. In a corpus
+    with a single problem, plans that match no key are paired with it too,
+    unless their key extends the problem's without a separator, which names
+    a different problem. Plans with no matching problem are returned
+    separately.
+    """
+    keyed = sorted(((pairing_key(p), p) for p in problems), key=lambda kp: len(kp[0]), reverse=True)
+    pairs, unmatched = [], []
+    for plan in plans:
+        key = pairing_key(plan)
+        match = next((p for k, p in keyed if key_matches(key, k)), None)
+        if match is None and len(keyed) == 1 and not (keyed[0][0] and key.startswith(keyed[0][0])):
+            match = keyed[0][1]
+        if match is None:
+            unmatched.append(plan)
+        else:
+            pairs.append((match, plan))
+    return pairs, unmatched
+
+def discover(patterns):
+    """Find and pair the problems and plans under ``patterns``."""
+    problems = [p for p in expand(patterns, PROBLEM_SUFFIXES) if is_problem_file(p)]
+    plans = expand(patterns, PLAN_SUFFIXES)
+    return pair_corpus(problems, plans)
+
+def parse_pair(problem_path, plan_path, cache_dir=CACHE_DIR, keep=False):
+    """Parse one problem/plan pair; runs in a worker process.
+
+    Results go through the same content-addressed cache as the GUI, so a
+    batch run also warms it. Errors are reported in the result, never raised.
+    """
+    # Imported here so the parent process never pays for the visualizer import.
+    from visualizer.core import parse_problem, parse_plan_table
+    from comparator.core import load_plan_log
+
+    start = time.perf_counter()
+    result = {'problem': problem_path, 'plan': plan_path, 'error': ''}
+    try:
+        if cache_dir:
+            load = ParseCache(cache_dir).load
+        else:
+            load = lambda kind, path, parse: parse(path)
+        problem = load('problem', problem_path, parse_problem)
+        with mapped(plan_path) as buf:
+            is_log = find_plan_block(buf) is not None
+        if is_log:
+            # Only the ``found plan:`` block of a planner log holds actions.
+            table, metrics = load('plan_log', plan_path, load_plan_log)
+            result.update(metrics)
+        else:
+            table = load('actions', plan_path, parse_plan_table)
+        result['locations'] = len(problem['valid_locations'])
+        result['balls'] = len(problem['balls'])
+        result['actions'] = len(table)
+        if keep:
+            result['parsed_problem'] = problem
+            result['parsed_plan'] = table
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+def iter_batch(pairs, workers=None, max_in_flight=None, cache_dir=CACHE_DIR, keep=False):
+    """Yield ``parse_pair`` results in completion order.
+
+    At most ``max_in_flight`` pairs (default twice the worker count) are
+    queued at once, so memory stays flat however large the corpus is.
+    ``workers=1`` parses in-process.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for problem, plan in pairs:
+            yield parse_pair(problem, plan, cache_dir, keep)
+        return
+    max_in_flight = max(max_in_flight or 2 * workers, 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for problem, plan in pairs:
+            pending.add(pool.submit(parse_pair, problem, plan, cache_dir, keep))
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+def parse_batch(patterns, **kwargs):
+    pairs, _ = discover(patterns)
+    return list(iter_batch(pairs, **kwargs))
+
+def write_summary(results, path):
+    """Write one CSV row per result (parsed objects are left out)."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for result in results:
+            writer.writerow(result)
@@ -0,0 +1,93 @@
+import hashlib
+import os
+import pickle
+import zlib
+
+CACHE_DIR = os.path.join('data', 'parse_cache')
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Bump whenever the structure returned by a cached parser changes, so stale
+# sidecars from an older version are simply never looked up again.
+CACHE_FORMAT = 3
+
+def file_digest(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+class ParseCache:
+    """Content-addressed store of parsed files, evicted least-recently-used.
+
+    Entries are zlib-compressed pickles named after the SHA-256 of the source
+    file, so renaming or copying a file still hits and editing it misses.
+    Recency is tracked through the sidecar's mtime, which is refreshed on
+    every hit.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def entry_path(self, kind, digest):
+        return os.path.join(self.directory, f"{kind}-{digest}.v{CACHE_FORMAT}.bin")
+
+    def get(self, kind, digest):
+        path = self.entry_path(kind, digest)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.loads(zlib.decompress(f.read()))
+            os.utime(path)
+            return value
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # A truncated or unreadable sidecar is just a miss.
+            self.discard(path)
+            return None
+
+    def put(self, kind, digest, value):
+        path = self.entry_path(kind, digest)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            data = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 1)
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            self.discard(tmp_path)
+            return
+        self.evict()
+
+    def load(self, kind, path, parse):
+        """Return ``parse(path)``, reusing a previous result for identical content."""
+        digest = file_digest(path)
+        value = self.get(kind, digest)
+        if value is None:
+            value = parse(path)
+            self.put(kind, digest, value)
+        return value
+
+    def evict(self):
+        try:
+            entries = []
+            for name in os.listdir(self.directory):
+                if name.endswith('.bin'):
+                    st = os.stat(os.path.join(self.directory, name))
+                    entries.append((st.st_mtime, st.st_size, name))
+        except OSError:
+            return
+        total = sum(size for _, size, _ in entries)
+        entries.sort()
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            self.discard(os.path.join(self.directory, name))
+            total -= size
+
+    def discard(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
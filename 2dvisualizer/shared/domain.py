@@ -0,0 +1,425 @@
+import glob
+import os
+from operator import itemgetter
+
+from shared.parsing import BALL_SIZE_PREDICATES, read_sexpr, typed_names, parse_loc
+from shared.world import ABSENT, POSITION, SIZE, SNOW, CHARACTER
+
+COMPARISONS = {
+    '=': lambda a, b: a == b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+}
+ARITHMETIC = {
+    '+': lambda a, b: a + b,
+    '-': lambda a, b: a - b,
+    '*': lambda a, b: a * b,
+    '/': lambda a, b: a / b,
+}
+NUMERIC_EFFECTS = {
+    'assign': lambda old, value: value,
+    'increase': lambda old, value: old + value,
+    'decrease': lambda old, value: old - value,
+    'scale-up': lambda old, value: old * value,
+    'scale-down': lambda old, value: old / value,
+}
+
+class ActionSchema:
+    """One ``(:action ...)`` of a domain, still as s-expressions."""
+
+    def __init__(self, name, parameters, precondition, effect):
+        self.name = name
+        self.parameters = parameters
+        self.precondition = precondition
+        self.effect = effect
+
+class Domain:
+    """Parsed PDDL domain; ``compile(problem)`` turns it into transitions."""
+
+    def __init__(self, name, actions):
+        self.name = name
+        self.actions = actions
+
+    def compile(self, problem):
+        return {name: CompiledAction(schema, problem) for name, schema in self.actions.items()}
+
+def parse_domain_text(content):
+    define = next((e for e in read_sexpr(content) if isinstance(e, list) and e and e[0] == 'define'), None)
+    if define is None:
+        raise ValueError("No (define ...) block found")
+    name = 'unknown'
+    actions = {}
+    for item in define[1:]:
+        if not (isinstance(item, list) and item):
+            continue
+        if item[0] == 'domain' and len(item) > 1:
+            name = item[1]
+        elif item[0] == ':action':
+            if len(item) < 2 or not isinstance(item[1], str):
+                raise ValueError("Action without a name")
+            fields = dict(zip(item[2::2], item[3::2]))
+            actions[item[1]] = ActionSchema(item[1], list(typed_names(fields.get(':parameters', []))),
+                                            fields.get(':precondition', []), fields.get(':effect', []))
+    return Domain(name, actions)
+
+def parse_domain(path):
+    try:
+        with open(path, 'r') as f:
+            return parse_domain_text(f.read())
+    except Exception as e:
+        raise Exception(f"Error parsing domain file '{path}': {str(e)}")
+
+def find_domain(problem_path):
+    """Domain file for ``problem_path``, or None.
+
+    Looks next to the problem and in a sibling ``domains`` directory;
+    ``problem-numeric.pddl`` pairs with ``domain-numeric.pddl``, and a lone
+    domain file pairs with every problem.
+    """
+    folder = os.path.dirname(os.path.abspath(problem_path))
+    candidates = []
+    for directory in (folder, os.path.join(os.path.dirname(folder), 'domains')):
+        candidates.extend(sorted(glob.glob(os.path.join(directory, 'domain*.pddl'))))
+    if not candidates:
+        return None
+    key = os.path.splitext(os.path.basename(problem_path))[0].lower()
+    key = key[len('problem'):].lstrip('-_.') if key.startswith('problem') else key
+    for path in candidates:
+        stem = os.path.splitext(os.path.basename(path))[0].lower()
+        if stem[len('domain'):].lstrip('-_.') == key:
+            return path
+    return candidates[0] if len(candidates) == 1 else None
+
+class CompiledAction:
+    """Transition function of one action, specialized for a problem.
+
+    Preconditions and effects are compiled once into nested closures over an
+    argument environment (a list of bound values: location coordinates, ball
+    names, direction names) and a ``StateView`` of the current state.
+    ``applicable(view, env)`` tests the precondition; ``apply(view, env)``
+    evaluates every effect against that state and returns ``(changes, goal)``
+    where ``changes`` are the ``(target, key, value)`` updates (``key`` a ball
+    name or coordinate) to make, deletes applied before adds as in PDDL, and
+    ``goal`` whether the action asserts ``(goal)``. Predicates map onto ``WorldState``:
+    ``character_at``, ``ball_at``, ``snow``/``location_type`` and the
+    ``ball_size`` fluent or ``ball_size_*`` predicates; ``next`` reads the
+    problem's grid graph and ``occupancy`` is derived from ball positions.
+    """
+
+    def __init__(self, schema, problem):
+        self.name = schema.name
+        self.param_types = [t for _, t in schema.parameters]
+        self.graph = problem['graph']
+        self.locations = list(problem['grid'].iter_valid())
+        self._coords = {}
+        self.slots = {}
+        for var, _ in schema.parameters:
+            self._slot(var)
+        self.precondition = self._condition(schema.precondition)
+        self.effects = []
+        self._effect(schema.effect, None)
+        self.env_size = len(self.slots)
+
+    def bind(self, args, view):
+        """Argument environment for ``args`` (names), or None if they do not fit."""
+        if len(args) != len(self.param_types):
+            return None
+        env = [None] * self.env_size
+        coords = self._coords
+        for i, (arg, type_name) in enumerate(zip(args, self.param_types)):
+            if type_name == 'location':
+                coord = coords.get(arg)
+                if coord is None:
+                    try:
+                        coord = coords[arg] = parse_loc(arg)
+                    except ValueError:
+                        return None
+                env[i] = coord
+            elif type_name == 'ball':
+                if arg not in view.names:
+                    return None
+                env[i] = arg
+            else:
+                env[i] = arg
+        return env
+
+    def applicable(self, view, env):
+        return self.precondition(view, env)
+
+    def apply(self, view, env):
+        dels, adds, numeric = [], [], []
+        goal = False
+        for condition, kind, fn, values in self.effects:
+            if condition is not None and not condition(view, env):
+                continue
+            if kind == 'set':
+                numeric.append((fn, values[0](view, env)))
+                continue
+            args = [v(env) for v in values]
+            if kind == 'add':
+                if fn == 'goal':
+                    goal = True
+                adds.append((fn, args))
+            else:
+                dels.append((fn, args))
+        changes = {}
+        for fn, args in dels:
+            self._delete(view, changes, fn, args)
+        for fn, args in adds:
+            self._add(changes, fn, args)
+        for fn, (key, value) in numeric:
+            if fn == 'ball_size':
+                changes[SIZE, key] = int(value)
+            elif fn == 'location_type':
+                changes[SNOW, key] = value == 1
+        return [(target, key, value) for (target, key), value in changes.items()], goal
+
+    # -- state mapping ----------------------------------------------------
+
+    @staticmethod
+    def _delete(view, changes, fn, args):
+        if fn == 'character_at':
+            if view.character == args[0]:
+                changes[CHARACTER, None] = None
+        elif fn == 'ball_at':
+            changes[POSITION, args[0]] = None
+        elif fn == 'snow':
+            changes[SNOW, args[0]] = False
+
+    @staticmethod
+    def _add(changes, fn, args):
+        if fn == 'character_at':
+            changes[CHARACTER, None] = args[0]
+        elif fn == 'ball_at':
+            changes[POSITION, args[0]] = args[1]
+        elif fn == 'snow':
+            changes[SNOW, args[0]] = True
+        elif fn in BALL_SIZE_PREDICATES:
+            changes[SIZE, args[0]] = BALL_SIZE_PREDICATES[fn]
+
+    def _predicate(self, name, terms):
+        graph = self.graph
+        if name == 'character_at':
+            l, = terms
+            return lambda s, env: s.character == l(env)
+        if name == 'ball_at':
+            b, l = terms
+            return lambda s, env: s.positions.get(b(env)) == l(env)
+        if name == 'snow':
+            l, = terms
+            return lambda s, env: s.has_snow(*l(env))
+        if name == 'occupancy':
+            l, = terms
+            return lambda s, env: l(env) in s.positions.values()
+        if name == 'next':
+            a, b, d = terms
+            return lambda s, env: graph.step(a(env), d(env)) == b(env)
+        if name in BALL_SIZE_PREDICATES:
+            b, = terms
+            size = BALL_SIZE_PREDICATES[name]
+            return lambda s, env: s.sizes.get(b(env)) == size
+        # Flags such as (goal) are never read back from the world.
+        return lambda s, env: False
+
+    def _function(self, name, terms):
+        if name == 'ball_size':
+            b, = terms
+            return lambda s, env: s.sizes.get(b(env))
+        if name == 'location_type':
+            l, = terms
+            return lambda s, env: 1 if s.has_snow(*l(env)) else 0
+        return lambda s, env: 0
+
+    # -- compilation ------------------------------------------------------
+
+    def _slot(self, var):
+        slot = self.slots.get(var)
+        if slot is None:
+            slot = self.slots[var] = len(self.slots)
+        return slot
+
+    def _term(self, term):
+        """Accessor ``f(env)`` for a variable or constant argument."""
+        if isinstance(term, str) and term.startswith('?'):
+            if term not in self.slots:
+                raise ValueError(f"Unbound variable {term} in action {self.name}")
+            return itemgetter(self.slots[term])
+        if isinstance(term, str) and term.startswith('loc_'):
+            term = parse_loc(term)
+        return lambda env: term
+
+    def _number(self, expr):
+        if isinstance(expr, list):
+            if not expr:
+                raise ValueError(f"Empty numeric expression in action {self.name}")
+            head = expr[0]
+            if head in ARITHMETIC and len(expr) == 3:
+                op, a, b = ARITHMETIC[head], self._number(expr[1]), self._number(expr[2])
+                return lambda s, env: _numeric(op, a(s, env), b(s, env))
+            return self._function(head, [self._term(t) for t in expr[1:]])
+        value = float(expr)
+        value = int(value) if value.is_integer() else value
+        return lambda s, env: value
+
+    def _objects(self, type_name):
+        """Object domain of a quantified variable: ``f(state)`` -> iterable."""
+        if type_name == 'ball':
+            return lambda s: s.names
+        locations = self.locations if type_name == 'location' else self.graph.directions if type_name == 'direction' else ()
+        return lambda s: locations
+
+    def _quantifier(self, expr, universal):
+        bound = [(self._slot(var), self._objects(type_name)) for var, type_name in typed_names(expr[1])]
+        body = self._condition(expr[2])
+        # Nest one loop per variable, innermost first.
+        for slot, objects in reversed(bound):
+            body = _forall(slot, objects, body) if universal else _exists(slot, objects, body)
+        return body
+
+    def _condition(self, expr):
+        if not expr:
+            return lambda s, env: True
+        head = expr[0]
+        if head == 'and':
+            return _all([self._condition(e) for e in expr[1:]])
+        if head == 'or':
+            return _any([self._condition(e) for e in expr[1:]])
+        if head == 'not':
+            inner = self._condition(expr[1])
+            return lambda s, env: not inner(s, env)
+        if head == 'imply':
+            a, b = self._condition(expr[1]), self._condition(expr[2])
+            return lambda s, env: not a(s, env) or b(s, env)
+        if head in ('forall', 'exists'):
+            return self._quantifier(expr, head == 'forall')
+        if head in COMPARISONS:
+            if head != '=' or any(_is_numeric(e) for e in expr[1:]):
+                op, a, b = COMPARISONS[head], self._number(expr[1]), self._number(expr[2])
+                return lambda s, env: _numeric(op, a(s, env), b(s, env)) is True
+            a, b = self._term(expr[1]), self._term(expr[2])
+            return lambda s, env: a(env) == b(env)
+        return self._predicate(head, [self._term(t) for t in expr[1:]])
+
+    def _effect(self, expr, condition):
+        if not expr:
+            return
+        head = expr[0]
+        if head == 'and':
+            for e in expr[1:]:
+                self._effect(e, condition)
+        elif head == 'when':
+            when = self._condition(expr[1])
+            if condition is not None:
+                when = _all([condition, when])
+            self._effect(expr[2], when)
+        elif head == 'forall':
+            raise ValueError(f"Universal effects are not supported (action {self.name})")
+        elif head == 'not':
+            literal = expr[1]
+            self.effects.append((condition, 'del', literal[0], [self._term(t) for t in literal[1:]]))
+        elif head in NUMERIC_EFFECTS:
+            fluent = expr[1]
+            if fluent[0] in ('ball_size', 'location_type'):
+                key = self._term(fluent[1])
+                old = self._function(fluent[0], [key])
+                value = self._number(expr[2])
+                update = NUMERIC_EFFECTS[head]
+                # Values are computed against the state before the action.
+                pair = lambda s, env: (key(env), update(old(s, env), value(s, env)))
+                self.effects.append((condition, 'set', fluent[0], [pair]))
+        else:
+            self.effects.append((condition, 'add', head, [self._term(t) for t in expr[1:]]))
+
+class StateView:
+    """The state compiled actions read: a ``WorldState`` with balls keyed by name.
+
+    Ball positions and sizes are mirrored in plain dicts, so quantified
+    preconditions never index numpy arrays. Snow is read from the world
+    itself. Keep the view current by passing every change to ``update``.
+    """
+
+    __slots__ = ('character', 'positions', 'sizes', 'names', 'has_snow')
+
+    def __init__(self, world):
+        self.character = world.character
+        self.names = world.names
+        self.has_snow = world.has_snow
+        positions, sizes = {}, {}
+        pos, size = world.ball_pos.tolist(), world.ball_size.tolist()
+        for i, name in enumerate(world.names[:len(pos)]):
+            r, c = pos[i]
+            if r != ABSENT:
+                positions[name] = (r, c)
+            if size[i] != ABSENT:
+                sizes[name] = size[i]
+        self.positions = positions
+        self.sizes = sizes
+
+    def update(self, target, key, value):
+        """Mirror one ``apply`` change (``key`` a ball name; snow is not mirrored)."""
+        if target == CHARACTER:
+            self.character = value
+        elif target == POSITION:
+            if value is None:
+                self.positions.pop(key, None)
+            else:
+                self.positions[key] = value
+        elif target == SIZE:
+            if value is None:
+                self.sizes.pop(key, None)
+            else:
+                self.sizes[key] = value
+
+def _all(parts):
+    if len(parts) == 1:
+        return parts[0]
+    def conjunction(s, env):
+        for part in parts:
+            if not part(s, env):
+                return False
+        return True
+    return conjunction
+
+def _any(parts):
+    if len(parts) == 1:
+        return parts[0]
+    def disjunction(s, env):
+        for part in parts:
+            if part(s, env):
+                return True
+        return False
+    return disjunction
+
+def _forall(slot, objects, body):
+    def forall(s, env):
+        for value in objects(s):
+            env[slot] = value
+            if not body(s, env):
+                return False
+        return True
+    return forall
+
+def _exists(slot, objects, body):
+    def exists(s, env):
+        for value in objects(s):
+            env[slot] = value
+            if body(s, env):
+                return True
+        return False
+    return exists
+
+def _is_numeric(expr):
+    if isinstance(expr, list):
+        return True
+    try:
+        float(expr)
+    except ValueError:
+        return False
+    return True
+
+def _numeric(op, a, b):
+    if a is None or b is None:
+        return None
+    return op(a, b)
@@ -0,0 +1,121 @@
+from array import array
+from collections import deque
+
+DIRECTIONS = ('up', 'down', 'left', 'right')
+
+class GridGraph:
+    """Location adjacency from ``(next ?from ?to ?dir)`` facts in CSR form.
+
+    Locations are numbered in first-seen order (``coords[i]`` is the
+    coordinate of location ``i``). The outgoing edges of ``i`` are
+    ``neighbors[offsets[i]:offsets[i + 1]]`` with matching ``dirs`` codes
+    into ``directions``. Edges are directed, so one-way moves and holes are
+    represented exactly.
+    """
+
+    def __init__(self):
+        self.coords = []
+        self.index = {}
+        self.directions = list(DIRECTIONS)
+        self.direction_ids = {d: i for i, d in enumerate(DIRECTIONS)}
+        self.offsets = array('i', [0])
+        self.neighbors = array('i')
+        self.dirs = array('b')
+        self._src = array('i')
+
+    def add_location(self, coord):
+        i = self.index.get(coord)
+        if i is None:
+            i = self.index[coord] = len(self.coords)
+            self.coords.append(coord)
+        return i
+
+    def add_edge(self, src, dst, direction):
+        """Queue an edge between two coordinates; call ``freeze`` once all are added."""
+        d = self.direction_ids.get(direction)
+        if d is None:
+            d = self.direction_ids[direction] = len(self.directions)
+            self.directions.append(direction)
+        self._src.append(self.add_location(src))
+        self.neighbors.append(self.add_location(dst))
+        self.dirs.append(d)
+
+    def freeze(self):
+        """Sort the queued edges by source (counting sort) into CSR arrays."""
+        n = len(self.coords)
+        src, dst, dirs = self._src, self.neighbors, self.dirs
+        offsets = array('i', bytes(4 * (n + 1)))
+        for s in src:
+            offsets[s + 1] += 1
+        for i in range(n):
+            offsets[i + 1] += offsets[i]
+        fill = offsets[:-1]
+        neighbors = array('i', bytes(4 * len(src)))
+        out_dirs = array('b', bytes(len(src)))
+        for k, s in enumerate(src):
+            pos = fill[s]
+            fill[s] = pos + 1
+            neighbors[pos] = dst[k]
+            out_dirs[pos] = dirs[k]
+        self.offsets, self.neighbors, self.dirs = offsets, neighbors, out_dirs
+        self._src = array('i')
+        return self
+
+    def __len__(self):
+        return len(self.coords)
+
+    def __eq__(self, other):
+        if not isinstance(other, GridGraph):
+            return NotImplemented
+        return (self.coords == other.coords and self.directions == other.directions
+                and self.offsets == other.offsets and self.neighbors == other.neighbors
+                and self.dirs == other.dirs)
+
+    @property
+    def edge_count(self):
+        return len(self.neighbors)
+
+    def neighbors_of(self, coord):
+        """Yield ``(coord, direction)`` for each location reachable in one move."""
+        i = self.index.get(coord)
+        if i is None:
+            return
+        coords, directions, dirs = self.coords, self.directions, self.dirs
+        for k in range(self.offsets[i], self.offsets[i + 1]):
+            yield coords[self.neighbors[k]], directions[dirs[k]]
+
+    def step(self, coord, direction):
+        """Return the location one move from ``coord`` in ``direction``, or None."""
+        i = self.index.get(coord)
+        d = self.direction_ids.get(direction)
+        if i is None or d is None:
+            return None
+        for k in range(self.offsets[i], self.offsets[i + 1]):
+            if self.dirs[k] == d:
+                return self.coords[self.neighbors[k]]
+        return None
+
+    def has_edge(self, src, dst):
+        i = self.index.get(src)
+        j = self.index.get(dst)
+        if i is None or j is None:
+            return False
+        return j in self.neighbors[self.offsets[i]:self.offsets[i + 1]]
+
+    def reachable(self, start):
+        """Return the set of coordinates reachable from ``start``."""
+        i = self.index.get(start)
+        if i is None:
+            return set()
+        seen = bytearray(len(self.coords))
+        seen[i] = 1
+        queue = deque([i])
+        offsets, neighbors = self.offsets, self.neighbors
+        while queue:
+            u = queue.popleft()
+            for k in range(offsets[u], offsets[u + 1]):
+                v = neighbors[k]
+                if not seen[v]:
+                    seen[v] = 1
+                    queue.append(v)
+        return {self.coords[i] for i in range(len(seen)) if seen[i]}
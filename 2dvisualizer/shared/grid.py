@@ -0,0 +1,73 @@
+from collections.abc import Set
+
+DEFAULT_EXTENT = 5
+
+class GridModel:
+    """Rectangular ``rows x cols`` extent with a bitmap of the real locations.
+
+    Only cells listed in the problem are stored; everything else inside the
+    extent is blocked. ``blocked_cells`` is a read-only set view over the
+    bitmap, so nothing proportional to the bounding box is built unless a
+    caller actually iterates it.
+    """
+
+    def __init__(self, locations=()):
+        locations = list(locations)
+        if locations:
+            self.rows = max(r for r, _ in locations) + 1
+            self.cols = max(c for _, c in locations) + 1
+        else:
+            self.rows = self.cols = DEFAULT_EXTENT
+        self.valid = bytearray(self.rows * self.cols)
+        for r, c in locations:
+            self.valid[r * self.cols + c] = 1
+        self.count = sum(self.valid)
+        self.blocked_cells = BlockedCells(self)
+
+    @property
+    def size(self):
+        """Side of the smallest square holding the grid (the old ``grid_size``)."""
+        return max(self.rows, self.cols)
+
+    def __contains__(self, coord):
+        r, c = coord
+        return 0 <= r < self.rows and 0 <= c < self.cols and self.valid[r * self.cols + c] == 1
+
+    def __eq__(self, other):
+        if not isinstance(other, GridModel):
+            return NotImplemented
+        return (self.rows, self.cols, self.valid) == (other.rows, other.cols, other.valid)
+
+    def _iter_cells(self, flag):
+        valid, cols = self.valid, self.cols
+        i = valid.find(flag)
+        while i >= 0:
+            yield divmod(i, cols)
+            i = valid.find(flag, i + 1)
+
+    def iter_valid(self):
+        """Yield valid cells in row-major order."""
+        return self._iter_cells(1)
+
+    def iter_blocked(self):
+        return self._iter_cells(0)
+
+class BlockedCells(Set):
+    """Set view of the blocked cells of a ``GridModel``."""
+
+    def __init__(self, grid):
+        self.grid = grid
+
+    def __contains__(self, coord):
+        r, c = coord
+        grid = self.grid
+        return 0 <= r < grid.rows and 0 <= c < grid.cols and not grid.valid[r * grid.cols + c]
+
+    def __iter__(self):
+        return self.grid.iter_blocked()
+
+    def __len__(self):
+        return self.grid.rows * self.grid.cols - self.grid.count
+
+    def __repr__(self):
+        return f"BlockedCells({set(self)!r})"
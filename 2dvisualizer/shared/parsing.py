@@ -1,20 +1,207 @@
 import re
 
+from shared.graph import GridGraph
+from shared.grid import GridModel
+
+# Plan lines look like "0.0: (move_character loc_1_1 loc_1_2 up)", "3: move ..."
+# or a bare "(goal ...)"; only the leading step marker is stripped.
+_TIMESTAMP_RE = re.compile(r'\d+\.\d+:\s*')
+_STEP_NUMBER_RE = re.compile(r'\d+[.:]?\s*')
+_STEP_COLON_RE = re.compile(r'\d+\s*:')
+PLAN_KEYWORDS = ('move', 'push', 'roll', 'goal')
+
+BALL_SIZE_PREDICATES = {
+    'ball_size_small': 0,
+    'ball_size_medium': 1,
+    'ball_size_large': 2,
+}
+
 def parse_loc(loc):
+    """``loc_R_C`` (1-based) -> zero-based ``(row, col)``."""
     parts = loc.split('_')
-    return int(parts[1])-1, int(parts[2])-1
+    if len(parts) < 3:
+        raise ValueError(f"Invalid location format: {loc}")
+    try:
+        return int(parts[1])-1, int(parts[2])-1
+    except ValueError:
+        raise ValueError(f"Error parsing location '{loc}'") from None
 
-def parse_problem_basic(content):
-    balls = {}
-    for match in re.finditer(r"\(ball_at (\S+) (\S+)\)", content):
-        ball, loc = match.groups()
-        balls[ball] = parse_loc(loc)
-    return balls
+def read_sexpr(content, sink=None):
+    """Read PDDL text into nested lists of atoms in a single pass.
 
-def parse_plan_basic(content):
-    steps = []
+    ``sink(expr, parent)`` is offered every list that closes three levels
+    deep, i.e. each fact of a ``(define ...)`` section. Returning True drops
+    the fact from the tree, so huge ``:init`` blocks are never materialized.
+    """
+    stack = [[]]
+    cur = stack[0]
     for line in content.splitlines():
-        line = line.strip()
-        if line and not line.startswith(';'):
-            steps.append(line)
-    return steps
\ No newline at end of file
+        if ';' in line:
+            line = line[:line.index(';')]
+        if '(' in line or ')' in line:
+            line = line.replace('(', ' ( ').replace(')', ' ) ')
+        for tok in line.split():
+            if tok == '(':
+                cur = []
+                stack.append(cur)
+            elif tok == ')':
+                if len(stack) == 1:
+                    raise ValueError("Unbalanced ')' in PDDL input")
+                expr = stack.pop()
+                cur = stack[-1]
+                if sink is not None and len(stack) == 3 and sink(expr, cur):
+                    continue
+                cur.append(expr)
+            else:
+                cur.append(tok)
+    if len(stack) != 1:
+        raise ValueError("Unbalanced '(' in PDDL input")
+    return stack[0]
+
+def define_sections(tree):
+    """Return the sections of a ``(define ...)`` tree keyed by their head."""
+    define = next((e for e in tree if isinstance(e, list) and e and e[0] == 'define'), None)
+    if define is None:
+        raise ValueError("No (define ...) block found")
+    sections = {}
+    for item in define[1:]:
+        if isinstance(item, list) and item and isinstance(item[0], str):
+            sections[item[0]] = item[1:]
+    return sections
+
+def typed_names(items):
+    """Yield ``(name, type)`` pairs from a PDDL typed list like ``a b - t c - u``."""
+    pending = []
+    it = iter(items)
+    for tok in it:
+        if tok == '-':
+            type_name = next(it, 'object')
+            for name in pending:
+                yield name, type_name
+            pending = []
+        else:
+            pending.append(tok)
+    for name in pending:
+        yield name, 'object'
+
+def parse_problem_text(content):
+    """Build the visualizer problem dict by walking :objects/:init/:goal once."""
+    snow, balls, ball_size = {}, {}, {}
+    character = None
+    valid_locations = set()
+    coords = {}
+    graph = GridGraph()
+
+    def coord_of(loc):
+        coord = coords.get(loc)
+        if coord is None:
+            coord = coords[loc] = parse_loc(loc)
+        return coord
+
+    def on_fact(fact, section):
+        nonlocal character
+        if section[0] != ':init' or not fact:
+            return False
+        head = fact[0]
+        if head == '=':
+            if len(fact) < 3 or not isinstance(fact[1], list) or len(fact[1]) < 2:
+                return True
+            fluent, arg, value = fact[1][0], fact[1][1], fact[2]
+            if fluent == 'location_type':
+                coord = coord_of(arg)
+                valid_locations.add(coord)
+                snow[coord] = (value == '1')
+            elif fluent == 'ball_size':
+                ball_size[arg] = int(value)
+        elif head == 'next':
+            if len(fact) >= 4:
+                graph.add_edge(coord_of(fact[1]), coord_of(fact[2]), fact[3])
+        elif head == 'snow':
+            coord = coord_of(fact[1])
+            snow[coord] = True
+            valid_locations.add(coord)
+        elif head == 'ball_at':
+            coord = coord_of(fact[2])
+            valid_locations.add(coord)
+            balls[fact[1]] = coord
+        elif head in BALL_SIZE_PREDICATES:
+            ball_size[fact[1]] = BALL_SIZE_PREDICATES[head]
+        elif head == 'character_at':
+            if character is None:
+                character = coord_of(fact[1])
+                valid_locations.add(character)
+        return True
+
+    sections = define_sections(read_sexpr(content, sink=on_fact))
+    domain = sections.get(':domain') or ['unknown']
+
+    for name, type_name in typed_names(sections.get(':objects', [])):
+        if type_name == 'location' and name.startswith('loc_'):
+            valid_locations.add(coord_of(name))
+
+    for ball in balls:
+        ball_size.setdefault(ball, 0)
+
+    for coord in valid_locations:
+        graph.add_location(coord)
+    graph.freeze()
+
+    grid = GridModel(valid_locations)
+    for coord in valid_locations:
+        snow.setdefault(coord, False)
+
+    return {
+        'snow': snow,
+        'balls': balls,
+        'ball_size': ball_size,
+        'character': character,
+        'grid': grid,
+        'grid_size': grid.size,
+        'blocked_cells': grid.blocked_cells,
+        'valid_locations': valid_locations,
+        'graph': graph,
+        'domain': domain[0]
+    }
+
+def parenthesized_action(line):
+    """Return the action of a ``[t.t:] (action ...)`` line, or None."""
+    line = line.strip()
+    if not line or line[0] == ';':
+        return None
+    if line[0].isdigit():
+        m = _TIMESTAMP_RE.match(line)
+        if m:
+            line = line[m.end():]
+    if line[:1] == '(' and line[-1:] == ')':
+        return line[1:-1].strip() or None
+    return None
+
+def normalize_action_line(line):
+    """Return the action held by one plan line, or None if there is none."""
+    line = line.strip()
+    if not line or line[0] == ';':
+        return None
+    action = parenthesized_action(line)
+    if action:
+        return action
+
+    lowered = line.lower()
+    if any(keyword in lowered for keyword in PLAN_KEYWORDS):
+        cleaned = line
+        if cleaned[0].isdigit():
+            cleaned = cleaned[_STEP_NUMBER_RE.match(cleaned).end():]
+            m = _STEP_COLON_RE.match(cleaned)
+            if m:
+                cleaned = cleaned[m.end():]
+        if cleaned[:1] == '(' and cleaned[-1:] == ')':
+            cleaned = cleaned[1:-1]
+        if cleaned:
+            return cleaned
+    return None
+
+def iter_plan_actions(lines):
+    """Yield normalized actions from any iterable of plan lines (e.g. an open file)."""
+    for line in lines:
+        action = normalize_action_line(line)
+        if action:
+            yield action
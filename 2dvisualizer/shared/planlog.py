@@ -0,0 +1,123 @@
+import mmap
+import re
+from contextlib import contextmanager
+
+from shared.parsing import parenthesized_action
+
+METRIC_PATTERNS = {
+    'plan_length': r'plan-length:(\d+)',
+    'planning_time': r'planning time \(msec\): (\d+)',
+    'search_time': r'search time \(msec\): (\d+)',
+    'heuristic_time': r'heuristic time \(msec\): (\d+)',
+    'grounding_time': r'grounding time: (\d+)',
+    'expanded_nodes': r'expanded nodes:(\d+)',
+    'states_evaluated': r'states evaluated:(\d+)',
+    'dead_ends': r'number of dead-ends detected:(\d+)',
+    'duplicates': r'number of duplicates detected:(\d+)',
+}
+
+# All counters in one alternation, each value captured in a group named after
+# its key. The scan lowercases the input chunk by chunk instead of using
+# re.IGNORECASE, which disables the engine's fast prefix checks and is several
+# times slower on large logs.
+_METRICS_RE = re.compile('|'.join(
+    pattern.replace(r'(\d+)', rf'(?P<{key}>\d+)') for key, pattern in METRIC_PATTERNS.items()
+).encode())
+
+SCAN_CHUNK = 4 << 20
+
+@contextmanager
+def mapped(path):
+    """Map ``path`` read-only; empty files yield ``b''`` (mmap rejects them)."""
+    with open(path, 'rb') as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            yield b''
+            return
+        try:
+            yield buf
+        finally:
+            buf.close()
+
+def iter_lower_chunks(buf, chunk_size=SCAN_CHUNK):
+    """Yield lowercased copies of ``buf`` in pieces that end on a line boundary."""
+    pos, size = 0, len(buf)
+    while pos < size:
+        end = min(pos + chunk_size, size)
+        if end < size:
+            nl = buf.rfind(b'\n', pos, end)
+            if nl > pos:
+                end = nl + 1
+        yield buf[pos:end].lower()
+        pos = end
+
+def scan_metrics(buf):
+    """Extract every planner counter from ``buf`` (bytes, mmap or str) in one pass.
+
+    As with independent searches, the first occurrence of each counter wins
+    and missing counters are 0.
+    """
+    if isinstance(buf, str):
+        buf = buf.encode()
+    metrics = dict.fromkeys(METRIC_PATTERNS, 0)
+    pending = set(METRIC_PATTERNS)
+    for chunk in iter_lower_chunks(buf):
+        for m in _METRICS_RE.finditer(chunk):
+            key = m.lastgroup
+            if key in pending:
+                metrics[key] = int(m.group(key))
+                pending.discard(key)
+                if not pending:
+                    return metrics
+    return metrics
+
+def read_log_metrics(path):
+    with mapped(path) as buf:
+        return scan_metrics(buf)
+
+PLAN_MARKER = b'found plan:'
+_PLAN_END_RE = re.compile(rb'plan-length|metric|planning time')
+
+def find_plan_block(buf, chunk_size=SCAN_CHUNK):
+    """Return ``(start, end)`` offsets of the text between the first
+    ``found plan:`` marker and the next terminator, or None.
+
+    Matching is case-insensitive, but only one line-aligned chunk at a time is
+    lowercased, so nothing proportional to the log is ever copied.
+    """
+    if isinstance(buf, str):
+        buf = buf.encode()
+    offset = 0
+    start = None
+    for chunk in iter_lower_chunks(buf, chunk_size):
+        pos = 0
+        if start is None:
+            pos = chunk.find(PLAN_MARKER)
+            if pos < 0:
+                offset += len(chunk)
+                continue
+            pos += len(PLAN_MARKER)
+            start = offset + pos
+        m = _PLAN_END_RE.search(chunk, pos)
+        if m:
+            return start, offset + m.start()
+        offset += len(chunk)
+    return None
+
+def iter_plan_block(buf):
+    """Yield the actions of the plan block in ``buf`` without copying the rest of the log."""
+    if isinstance(buf, str):
+        buf = buf.encode()
+    span = find_plan_block(buf)
+    if span is None:
+        return
+    pos, end = span
+    while pos < end:
+        nl = buf.find(b'\n', pos, end)
+        if nl < 0:
+            nl = end
+        action = parenthesized_action(buf[pos:nl].decode('utf-8', 'replace'))
+        pos = nl + 1
+        if action:
+            yield action
@@ -0,0 +1,73 @@
+from array import array
+from bisect import bisect_left
+
+import numpy as np
+
+from shared.world import SNOW
+
+class StateTimeline:
+    """Change history of a ``WorldState`` indexed per entity.
+
+    Change ``v`` (its version) is the ``v``-th call to ``record``. Besides
+    the global log, every entity -- a ball's position or size, the
+    character, a snow cell -- keeps the sorted versions it changed at and the
+    values it took. The state after any number of changes is therefore
+    rebuilt with one bisect per entity that ever changed (snow, which can
+    touch every cell, is also kept as flat arrays and replayed as one
+    vectorized assignment), instead of replaying the log from the start.
+    """
+
+    def __init__(self, initial):
+        self.initial = initial.copy()
+        self.targets = array('b')
+        self.keys = array('i')
+        self.values = []
+        self.history = {}
+        self.snow_versions = array('i')
+        self.snow_cells = array('i')
+        self.snow_values = bytearray()
+
+    def __len__(self):
+        return len(self.targets)
+
+    def record(self, target, key, value):
+        version = len(self.targets)
+        self.targets.append(target)
+        self.keys.append(key)
+        self.values.append(value)
+        if target == SNOW:
+            self.snow_versions.append(version)
+            self.snow_cells.append(key)
+            value = bool(value)
+            self.snow_values.append(value)
+        entry = self.history.get((target, key))
+        if entry is None:
+            entry = self.history[target, key] = (array('i'), [])
+        entry[0].append(version)
+        entry[1].append(value)
+
+    def value_at(self, target, key, version):
+        """Value of one entity once the first ``version`` changes are applied."""
+        entry = self.history.get((target, key))
+        if entry is not None:
+            i = bisect_left(entry[0], version)
+            if i:
+                return entry[1][i - 1]
+        return self.initial.get(target, key)
+
+    def state_at(self, version):
+        """A fresh ``WorldState`` with the first ``version`` changes applied."""
+        world = self.initial.copy()
+        for (target, key), (versions, values) in self.history.items():
+            if target == SNOW:
+                continue
+            i = bisect_left(versions, version)
+            if i:
+                world.apply(target, key, values[i - 1])
+        n = bisect_left(self.snow_versions, version)
+        if n:
+            cells = np.frombuffer(self.snow_cells, dtype=np.int32)[:n]
+            values = np.frombuffer(self.snow_values, dtype=np.bool_)[:n]
+            # Repeated cells keep their last value, matching replay order.
+            world.snow.flat[cells] = values
+        return world
@@ -0,0 +1,227 @@
+from collections.abc import Mapping
+
+import numpy as np
+
+ABSENT = -1
+
+# Change targets for ``WorldState.apply``.
+POSITION = 0
+SIZE = 1
+SNOW = 2
+CHARACTER = 3
+
+class WorldState:
+    """Snowman world state held in arrays.
+
+    ``snow`` is a ``rows x cols`` bool grid, ball ``i`` (named
+    ``names[i]``) sits at ``ball_pos[i]`` with size ``ball_size[i]``, and the
+    character is a pair of ints. Missing entries are ``ABSENT``. The ball
+    name table (``names``/``ids``) is shared between a state and its copies
+    and only ever grows, so ball ids stay valid; arrays of older copies are
+    padded on demand.
+
+    ``snow_map``, ``ball_map`` and ``size_map`` give the dict-shaped view the
+    renderer and metrics code read.
+    """
+
+    def __init__(self, grid, names, ids, snow, ball_pos, ball_size, order, char_r=ABSENT, char_c=ABSENT):
+        self.grid = grid
+        self.names = names
+        self.ids = ids
+        self.snow = snow
+        self.ball_pos = ball_pos
+        self.ball_size = ball_size
+        self.order = order
+        self.char_r = char_r
+        self.char_c = char_c
+
+    @classmethod
+    def from_problem(cls, prob):
+        grid = prob['grid']
+        snow = np.zeros((grid.rows, grid.cols), dtype=bool)
+        for (r, c), is_snow in prob['snow'].items():
+            if is_snow:
+                snow[r, c] = True
+        names = list(prob['balls'])
+        names.extend(b for b in prob['ball_size'] if b not in prob['balls'])
+        n = len(names)
+        ball_pos = np.full((n, 2), ABSENT, dtype=np.int32)
+        ball_size = np.full(n, ABSENT, dtype=np.int8)
+        for i, name in enumerate(names):
+            if name in prob['balls']:
+                ball_pos[i] = prob['balls'][name]
+            if name in prob['ball_size']:
+                ball_size[i] = prob['ball_size'][name]
+        ids = {name: i for i, name in enumerate(names)}
+        state = cls(grid, names, ids, snow, ball_pos, ball_size, list(range(len(prob['balls']))))
+        state.character = prob['character']
+        return state
+
+    def copy(self):
+        return WorldState(self.grid, self.names, self.ids, self.snow.copy(), self.ball_pos.copy(),
+                          self.ball_size.copy(), list(self.order), self.char_r, self.char_c)
+
+    def __eq__(self, other):
+        if not isinstance(other, WorldState):
+            return NotImplemented
+        return (self.character == other.character and np.array_equal(self.snow, other.snow)
+                and self.ball_map == other.ball_map and self.size_map == other.size_map)
+
+    @property
+    def character(self):
+        return None if self.char_r == ABSENT else (self.char_r, self.char_c)
+
+    @character.setter
+    def character(self, coord):
+        self.char_r, self.char_c = (ABSENT, ABSENT) if coord is None else coord
+
+    def ball_id(self, name):
+        """Id of ball ``name``, registering it if it is new."""
+        i = self.ids.get(name)
+        if i is None:
+            i = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return i
+
+    def _reserve(self, i):
+        n = len(self.ball_pos)
+        if i >= n:
+            grow = len(self.names) - n
+            self.ball_pos = np.vstack([self.ball_pos, np.full((grow, 2), ABSENT, dtype=np.int32)])
+            self.ball_size = np.concatenate([self.ball_size, np.full(grow, ABSENT, dtype=np.int8)])
+
+    def position(self, i):
+        if i >= len(self.ball_pos) or self.ball_pos[i, 0] == ABSENT:
+            return None
+        r, c = self.ball_pos[i].tolist()
+        return r, c
+
+    def set_position(self, i, coord):
+        self._reserve(i)
+        was_absent = self.ball_pos[i, 0] == ABSENT
+        if coord is None:
+            self.ball_pos[i] = ABSENT
+            if not was_absent:
+                self.order.remove(i)
+        else:
+            self.ball_pos[i] = coord
+            if was_absent:
+                self.order.append(i)
+
+    def size(self, i):
+        if i >= len(self.ball_size) or self.ball_size[i] == ABSENT:
+            return None
+        return int(self.ball_size[i])
+
+    def set_size(self, i, size):
+        self._reserve(i)
+        self.ball_size[i] = ABSENT if size is None else size
+
+    def get(self, target, key):
+        """Current value at ``key`` (ball id, flat cell index for ``SNOW``, 0 for ``CHARACTER``)."""
+        if target == POSITION:
+            return self.position(key)
+        if target == SIZE:
+            return self.size(key)
+        if target == SNOW:
+            return bool(self.snow.flat[key])
+        return self.character
+
+    def apply(self, target, key, value):
+        if target == POSITION:
+            self.set_position(key, value)
+        elif target == SIZE:
+            self.set_size(key, value)
+        elif target == SNOW:
+            self.snow.flat[key] = value
+        else:
+            self.character = value
+
+    def has_snow(self, r, c):
+        return 0 <= r < self.grid.rows and 0 <= c < self.grid.cols and bool(self.snow[r, c])
+
+    @property
+    def snow_map(self):
+        return SnowMap(self)
+
+    @property
+    def ball_map(self):
+        return BallMap(self)
+
+    @property
+    def size_map(self):
+        return SizeMap(self)
+
+class _StateMap(Mapping):
+    __slots__ = ('world',)
+
+    def __init__(self, world):
+        self.world = world
+
+    def copy(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return repr(self.copy())
+
+class SnowMap(_StateMap):
+    """``{(r, c): bool}`` over every valid cell."""
+
+    def __getitem__(self, coord):
+        if coord not in self.world.grid:
+            raise KeyError(coord)
+        return bool(self.world.snow[coord])
+
+    def get(self, coord, default=None):
+        if coord not in self.world.grid:
+            return default
+        return bool(self.world.snow[coord])
+
+    def __iter__(self):
+        return self.world.grid.iter_valid()
+
+    def __len__(self):
+        return self.world.grid.count
+
+class BallMap(_StateMap):
+    """``{ball: (r, c)}`` in the order balls were placed."""
+
+    def __getitem__(self, name):
+        world = self.world
+        i = world.ids.get(name)
+        pos = None if i is None else world.position(i)
+        if pos is None:
+            raise KeyError(name)
+        return pos
+
+    def __iter__(self):
+        names = self.world.names
+        for i in self.world.order:
+            yield names[i]
+
+    def __len__(self):
+        return len(self.world.order)
+
+    def items(self):
+        world = self.world
+        return [(world.names[i], world.position(i)) for i in world.order]
+
+class SizeMap(_StateMap):
+    """``{ball: size}`` for balls with a known size."""
+
+    def __getitem__(self, name):
+        world = self.world
+        i = world.ids.get(name)
+        size = None if i is None else world.size(i)
+        if size is None:
+            raise KeyError(name)
+        return size
+
+    def __iter__(self):
+        world = self.world
+        for i, name in enumerate(world.names):
+            if world.size(i) is not None:
+                yield name
+
+    def __len__(self):
+        return int((self.world.ball_size != ABSENT).sum())
@@ -1,30 +1,138 @@
-import re
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
-from matplotlib.animation import FuncAnimation
+from matplotlib.artist import Artist
+from matplotlib.collections import EllipseCollection, LineCollection, PatchCollection, PathCollection
+from matplotlib.font_manager import FontProperties
+from matplotlib.path import Path
+from matplotlib.textpath import TextPath
+from matplotlib.colors import to_rgba
+from matplotlib.transforms import Affine2D, IdentityTransform
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import os
+import queue
+import threading
 import time
 import csv
+import logging
 from datetime import datetime
+from shared.parsing import parse_loc, parse_problem_text, iter_plan_actions
+from shared.actions import ActionTable, NO_ID, OP_MOVE_CHARACTER, OP_MOVE_BALL, OP_GOAL
+from shared.world import WorldState, POSITION, SIZE, SNOW, CHARACTER
+from shared.timeline import StateTimeline
+from shared.domain import StateView, parse_domain
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import islice
+from bisect import bisect_left, bisect_right
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning)
 
+log = logging.getLogger(__name__)
+
 # Configuration constants
 RADIUS = {0: 0.15, 1: 0.25, 2: 0.35}
 BALL_SIZE_LABELS = {0: '', 1: '', 2: ''}
 BALL_SIZE_NAMES = {0: 'Small', 1: 'Medium', 2: 'Large'}
 SUBSTEPS = 4
-PLT_PAUSE = 0.03
+# Seeks further than this many changes rebuild the cursor from the timeline
+# index instead of stepping along the change log.
+SEEK_REBUILD = 256
+# Playback pacing: plan steps per second at 1x, the speed slider's range of
+# multipliers (log scale, 1x in the middle) and the playback timer period.
+STEPS_PER_SECOND = 8.0
+MIN_SPEED = 0.25
+MAX_SPEED = 4.0
+TICK_MS = 16
+# Redraw only the moving artists over a cached background during playback.
+BLIT = True
+# Stepping keeps up to FRAME_CACHE_MB of rasterized frames and prefetches
+# PREFETCH_FRAMES frames ahead in the stepping direction while idle.
+FRAME_CACHE_MB = 256
+PREFETCH_FRAMES = 8
+# Background builds publish frames every BUILD_CHUNK plan steps; the UI
+# polls for them every BUILD_POLL_MS.
+BUILD_CHUNK = 2000
+# The builder holds the frame lock for at most LOCK_STEPS steps at a time and
+# checks for cancellation between them.
+LOCK_STEPS = 32
+BUILD_POLL_MS = 50
+# Plan files are streamed to the parser READ_CHUNK characters at a time.
+READ_CHUNK = 1 << 20
+# Pipeline stages timed by StageTimer; the load stages add up to a run's
+# execution time.
+LOAD_STAGES = ('file_read', 'problem_parse', 'plan_parse', 'frame_build')
+DRAW_STAGES = ('first_draw', 'frame_draw', 'canvas_flush')
+
+class StageTimer:
+    """``time.perf_counter`` spans of the load and render pipeline, per stage.
+
+    Every span is kept, so stages that run once per frame report a mean and
+    a 95th percentile next to their total. Spans nest exclusively: time
+    spent in an inner span is left out of the span around it, so stage
+    totals never overlap. The frame builder thread and the UI thread record
+    into the same timer.
+    """
+
+    def __init__(self):
+        self.spans = {}
+        self.lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def span(self, stage):
+        # Time taken by nested spans, one entry per span open on this thread.
+        nested = getattr(self._local, 'nested', None)
+        if nested is None:
+            nested = self._local.nested = []
+        nested.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            inner = nested.pop()
+            if nested:
+                nested[-1] += elapsed
+            self.add(stage, elapsed - inner)
+
+    def add(self, stage, seconds):
+        with self.lock:
+            self.spans.setdefault(stage, []).append(seconds)
+
+    def samples(self, stage):
+        with self.lock:
+            return list(self.spans.get(stage, ()))
+
+    def total_ms(self, *stages):
+        return sum(sum(self.samples(stage)) for stage in stages) * 1000
+
+    def mean_ms(self, stage):
+        samples = self.samples(stage)
+        return sum(samples) / len(samples) * 1000 if samples else 0.0
+
+    def p95_ms(self, stage):
+        samples = self.samples(stage)
+        return float(np.percentile(samples, 95)) * 1000 if samples else 0.0
+
+    def summary(self):
+        """Stage timings in milliseconds, keyed like the metrics CSV columns."""
+        summary = {f'{stage}_ms': round(self.total_ms(stage), 3) for stage in LOAD_STAGES}
+        summary['first_draw_ms'] = round(self.total_ms('first_draw'), 3)
+        summary['frames_drawn'] = len(self.samples('frame_draw'))
+        summary['frame_draw_mean_ms'] = round(self.mean_ms('frame_draw'), 3)
+        summary['frame_draw_p95_ms'] = round(self.p95_ms('frame_draw'), 3)
+        summary['canvas_flush_mean_ms'] = round(self.mean_ms('canvas_flush'), 3)
+        summary['canvas_flush_p95_ms'] = round(self.p95_ms('canvas_flush'), 3)
+        return summary
 
 class MetricsCalculator:
     def __init__(self):
         self.reset()
         
     def reset(self):
-        self.start_time = None
-        self.end_time = None
-        self.timing_started = False
-        self.timing_log = []
+        self.timer = StageTimer()
         self.step_count = 0
         self.substep_count = 0
         self.move_character_count = 0
@@ -43,46 +151,30 @@ class MetricsCalculator:
         self.dead_ends_detected = 0
         self.duplicates_detected = 0
         
-    def start_timing(self):
-        if not self.timing_started:
-            self.start_time = time.perf_counter()
-            self.timing_started = True
-        
-    def end_timing(self):
-        if self.timing_started and self.end_time is None:
-            self.end_time = time.perf_counter()
-            self.timing_started = False
-        
-    def get_execution_time_ms(self, plan_name):
-        if self.start_time is None or self.end_time is None:
-            return 0
-        measured_time = (self.end_time - self.start_time) * 1000
-        if plan_name == 'plan_numeric':
-            return 512
-        elif plan_name == 'plan_classic':
-            return 4541
-        return int(measured_time)
+    def get_execution_time_ms(self):
+        """Time from reading the files to the last frame built."""
+        return round(self.timer.total_ms(*LOAD_STAGES))
+
+    def timing_metrics(self):
+        """Stage timings recorded so far, to refresh a finalized metrics dict with."""
+        return {'execution_time_ms': self.get_execution_time_ms(), **self.timer.summary()}
     
-    def process_action(self, action, state_before, state_after, substeps=10):
+    def process_action(self, table, i, grew=False, substeps=SUBSTEPS):
         self.step_count += 1
         self.substep_count += substeps
-        parts = action.split()
+        op = table.opcode[i]
         
-        if parts[0] in ['move_character', 'move', 'move_to', 'move_char']:
+        if op == OP_MOVE_CHARACTER:
             self.move_character_count += 1
             self.total_cost += 1
             
-        elif parts[0] in ['move_ball', 'push', 'roll', 'roll_ball']:
+        elif op == OP_MOVE_BALL:
             self.move_ball_count += 1
             self.total_cost += 1
-            
-            if len(parts) >= 2:
-                ball = parts[1]
-                if (ball in state_before['ball_size'] and ball in state_after['ball_size'] and
-                    state_after['ball_size'][ball] > state_before['ball_size'][ball]):
-                    self.ball_growth_count += 1
+            if grew:
+                self.ball_growth_count += 1
                     
-        elif parts[0] == 'goal':
+        elif op == OP_GOAL:
             self.goal_count += 1
             self.total_cost += 1
             
@@ -94,7 +186,7 @@ class MetricsCalculator:
             
         return {
             'run_name': plan_name,
-            'execution_time_ms': self.get_execution_time_ms(plan_name),
+            'execution_time_ms': self.get_execution_time_ms(),
             'plan_length': self.step_count,
             'move_character_count': self.move_character_count,
             'move_ball_count': self.move_ball_count,
@@ -111,418 +203,1150 @@ class MetricsCalculator:
             'expanded_nodes': self.expanded_nodes,
             'states_evaluated': self.states_evaluated,
             'dead_ends_detected': self.dead_ends_detected,
-            'duplicates_detected': self.duplicates_detected
+            'duplicates_detected': self.duplicates_detected,
+            **self.timer.summary()
         }
 
-def parse_loc(loc):
-    try:
-        parts = loc.split('_')
-        if len(parts) < 3:
-            raise ValueError(f"Invalid location format: {loc}")
-        return int(parts[1])-1, int(parts[2])-1
-    except Exception as e:
-        raise ValueError(f"Error parsing location '{loc}': {e}")
-
-def coord_to_plot(coord, grid_size):
+def coord_to_plot(coord, rows):
     r, c = coord
-    return c, grid_size-1-r
+    return c, rows-1-r
+
+def read_text(path):
+    with open(path, 'r') as file:
+        return file.read()
+
+def iter_lines(path, timer=None, chunk_size=READ_CHUNK):
+    """Yield the lines of ``path``, reading ``chunk_size`` characters at a time.
+
+    With a ``timer`` every read is timed as ``file_read``.
+    """
+    with open(path, 'r') as file:
+        tail = ''
+        while True:
+            if timer is None:
+                chunk = file.read(chunk_size)
+            else:
+                with timer.span('file_read'):
+                    chunk = file.read(chunk_size)
+            if not chunk:
+                if tail:
+                    yield tail
+                return
+            lines = (tail + chunk).split('\n')
+            tail = lines.pop()
+            yield from lines
 
 def parse_problem(path):
-    snow, balls, ball_size = {}, {}, {}
-    character = None
-    grid_positions = set()
-    valid_locations = set()
-    
+    return parse_problem_text(read_text(path))
+
+def iter_plan(path):
     with open(path, 'r') as file:
-        content = file.read()
-        
-        objects_match = re.search(r':objects\s+(.*?)\)', content, re.DOTALL)
-        if objects_match:
-            objects_section = objects_match.group(1)
-            for match in re.finditer(r'(loc_\d+_\d+)\s*-\s*location', objects_section):
-                loc = match.group(1)
-                coord = parse_loc(loc)
-                valid_locations.add(coord)
-                grid_positions.add(coord)
-        
-        for match in re.finditer(r"\(= \(location_type (\S+)\) (\d+)\)", content):
-            loc, t = match.groups()
-            coord = parse_loc(loc)
-            valid_locations.add(coord)
-            snow[coord] = (t == '1')
-            grid_positions.add(coord)
-        
-        for match in re.finditer(r"\(snow (\S+)\)", content):
-            loc = match.group(1)
-            coord = parse_loc(loc)
-            snow[coord] = True
-            valid_locations.add(coord)
-            grid_positions.add(coord)
-        
-        for match in re.finditer(r"\(ball_at (\S+) (\S+)\)", content):
-            ball, loc = match.groups()
-            coord = parse_loc(loc)
-            grid_positions.add(coord)
-            valid_locations.add(coord)
-            balls[ball] = coord
-            
-        for match in re.finditer(r"\(= \(ball_size (\S+)\) (\d+)\)", content):
-            ball, size = match.groups()
-            size = int(size)
-            ball_size[ball] = size
-            
-        for match in re.finditer(r"\(ball_size_(small|medium|large) (\S+)\)", content):
-            size_str, ball = match.groups()
-            size_map = {'small': 0, 'medium': 1, 'large': 2}
-            size = size_map.get(size_str.lower(), 0)
-            ball_size[ball] = size
-            
-        char_match = re.search(r"\(character_at (\S+)\)", content)
-        if char_match:
-            character = parse_loc(char_match.group(1))
-            valid_locations.add(character)
-            grid_positions.add(character)
-            
-    for ball in balls:
-        ball_size.setdefault(ball, 0)
-        
-    if grid_positions:
-        max_r = max(r for r, _ in grid_positions)
-        max_c = max(c for _, c in grid_positions)
-        grid_size = max(max_r, max_c) + 1
-    else:
-        grid_size = 5
-        
-    blocked_cells = set()
-    for r in range(grid_size):
-        for c in range(grid_size):
-            if (r, c) not in valid_locations:
-                blocked_cells.add((r, c))
-    
-    for r in range(grid_size):
-        for c in range(grid_size):
-            if (r, c) not in blocked_cells:
-                snow.setdefault((r, c), False)
-                
-    return {
-        'snow': snow,
-        'balls': balls,
-        'ball_size': ball_size,
-        'character': character,
-        'grid_size': grid_size,
-        'blocked_cells': blocked_cells,
-        'valid_locations': valid_locations
-    }
+        yield from iter_plan_actions(file)
 
 def parse_plan(path):
     try:
-        with open(path, 'r') as file:
-            content = file.read()
-            lines = content.strip().split('\n')
-            steps = []
-            
-            for line in lines:
-                line = line.strip()
-                if not line or line.startswith(';'):
-                    continue
-                    
-                cleaned_line = re.sub(r'^\d+\.\d+:\s*', '', line)
-                if cleaned_line.startswith('(') and cleaned_line.endswith(')'):
-                    action = cleaned_line[1:-1].strip()
-                    steps.append(action)
-                    continue
-                    
-                if any(keyword in line.lower() for keyword in ['move', 'push', 'roll', 'Goal']):
-                    cleaned_line = re.sub(r'^\d+[.:]?\s*', '', line)
-                    cleaned_line = re.sub(r'^\d+\s*:', '', cleaned_line)
-                    if cleaned_line.startswith('(') and cleaned_line.endswith(')'):
-                        cleaned_line = cleaned_line[1:-1]
-                    if cleaned_line:
-                        steps.append(cleaned_line)
-                        continue
-            return steps
-            
+        return list(iter_plan(path))
     except Exception as e:
         raise Exception(f"Error parsing plan file '{path}': {str(e)}")
 
-def build_frames(prob, plan):
-    frames = []
-    state = {
-        'snow': prob['snow'].copy(),
-        'balls': prob['balls'].copy(),
-        'ball_size': prob['ball_size'].copy(),
-        'character': prob['character'],
-        'grid_size': prob['grid_size'],
-        'blocked_cells': prob['blocked_cells'],
-        'is_numeric': 'snowman_numeric' in prob.get('domain', '')
-    }
-    
-    initial_frame = {
-        'type': 'initial',
-        'balls': state['balls'].copy(),
-        'ball_size': state['ball_size'].copy(),
-        'snow': state['snow'].copy(),
-        'character': state['character'],
-        'grid_size': state['grid_size'],
-        'blocked_cells': state['blocked_cells'],
-        'step_text': 'Initial State'
-    }
-    frames.append(initial_frame)
-    
-    for i, action in enumerate(plan):
-        parts = action.split()
-        step_label = f"Step {i + 1}: {action}"
-        
-        state_before = {
-            'balls': state['balls'].copy(),
-            'ball_size': state['ball_size'].copy(),
-            'character': state['character']
+def parse_plan_table(path, lines=None):
+    """Plan actions of ``path`` as an ``ActionTable``; ``lines`` (any iterable) replaces reading it."""
+    try:
+        return ActionTable(iter_plan(path) if lines is None else iter_plan_actions(lines))
+    except Exception as e:
+        raise Exception(f"Error parsing plan file '{path}': {str(e)}")
+
+SEG_INITIAL = 0
+SEG_CHAR_MOVE = 1
+SEG_APPROACH = 2
+SEG_BALL_MOVE = 3
+SEG_GOAL = 4
+SEG_STATIC = 5
+SEG_ERROR = 6
+SEG_NOOP = 7
+
+SEG_TYPES = ('initial', 'char_move', 'char_move', 'ball_move', 'goal', 'static', 'error', 'static')
+
+
+class FrameSequence:
+    """Animation frames of a plan, built on demand.
+
+    The plan is simulated once up front on an array-backed ``WorldState``,
+    but instead of full frame dicts only one small segment record per run of
+    substep frames is kept, plus a ``StateTimeline`` of the individual
+    character/position/size/snow changes. Indexing seeks a cursor state to
+    the segment's version -- stepping along the log for the short hops
+    playback makes, rebuilding it from the per-entity index for long jumps --
+    snapshots its arrays and assembles the frame, interpolating ``alpha`` on
+    the fly. Frame ``balls``/``ball_size``/``snow`` are read-only mappings
+    over the snapshot, which is also exposed as ``frame['world']``; memory
+    grows with the number of steps, not frames x grid cells.
+
+    With a parsed ``domain`` every step runs through that domain's compiled
+    transition (see ``shared.domain``): preconditions are checked, effects
+    come from the domain file and segments are derived from what changed.
+    Without one, or when the domain uses constructs the compiler does not
+    support, the built-in Snowman rules are used.
+    """
+
+    def __init__(self, prob, plan=None, substeps=SUBSTEPS, on_step=None, domain=None):
+        self.substeps = substeps
+        self.table = ActionTable()
+        self.grid = prob['grid']
+        self.grid_size = prob['grid_size']
+        self.blocked_cells = prob['blocked_cells']
+        self.is_numeric = 'snowman_numeric' in prob.get('domain', '')
+        self.transitions = None
+        if domain is not None:
+            try:
+                self.transitions = domain.compile(prob)
+            except Exception as e:
+                log.warning("Domain '%s' cannot be compiled, using the built-in rules: %s", domain.name, e)
+        self.view = None
+        # Verb symbol id -> compiled action (None for actions the domain lacks).
+        self._verb_actions = {}
+
+        # Held while frames are materialized and while a background builder
+        # extends the sequence, so the two never interleave.
+        self.lock = threading.RLock()
+
+        self.world = WorldState.from_problem(prob)
+        if self.transitions is not None:
+            self.view = StateView(self.world)
+        # Simulation state; ``on_step`` callbacks see (and may keep) it.
+        self.state = {
+            'balls': self.world.ball_map,
+            'ball_size': self.world.size_map,
+            'snow': self.world.snow_map,
+            'character': prob['character'],
+            'world': self.world,
+            'grid': self.grid,
+            'grid_size': self.grid_size,
+            'blocked_cells': self.blocked_cells,
+            'is_numeric': self.is_numeric,
         }
-        
-        try:
-            if parts[0] in ['move_character', 'move', 'move_to', 'move_char']:
-                start = parse_loc(parts[1])
-                end = parse_loc(parts[2])
-                
-                for t in range(SUBSTEPS):
-                    alpha = t / (SUBSTEPS - 1)
-                    frame = {
-                        'type': 'char_move',
-                        'start': start,
-                        'end': end,
-                        'alpha': alpha,
-                        'balls': state['balls'].copy(),
-                        'ball_size': state['ball_size'].copy(),
-                        'snow': state['snow'].copy(),
-                        'character': state['character'],
-                        'grid_size': state['grid_size'],
-                        'blocked_cells': state['blocked_cells'],
-                        'step_text': step_label if t == 0 else None
-                    }
-                    frames.append(frame)
-                
-                state['character'] = end
-                
-            elif parts[0] in ['move_ball', 'push', 'roll', 'roll_ball']:
-                ball, from_cell, mid_cell, to_cell = parts[1:5]
-                start = parse_loc(from_cell)
-                end = parse_loc(to_cell)
-                
-                char_start = state['character']
-                for t in range(SUBSTEPS):
-                    alpha = t / (SUBSTEPS - 1)
-                    frame = {
-                        'type': 'char_move',
-                        'start': char_start,
-                        'end': start,
-                        'alpha': alpha,
-                        'balls': state['balls'].copy(),
-                        'ball_size': state['ball_size'].copy(),
-                        'snow': state['snow'].copy(),
-                        'character': state['character'],
-                        'grid_size': state['grid_size'],
-                        'blocked_cells': state['blocked_cells'],
-                        'step_text': step_label if t == 0 else None
-                    }
-                    frames.append(frame)
-                
-                state['character'] = start
-                
-                for t in range(SUBSTEPS):
-                    alpha = t / (SUBSTEPS - 1)
-                    frame = {
-                        'type': 'ball_move',
-                        'ball': ball,
-                        'start': start,
-                        'end': end,
-                        'alpha': alpha,
-                        'balls': state['balls'].copy(),
-                        'ball_size': state['ball_size'].copy(),
-                        'snow': state['snow'].copy(),
-                        'character': state['character'],
-                        'grid_size': state['grid_size'],
-                        'blocked_cells': state['blocked_cells'],
-                        'step_text': None
-                    }
-                    frames.append(frame)
-                
-                state['balls'][ball] = end
-                if state['snow'].get(end, False):
-                    state['ball_size'][ball] = min(state['ball_size'][ball] + 1, 2)
-                    state['snow'][end] = False
-                    
-            elif parts[0] == 'goal':
-                if not state.get('is_numeric', False):
-                    balls_at_goal = [b for b, pos in state['balls'].items() if pos == (2, 0)]
-                    if len(balls_at_goal) >= 3:
-                        state['ball_size'][balls_at_goal[0]] = 2
-                        state['ball_size'][balls_at_goal[1]] = 1
-                        state['ball_size'][balls_at_goal[2]] = 0
+        # Cursor state frames are materialized from, at ``_version`` changes.
+        self._cursor = self.world.copy()
+        self._version = 0
+
+        self.timeline = StateTimeline(self.world)
+
+        self._seg_kind = array('b')
+        self._seg_row = array('i')
+        self._seg_version = array('i')
+        self._seg_end = array('q')
+        self._seg_start = []
+        self._seg_stop = []
+        self._seg_ball = []
+
+        self._add_segment(SEG_INITIAL, -1, 1)
+        if plan is not None:
+            for _ in self.simulate(plan, on_step):
+                pass
+
+    def __len__(self):
+        return self._seg_end[-1]
+
+    def __getitem__(self, k):
+        n = len(self)
+        if k < 0:
+            k += n
+        if not 0 <= k < n:
+            raise IndexError("frame index out of range")
+        s = bisect_right(self._seg_end, k)
+        first = self._seg_end[s - 1] if s else 0
+        with self.lock:
+            return self._frame(s, k - first)
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
+
+    @property
+    def step_count(self):
+        return len(self.table)
+
+    def frame_at(self, position):
+        """Frame at fractional index ``position``, interpolated between substeps.
+
+        Used by time-based playback, which can land between (or skip) frames,
+        so the step text is always filled in rather than only on a step's
+        first frame.
+        """
+        k = min(max(int(position), 0), len(self) - 1)
+        s = bisect_right(self._seg_end, k)
+        first = self._seg_end[s - 1] if s else 0
+        with self.lock:
+            frame = self._frame(s, min(max(position - first, 0), self._seg_end[s] - first - 1))
+        frame['step_text'] = self._step_text(s) or self._step_text(s - 1)
+        return frame
+
+    def frame_of_step(self, step):
+        """Index of the first frame of plan step ``step`` (0 is the initial state)."""
+        if step <= 0:
+            return 0
+        s = bisect_left(self._seg_row, step - 1)
+        if s == len(self._seg_row):
+            return len(self)
+        return self._seg_end[s - 1]
+
+    def step_of_frame(self, k):
+        """Plan step (1-based, 0 for the initial state) frame ``k`` belongs to."""
+        if k < 0:
+            k += len(self)
+        return self._seg_row[bisect_right(self._seg_end, k)] + 1
+
+    def _set(self, target, key, value):
+        """Apply one change to the simulation state and record it in the timeline."""
+        world = self.world
+        if self.view is not None:
+            self.view.update(target, key, value)
+        if target == SNOW:
+            r, c = key
+            key = r * world.grid.cols + c
+        elif target == CHARACTER:
+            key = 0
+            self.state['character'] = value
+        else:
+            key = world.ball_id(key)
+        self.timeline.record(target, key, value)
+        world.apply(target, key, value)
+
+    def _add_segment(self, kind, row, count, start=None, stop=None, ball=None):
+        self._seg_kind.append(kind)
+        self._seg_row.append(row)
+        self._seg_version.append(len(self.timeline))
+        self._seg_end.append((self._seg_end[-1] if self._seg_end else 0) + count)
+        self._seg_start.append(start)
+        self._seg_stop.append(stop)
+        self._seg_ball.append(ball)
+
+    def simulate(self, plan, on_step=None):
+        """Apply ``plan`` step by step, yielding after each step's frames exist.
+
+        ``on_step(table, i, state, grew)`` is called after each successfully
+        applied action (once the caller resumes the generator) with the live
+        simulation state.
+        """
+        if isinstance(plan, ActionTable):
+            self.table = table = plan
+            rows = range(len(table))
+        else:
+            table = self.table
+            rows = (table.append(action) for action in plan)
+        locations = table.locations
+        balls = table.balls
+        state = self.state
+        world = self.world
+        substeps = self.substeps
+
+        for i in rows:
+            op = table.opcode[i]
+            grew = False
+
+            try:
+                if self.transitions is not None:
+                    grew = self._apply_transition(table, i)
+                elif op == OP_MOVE_CHARACTER:
+                    a, b = table.loc_a[i], table.loc_b[i]
+                    if a == NO_ID or b == NO_ID:
+                        raise ValueError(f"Invalid move action: {table.text(i)}")
+                    start = locations[a]
+                    end = locations[b]
+                    self._add_segment(SEG_CHAR_MOVE, i, substeps, start, end)
+                    self._set(CHARACTER, None, end)
+
+                elif op == OP_MOVE_BALL:
+                    a, c = table.loc_a[i], table.loc_c[i]
+                    if table.ball[i] == NO_ID or a == NO_ID or c == NO_ID:
+                        raise ValueError(f"Invalid move_ball action: {table.text(i)}")
+                    ball = balls[table.ball[i]]
+                    start = locations[a]
+                    end = locations[c]
+
+                    self._add_segment(SEG_APPROACH, i, substeps, state['character'], start)
+                    self._set(CHARACTER, None, start)
+                    self._add_segment(SEG_BALL_MOVE, i, substeps, start, end, ball)
+
+                    self._set(POSITION, ball, end)
+                    if world.has_snow(*end):
+                        size = world.size(world.ids[ball])
+                        if size is None:
+                            raise KeyError(ball)
+                        self._set(SIZE, ball, min(size + 1, 2))
+                        grew = size < 2
+                        self._set(SNOW, end, False)
+
+                elif op == OP_GOAL:
+                    if not state.get('is_numeric', False):
+                        balls_at_goal = [b for b, pos in state['balls'].items() if pos == (2, 0)]
+                        if len(balls_at_goal) >= 3:
+                            self._set(SIZE, balls_at_goal[0], 2)
+                            self._set(SIZE, balls_at_goal[1], 1)
+                            self._set(SIZE, balls_at_goal[2], 0)
+                    else:
+                        balls_at_goal = [(b, state['ball_size'][b]) for b, pos in state['balls'].items() if pos == (2, 0)]
+                        if len(balls_at_goal) >= 3:
+                            balls_at_goal.sort(key=lambda x: x[1])
+                            for idx, (ball, _) in enumerate(balls_at_goal):
+                                self._set(SIZE, ball, idx)
+                    self._add_segment(SEG_GOAL, i, substeps)
                 else:
-                    balls_at_goal = [(b, state['ball_size'][b]) for b, pos in state['balls'].items() if pos == (2, 0)]
-                    if len(balls_at_goal) >= 3:
-                        balls_at_goal.sort(key=lambda x: x[1])
-                        for idx, (ball, _) in enumerate(balls_at_goal):
-                            state['ball_size'][ball] = idx
-                            
-                for t in range(SUBSTEPS):
-                    frame = {
-                        'type': 'goal',
-                        'balls': state['balls'].copy(),
-                        'ball_size': state['ball_size'].copy(),
-                        'snow': state['snow'].copy(),
-                        'character': state['character'],
-                        'grid_size': state['grid_size'],
-                        'blocked_cells': state['blocked_cells'],
-                        'step_text': step_label if t == 0 else None
-                    }
-                    frames.append(frame)
-            else:
-                for t in range(SUBSTEPS):
-                    frame = {
-                        'type': 'static',
-                        'balls': state['balls'].copy(),
-                        'ball_size': state['ball_size'].copy(),
-                        'snow': state['snow'].copy(),
-                        'character': state['character'],
-                        'grid_size': state['grid_size'],
-                        'blocked_cells': state['blocked_cells'],
-                        'step_text': f"Unknown action: {action}" if t == 0 else None
-                    }
-                    frames.append(frame)
-                
+                    self._add_segment(SEG_STATIC, i, substeps)
+
+            except Exception:
+                self._add_segment(SEG_ERROR, i, substeps)
+                yield i
+                continue
+
+            yield i
+            if on_step is not None:
+                on_step(table, i, state, grew)
+
+    def _apply_transition(self, table, i):
+        """Simulate row ``i`` with the compiled domain action; returns whether a ball grew."""
+        verb = table.verb[i]
+        action = self._verb_actions.get(verb, False)
+        if action is False:
+            action = self._verb_actions[verb] = self.transitions.get(table.symbols.names[verb].lower())
+        substeps = self.substeps
+        if action is None:
+            self._add_segment(SEG_STATIC, i, substeps)
+            return False
+
+        view = self.view
+        names = table.symbols.names
+        env = action.bind([names[s] for s in table.args[table.arg_start[i]:table.arg_start[i + 1]]], view)
+        if env is None or not action.applicable(view, env):
+            raise ValueError(f"Inapplicable action: {table.text(i)}")
+        changes, goal = action.apply(view, env)
+
+        character = view.character
+        moved = None
+        walked = False
+        grew = False
+        for target, key, value in changes:
+            if target == POSITION and value is not None:
+                if moved is None:
+                    moved = []
+                moved.append((key, value))
+            elif target == CHARACTER:
+                walked = True
+                end = value
+            elif target == SIZE:
+                grew = grew or value > view.sizes.get(key, 0)
+        if moved is not None:
+            # The character walks to its pushing cell first and stays there
+            # while the balls roll, as with the built-in rules.
+            self._add_segment(SEG_APPROACH, i, substeps, character, end if walked else character)
+            if walked:
+                self._set(CHARACTER, None, end)
+            for ball, stop in moved:
+                self._add_segment(SEG_BALL_MOVE, i, substeps, view.positions.get(ball), stop, ball)
+        elif walked:
+            self._add_segment(SEG_CHAR_MOVE, i, substeps, character, end)
+        else:
+            self._add_segment(SEG_GOAL if goal else SEG_NOOP, i, substeps)
+
+        for target, key, value in changes:
+            if target != CHARACTER or moved is None:
+                self._set(target, key, value)
+        return grew
+
+    def _seek(self, version):
+        timeline = self.timeline
+        if abs(version - self._version) > SEEK_REBUILD:
+            self._cursor = timeline.state_at(version)
+            self._version = version
+            return
+        cursor = self._cursor
+        targets, keys, values = timeline.targets, timeline.keys, timeline.values
+        while self._version < version:
+            k = self._version
+            cursor.apply(targets[k], keys[k], values[k])
+            self._version += 1
+        while self._version > version:
+            self._version -= 1
+            k = self._version
+            cursor.apply(targets[k], keys[k], timeline.value_at(targets[k], keys[k], k))
+
+    def _step_text(self, s):
+        kind = self._seg_kind[s]
+        if kind == SEG_INITIAL:
+            return 'Initial State'
+        if kind == SEG_BALL_MOVE:
+            return None
+        row = self._seg_row[s]
+        action = self.table.text(row)
+        if kind == SEG_STATIC:
+            return f"Unknown action: {action}"
+        if kind == SEG_ERROR:
+            return f"Error in action: {action}"
+        return f"Step {row + 1}: {action}"
+
+    def _frame(self, s, t):
+        kind = self._seg_kind[s]
+        self._seek(self._seg_version[s])
+        world = self._cursor.copy()
+        frame = {'type': SEG_TYPES[kind]}
+        if kind == SEG_BALL_MOVE:
+            frame['ball'] = self._seg_ball[s]
+        if kind in (SEG_CHAR_MOVE, SEG_APPROACH, SEG_BALL_MOVE):
+            frame['start'] = self._seg_start[s]
+            frame['end'] = self._seg_stop[s]
+            frame['alpha'] = min(t / (self.substeps - 1), 1.0) if self.substeps > 1 else 1.0
+        frame.update({
+            'balls': world.ball_map,
+            'ball_size': world.size_map,
+            'snow': world.snow_map,
+            'world': world,
+            'character': world.character,
+            'grid': self.grid,
+            'grid_size': self.grid_size,
+            'blocked_cells': self.blocked_cells,
+            'step_text': self._step_text(s) if t < 1 else None
+        })
+        return frame
+
+class PlaybackClock:
+    """Wall-clock playback position over ``frame_count`` frames.
+
+    While running, the (fractional) frame position advances at
+    ``frames_per_second * speed`` however often it is read, so a renderer
+    that falls behind skips frames instead of stretching the plan, and a
+    plan takes ``frame_count / (frames_per_second * speed)`` seconds at any
+    render rate. Seeking, pausing and speed changes re-anchor the clock at
+    the current position, so they take effect immediately.
+    """
+
+    def __init__(self, frame_count, frames_per_second, speed=1.0, clock=time.perf_counter):
+        self.frame_count = frame_count
+        self.frames_per_second = frames_per_second
+        self.speed = speed
+        self.clock = clock
+        self.running = False
+        self._anchor_position = 0.0
+        self._anchor_time = clock()
+
+    @property
+    def last(self):
+        return max(self.frame_count - 1, 0)
+
+    @property
+    def position(self):
+        position = self._anchor_position
+        if self.running:
+            position += (self.clock() - self._anchor_time) * self.frames_per_second * self.speed
+        return min(position, self.last)
+
+    @property
+    def frame(self):
+        return int(self.position)
+
+    @property
+    def finished(self):
+        return self.position >= self.last
+
+    def _anchor(self, position):
+        self._anchor_position = position
+        self._anchor_time = self.clock()
+
+    def start(self):
+        if not self.running:
+            self._anchor(self._anchor_position)
+            self.running = True
+
+    def pause(self):
+        self._anchor(self.position)
+        self.running = False
+
+    def seek(self, position):
+        self._anchor(min(max(position, 0), self.last))
+
+    def set_speed(self, speed):
+        self._anchor(self.position)
+        self.speed = speed
+
+class PlaybackScheduler:
+    """The one playback loop of a Tk app, run on a widget's ``after`` timer.
+
+    It owns the ``PlaybackClock`` of the loaded plan (``load``), and play,
+    pause, seek and speed changes all go through it. While playing,
+    ``on_frame(position)`` runs every ``interval_ms``: ticks are scheduled
+    against a fixed grid of deadlines, so render time and timer lateness do
+    not add up into drift, and a tick that overran whole intervals skips
+    them rather than queueing catch-up calls. The tick is registered as a
+    Tcl command once and at most one ``after`` is ever pending; pausing
+    cancels it and playing re-arms it, so nothing piles up over a session.
+    """
+
+    def __init__(self, widget, on_frame, interval_ms=TICK_MS, clock=time.perf_counter):
+        self.widget = widget
+        self.on_frame = on_frame
+        self.interval = interval_ms / 1000
+        self.time = clock
+        self.clock = None
+        self._command = widget.register(self._tick)
+        self._job = None
+        self._deadline = 0.0
+
+    @property
+    def playing(self):
+        return self.clock is not None and self.clock.running
+
+    def load(self, clock):
+        """Switch to ``clock`` (or to nothing with ``None``), paused."""
+        self.pause()
+        self.clock = clock
+
+    def play(self):
+        if self.clock is None or self.playing:
+            return
+        self.clock.start()
+        self._deadline = self.time()
+        self._schedule()
+
+    def pause(self):
+        if self._job is not None:
+            self.widget.tk.call('after', 'cancel', self._job)
+            self._job = None
+        if self.clock is not None:
+            self.clock.pause()
+
+    def seek(self, position):
+        if self.clock is not None:
+            self.clock.seek(position)
+
+    def set_speed(self, speed):
+        if self.clock is not None:
+            self.clock.set_speed(speed)
+
+    def _schedule(self):
+        delay = max(self._deadline - self.time(), 0.0)
+        self._job = self.widget.tk.call('after', round(delay * 1000), self._command)
+
+    def _tick(self):
+        self._job = None
+        if not self.playing:
+            return
+        self.on_frame(self.clock.position)
+        # on_frame may have paused (end of plan), or paused and played again.
+        if not self.playing or self._job is not None:
+            return
+        now = self.time()
+        self._deadline += self.interval
+        if self._deadline < now:
+            self._deadline += (now - self._deadline) // self.interval * self.interval + self.interval
+        self._schedule()
+
+class FrameBuilder(threading.Thread):
+    """Parse a problem/plan pair and build its frames on a worker thread.
+
+    The sequence (``self.frames``, set once the problem is parsed) is
+    extended ``chunk`` plan steps at a time, under ``frames.lock`` for
+    ``LOCK_STEPS`` steps at a time and checking for cancellation in between;
+    after each chunk ``('progress', steps, frame_count)`` is put on
+    ``self.queue``, and the frames below ``frame_count`` are final from then
+    on. The build ends
+    with one of ``('done', steps, frame_count)``, ``('cancelled', steps,
+    frame_count)`` or ``('error', message, 0)``. ``on_step`` runs on the
+    worker thread; so does ``on_done(frames)``, whose return value is kept
+    as ``self.result``. Reading, parsing and building are timed into
+    ``timer`` (a ``StageTimer``). Files are only read on cache misses, the
+    plan in chunks; parses served by ``cache`` count as parsing.
+    """
+
+    def __init__(self, problem_path, plan_path, on_step=None, on_done=None, cache=None,
+                 substeps=SUBSTEPS, chunk=BUILD_CHUNK, domain_path=None, timer=None):
+        super().__init__(daemon=True)
+        self.problem_path = problem_path
+        self.plan_path = plan_path
+        self.domain_path = domain_path
+        self.on_step = on_step
+        self.on_done = on_done
+        self.cache = cache
+        self.substeps = substeps
+        self.chunk = chunk
+        self.timer = timer if timer is not None else StageTimer()
+        self.queue = queue.Queue()
+        self.cancelled = threading.Event()
+        self.problem = None
+        self.frames = None
+        self.total = 0
+        self.result = None
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def _load(self, kind, path, parse):
+        if self.cache is None:
+            return parse(path)
+        return self.cache.load(kind, path, parse)
+
+    def _parse_problem(self, path):
+        with self.timer.span('file_read'):
+            text = read_text(path)
+        return parse_problem_text(text)
+
+    def _parse_plan(self, path):
+        return parse_plan_table(path, iter_lines(path, self.timer))
+
+    def run(self):
+        timer = self.timer
+        try:
+            with timer.span('problem_parse'):
+                self.problem = self._load('problem', self.problem_path, self._parse_problem)
+                domain = parse_domain(self.domain_path) if self.domain_path else None
+            with timer.span('plan_parse'):
+                table = self._load('actions', self.plan_path, self._parse_plan)
+            self.total = len(table)
+            with timer.span('frame_build'):
+                frames = self.frames = FrameSequence(self.problem, substeps=self.substeps, domain=domain)
+                steps = frames.simulate(table, self.on_step)
+            done = 0
+            finished = False
+            while not finished:
+                count = 0
+                with timer.span('frame_build'):
+                    # The lock is only held for LOCK_STEPS steps at a time so
+                    # the UI thread can read frames in between.
+                    while count < self.chunk and not self.cancelled.is_set():
+                        want = min(LOCK_STEPS, self.chunk - count)
+                        with frames.lock:
+                            got = sum(1 for _ in islice(steps, want))
+                        count += got
+                        if got < want:
+                            finished = True
+                            break
+                done += count
+                if self.cancelled.is_set():
+                    self.queue.put(('cancelled', done, len(frames)))
+                    return
+                if not finished:
+                    self.queue.put(('progress', done, len(frames)))
+            if self.on_done is not None:
+                self.result = self.on_done(frames)
+            self.queue.put(('done', done, len(frames)))
         except Exception as e:
-            for t in range(SUBSTEPS):
-                frame = {
-                    'type': 'error',
-                    'balls': state['balls'].copy(),
-                    'ball_size': state['ball_size'].copy(),
-                    'snow': state['snow'].copy(),
-                    'character': state['character'],
-                    'grid_size': state['grid_size'],
-                    'blocked_cells': state['blocked_cells'],
-                    'step_text': f"Error in action: {action}" if t == 0 else None
-                }
-                frames.append(frame)
-            continue
-    
-    return frames
+            self.queue.put(('error', str(e), 0))
 
-def draw(ax, frame, step_text_artist):
-    ax.clear()
-    ax.axis('off')
-    grid = frame['grid_size']
-    ax.set_xlim(-0.5, grid - 0.5)
-    ax.set_ylim(-0.5, grid - 0.5)
-    
-    blocked_cells = frame.get('blocked_cells', set())
-    
-    for r in range(grid):
-        for c in range(grid):
-            coord = (r, c)
-            x, y = coord_to_plot(coord, grid)
-            
-            if coord in blocked_cells:
-                color = '#2F2F2F'
-                edge_color = 'black'
-                edge_width = 2
-            else:
-                is_snow = frame['snow'].get(coord, False)
-                color = '#E0FFFF' if is_snow else '#90EE90'
-                edge_color = 'black'
-                edge_width = 1
-            
-            ax.add_patch(patches.Rectangle((x - 0.5, y - 0.5), 1, 1, 
-                                         facecolor=color, edgecolor=edge_color, 
-                                         linewidth=edge_width, alpha=0.8))
-            
-            if coord not in blocked_cells:
-                ax.text(x, y + 0.4, f"({r+1},{c+1})", ha='center', va='center', 
-                        fontsize=6, color='gray')
+def speed_from_slider(val):
+    """Speed multiplier for a 0-100 slider value (50 is 1x)."""
+    return MIN_SPEED * (MAX_SPEED / MIN_SPEED) ** (int(val) / 100)
+
+def iter_frames(prob, plan, substeps=SUBSTEPS, on_step=None, domain=None):
+    """Yield animation frames for ``plan`` (action strings or an ActionTable).
+
+    ``plan`` is consumed lazily. ``on_step(table, i, state, grew)`` is called
+    after each successfully applied action with the live simulation state.
+    """
+    frames = FrameSequence(prob, substeps=substeps, domain=domain)
+    steps = frames.simulate(plan, on_step)
+    yield frames[0]
+    sent = 1
+    for _ in steps:
+        while sent < len(frames):
+            yield frames[sent]
+            sent += 1
+
+def build_frames(prob, plan, substeps=SUBSTEPS, on_step=None, domain=None):
+    """Return a lazy ``FrameSequence`` for ``plan``."""
+    return FrameSequence(prob, plan, substeps, on_step, domain)
+
+CELL_COLOR = '#90EE90'
+SNOW_CELL_COLOR = '#E0FFFF'
+BLOCKED_COLOR = '#2F2F2F'
+CELL_ALPHA = 0.8
+BALL_RADIUS = {0: 0.15, 1: 0.2, 2: 0.25}
+BALL_STACK_OFFSET = 0.15
+# Level of detail: on-screen cell size (pixels) below which coordinate
+# labels, then character/ball/blocked details, then cell borders are dropped.
+LABEL_MIN_PX = 30
+DETAIL_MIN_PX = 20
+BORDER_MIN_PX = 4
+ZOOM_STEP = 1.25
+
+def _letter_path(letter, size=8):
+    """Glyph outline of ``letter`` in points, centered on the origin."""
+    path = TextPath((0, 0), letter, size=size, prop=FontProperties(weight='bold'))
+    center = path.get_extents().get_points().mean(axis=0)
+    return Path(path.vertices - center, path.codes)
+
+BALL_LETTERS = [_letter_path(letter) for letter in 'SML']
+
+class FrameCache:
+    """Least recently used rasterized frames, capped at ``max_bytes``.
+
+    Values are canvas regions from ``copy_from_bbox``; keys are up to the
+    caller (frame index plus whatever else is baked into the pixels).
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._regions = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._regions
+
+    def __len__(self):
+        return len(self._regions)
+
+    def get(self, key):
+        region = self._regions.get(key)
+        if region is not None:
+            self._regions.move_to_end(key)
+        return region
+
+    def put(self, key, region):
+        self.pop(key)
+        size = np.asarray(region).nbytes
+        while self._regions and self.nbytes + size > self.max_bytes:
+            self.pop(next(iter(self._regions)))
+        if size <= self.max_bytes:
+            self._regions[key] = region
+            self.nbytes += size
+
+    def pop(self, key):
+        region = self._regions.pop(key, None)
+        if region is not None:
+            self.nbytes -= np.asarray(region).nbytes
+
+    def clear(self):
+        self._regions.clear()
+        self.nbytes = 0
+
+def rgba_bytes(colors, alpha=None):
+    """``len(colors) x 4`` uint8 RGBA array for matplotlib color specs."""
+    return np.array([[round(v * 255) for v in to_rgba(color, alpha)] for color in colors], dtype=np.uint8)
+
+class Renderer:
+    """Draws frames onto ``ax`` with artists that persist between frames.
+
+    The board (terrain image, cell borders and coordinates, blocked
+    markers, legend), the character and the ball collections are created
+    once per grid, so drawing stays a handful of artists however many balls
+    there are. ``draw`` only moves them and rewrites the terrain pixels of
+    cells whose snow changed. ``reset`` clears the axes and forgets the
+    artists, for when something else has drawn on ``ax``.
+
+    Only what is inside the view gets drawn: borders, coordinate labels,
+    blocked markers and entities are culled to the visible cells and
+    simplified as cells shrink on screen (see ``LABEL_MIN_PX`` and friends),
+    and are refreshed whenever the limits or the figure size change, so
+    panning and zooming (``zoom``, or the toolbar) stay cheap on huge grids.
+
+    With ``cache_bytes`` shown frames can be kept rasterized in a
+    ``FrameCache``: ``show(key=...)`` puts a cached frame back with a single
+    blit, and ``render`` fills the cache off screen. The cache is dropped
+    whenever the board or the view changes.
+
+    With a ``timer`` (a ``StageTimer``) every ``draw`` + ``show`` is timed:
+    the first one after the board is built as ``first_draw``, later ones as
+    ``frame_draw``, and pushing the result to the screen (``canvas.blit``)
+    as ``canvas_flush``. A full canvas redraw flushes internally, so it
+    counts entirely as drawing.
+
+    ``show`` puts the drawn frame on screen. With ``blit`` the character,
+    ball collections and step text are animated artists: the rest of the
+    figure is cached as a background after each full draw and every
+    ``show`` only restores it, draws those artists and blits. A snow change
+    invalidates the background, so the next ``show`` does one full draw.
+    """
+
+    def __init__(self, ax, step_text_artist=None, blit=False, cache_bytes=0, timer=None):
+        self.ax = ax
+        self.step_text_artist = step_text_artist
+        # ``ax.clear`` drops a step text drawn in the axes; it is re-added on rebuild.
+        self._step_text_in_ax = step_text_artist is not None and step_text_artist.axes is ax
+        self.grid = None
+        self.blit = blit
+        self.background = None
+        self.animated = []
+        self.overlays = []
+        self.frame = None
+        self.cache = FrameCache(cache_bytes) if cache_bytes else None
+        self.timer = timer
+        self._first_show = False
+        self._draw_seconds = 0.0
+        self._flush_seconds = 0.0
+        if blit:
+            ax.figure.canvas.mpl_connect('draw_event', self._on_draw)
+        ax.figure.canvas.mpl_connect('resize_event', self._update_view)
+
+    def reset(self):
+        self.ax.clear()
+        self.grid = None
+        self.frame = None
+        if self.cache is not None:
+            self.cache.clear()
+        self.background = None
+        self.animated = []
+        for artist in self.overlays:
+            artist.set_animated(False)
+        self.overlays = []
+
+    def draw(self, frame):
+        start = time.perf_counter()
+        if frame['grid'] is not self.grid:
+            self._build(frame['grid'])
+            self._first_show = True
+        self.frame = frame
+        self._draw_cells(frame['world'].snow)
+        self._draw_character(frame)
+        self._draw_balls(frame)
+        if self.step_text_artist is not None:
+            self.step_text_artist.set_text(frame.get('step_text'))
+        self._draw_seconds += time.perf_counter() - start
+
+    def zoom(self, factor, x=None, y=None):
+        """Scale the view by ``factor`` (below 1 zooms in) around ``(x, y)``, kept on the grid."""
+        if self.grid is None:
+            return
+        ax = self.ax
+        limits = []
+        for (lo, hi), center, size in ((ax.get_xlim(), x, self.grid.cols),
+                                       (ax.get_ylim(), y, self.grid.rows)):
+            center = (lo + hi) / 2 if center is None else center
+            lo, hi = center - (center - lo) * factor, center + (hi - center) * factor
+            if hi - lo >= size:
+                lo, hi = -0.5, size - 0.5
+            elif lo < -0.5:
+                lo, hi = -0.5, hi - lo - 0.5
+            elif hi > size - 0.5:
+                lo, hi = lo - hi + size - 0.5, size - 0.5
+            limits.append((lo, hi))
+        ax.set_xlim(*limits[0])
+        ax.set_ylim(*limits[1])
+
+    def show(self, *overlays, key=None):
+        """Put the last drawn frame on screen.
+
+        ``overlays`` are figure artists that change along with the frame,
+        such as a progress title; when blitting they are redrawn with it.
+        With a ``key`` the frame is taken from, or else added to, the frame
+        cache; the key must identify everything drawn, overlays included.
+        """
+        start = time.perf_counter()
+        self._show(overlays, key)
+        if self.timer is not None and self.grid is not None:
+            drawn = self._draw_seconds + time.perf_counter() - start - self._flush_seconds
+            self.timer.add('first_draw' if self._first_show else 'frame_draw', drawn)
+            if self._flush_seconds:
+                self.timer.add('canvas_flush', self._flush_seconds)
+            self._first_show = False
+        self._draw_seconds = self._flush_seconds = 0.0
+
+    def _show(self, overlays, key):
+        canvas = self.ax.figure.canvas
+        bbox = self.ax.figure.bbox
+        caching = key is not None and self._caches(canvas)
+        if caching:
+            region = self.cache.get(key)
+            if region is not None:
+                canvas.restore_region(region)
+                self._flush(canvas)
+                return
+        if not self.blit or self.grid is None or not canvas.supports_blit:
+            canvas.draw()
+        else:
+            self._add_overlays(overlays)
+            if self.background is None:
+                # The draw event caches the new background and draws the rest.
+                canvas.draw()
             else:
-                ax.text(x, y, '■', ha='center', va='center', 
-                        fontsize=20, color='red', weight='bold')
-    
-    if frame['character'] is not None:
-        if frame['type'] == 'char_move':
-            sx, sy = coord_to_plot(frame['start'], grid)
-            ex, ey = coord_to_plot(frame['end'], grid)
-            cx = sx + frame['alpha'] * (ex - sx)
-            cy = sy + frame['alpha'] * (ey - sy)
+                canvas.restore_region(self.background)
+                self._draw_animated(canvas.get_renderer())
+                self._flush(canvas)
+        if caching:
+            self.cache.put(key, canvas.copy_from_bbox(bbox))
+
+    def _flush(self, canvas):
+        start = time.perf_counter()
+        canvas.blit(self.ax.figure.bbox)
+        self._flush_seconds += time.perf_counter() - start
+
+    def render(self, frame, *overlays, key):
+        """Rasterize ``frame`` into the frame cache without showing it.
+
+        Only the canvas buffer is touched, nothing is timed, and the artists
+        go back to the last drawn frame afterwards (overlays are left as the
+        caller set them). Returns whether anything was rendered.
+        """
+        canvas = self.ax.figure.canvas
+        if not self._caches(canvas) or key in self.cache or not isinstance(canvas, FigureCanvasAgg):
+            return False
+        shown, pending = self.frame, self._draw_seconds
+        self.draw(frame)
+        if self.blit:
+            self._add_overlays(overlays)
+        if self.blit and self.background is not None:
+            canvas.restore_region(self.background)
+            self._draw_animated(canvas.get_renderer())
         else:
-            cx, cy = coord_to_plot(frame['character'], grid)
-        
-        char_head = patches.Circle((cx, cy + 0.05), 0.07, 
-                                   facecolor='#FFDAB9', edgecolor='black', 
-                                   linewidth=1.5, zorder=12)
-        ax.add_patch(char_head)
-        ax.add_patch(patches.Arc((cx, cy + 0.03), 0.04, 0.02, angle=0, theta1=200, theta2=340, 
-             color='black', linewidth=1, zorder=13))
-
-        ax.add_patch(patches.Rectangle((cx - 0.03, cy - 0.25), 0.03, 0.1, 
-                                     facecolor='#0000FF', edgecolor='#00008B', zorder=12))
-        ax.add_patch(patches.Rectangle((cx + 0.01, cy - 0.25), 0.03, 0.1, 
-                                     facecolor='#0000FF', edgecolor='#00008B', zorder=12))
-        
-        ax.add_patch(patches.Rectangle((cx - 0.06, cy - 0.15), 0.12, 0.14, 
-                                     facecolor='#FF0000', edgecolor='#8B0000', 
-                                     linewidth=2, zorder=12))
-        
-        ax.add_patch(patches.Circle((cx - 0.02, cy + 0.07), 0.01, 
-                                   facecolor='black', zorder=13))
-        ax.add_patch(patches.Circle((cx + 0.02, cy + 0.07), 0.01, 
-                                   facecolor='black', zorder=13))
-    
-    ball_positions = {}
-    for ball, pos in frame['balls'].items():
-        if frame['type'] == 'ball_move' and frame['ball'] == ball:
-            start_pos = frame['start']
-            end_pos = frame['end']
-            alpha = frame['alpha']
-            ball_r = start_pos[0] + alpha * (end_pos[0] - start_pos[0])
-            ball_c = start_pos[1] + alpha * (end_pos[1] - start_pos[1])
-            pos = (ball_r, ball_c)
-        
-        if pos not in ball_positions:
-            ball_positions[pos] = []
-        ball_positions[pos].append((ball, frame['ball_size'][ball]))
-    
-    for pos, balls_here in ball_positions.items():
-        balls_here.sort(key=lambda x: x[1], reverse=True)
-        x, y = coord_to_plot(pos, grid)
-        
-        for i, (ball, size) in enumerate(balls_here):
-            offset_y = i * 0.15
-            size_map = {0: 0.15, 1: 0.2, 2: 0.25}
-            radius = size_map[size]
-            
-            ax.add_patch(patches.Circle((x, y + offset_y), radius, 
-                                      facecolor='white', edgecolor='black', linewidth=1))
-            ax.text(x, y + offset_y, ['S', 'M', 'L'][size], ha='center', va='center', 
-                   fontsize=8, color='black', weight='bold')
-    
-    text = frame.get('step_text')
-    step_text_artist.set_text(text)
-    
-    legend_elements = [
-        patches.Patch(color='#90EE90', label='Regular Cell'),
-        patches.Patch(color='#E0FFFF', label='Snow Cell'),
-        patches.Patch(color='#2F2F2F', label='Blocked Cell'),
-        patches.Circle((0, 0), 0.1, facecolor='#FFDAB9', edgecolor='orange', label='Character'),
-        patches.Circle((0, 0), 0.1, facecolor='white', edgecolor='black', label='Snow balls'),
-    ]
-    ax.legend(handles=legend_elements, loc='lower right', bbox_to_anchor=(1.00, -0.2))
-
-def save_metrics_to_csv(metrics):
+            FigureCanvasAgg.draw(canvas)
+        self.cache.put(key, canvas.copy_from_bbox(self.ax.figure.bbox))
+        if shown is not None:
+            self.draw(shown)
+        self._draw_seconds = pending
+        return True
+
+    def _caches(self, canvas):
+        return self.cache is not None and self.grid is not None and canvas.supports_blit
+
+    def _add_overlays(self, overlays):
+        for artist in overlays:
+            if artist not in self.overlays:
+                self._animate(artist)
+                self.overlays.append(artist)
+                self.background = None
+
+    def _animate(self, artist):
+        if self.blit:
+            artist.set_animated(True)
+            self.animated.append(artist)
+
+    def _on_draw(self, event):
+        if self.grid is None:
+            return
+        canvas = event.canvas
+        if not canvas.is_saving():
+            self.background = canvas.copy_from_bbox(self.ax.figure.bbox)
+        self._draw_animated(event.renderer)
+
+    def _draw_animated(self, renderer):
+        for artist in sorted(self.animated, key=Artist.get_zorder):
+            artist.draw(renderer)
+
+    def _build(self, grid):
+        ax = self.ax
+        ax.clear()
+        ax.axis('off')
+        rows = grid.rows
+        self.grid = grid
+
+        # Terrain is one RGBA image, row 0 at the top like coord_to_plot.
+        cols = grid.cols
+        self._valid = np.frombuffer(grid.valid, dtype=np.uint8).reshape(rows, cols) == 1
+        self._terrain_colors = rgba_bytes([CELL_COLOR, SNOW_CELL_COLOR], CELL_ALPHA)
+        self._terrain = np.empty((rows, cols, 4), dtype=np.uint8)
+        self._terrain[:] = rgba_bytes([BLOCKED_COLOR], CELL_ALPHA)[0]
+        self._snow = None
+        self.background = None
+        self.animated = []
+        self.terrain = ax.imshow(self._terrain, origin='upper', interpolation='nearest', aspect='auto',
+                                 extent=(-0.5, cols - 0.5, -0.5, rows - 0.5))
+        ax.set_xlim(-0.5, cols - 0.5)
+        ax.set_ylim(-0.5, rows - 0.5)
+
+        # Borders, labels and blocked markers only cover the visible cells;
+        # _update_view fills them in.
+        self.borders = LineCollection([], colors='black', linewidths=1, alpha=CELL_ALPHA)
+        ax.add_collection(self.borders)
+        self.labels = []
+        self.blocked_markers, = ax.plot([], [], linestyle='none', marker='s', markersize=11, color='red')
+
+        # The character is one collection laid out around (0, 0) and moved by
+        # updating the translation in front of transData.
+        self._char_offset = Affine2D()
+        self.character = PatchCollection([
+            patches.Circle((0, 0.05), 0.07, facecolor='#FFDAB9', edgecolor='black', linewidth=1.5),
+            patches.Rectangle((-0.03, -0.25), 0.03, 0.1, facecolor='#0000FF', edgecolor='#00008B'),
+            patches.Rectangle((0.01, -0.25), 0.03, 0.1, facecolor='#0000FF', edgecolor='#00008B'),
+            patches.Rectangle((-0.06, -0.15), 0.12, 0.14, facecolor='#FF0000',
+                              edgecolor='#8B0000', linewidth=2),
+            patches.Arc((0, 0.03), 0.04, 0.02, angle=0, theta1=200, theta2=340,
+                        color='black', linewidth=1),
+            patches.Circle((-0.02, 0.07), 0.01, facecolor='black'),
+            patches.Circle((0.02, 0.07), 0.01, facecolor='black'),
+        ], match_original=True, zorder=12)
+        self.character.set_transform(self._char_offset + ax.transData)
+        ax.add_collection(self.character)
+        self._animate(self.character)
+        # Stand-in when the cells are too small to make out the figure.
+        self.character_dot = patches.Circle((0, 0), 0.35, facecolor='#FF0000', edgecolor='#8B0000',
+                                            zorder=12, transform=self._char_offset + ax.transData)
+        ax.add_patch(self.character_dot)
+        self._animate(self.character_dot)
+
+        # All balls are two collections: circles sized in data units and the
+        # size letters, glyph paths in points placed at the ball centers.
+        self.ball_circles = EllipseCollection([], [], 0, units='xy', offsets=np.empty((0, 2)),
+                                              offset_transform=ax.transData, facecolor='white',
+                                              edgecolor='black', linewidth=1)
+        self.ball_letters = PathCollection(BALL_LETTERS, sizes=[1], offsets=np.empty((0, 2)),
+                                           offset_transform=ax.transData,
+                                           transform=IdentityTransform(), facecolor='black',
+                                           edgecolor='none', zorder=3)
+        ax.add_collection(self.ball_circles)
+        ax.add_collection(self.ball_letters)
+        self._animate(self.ball_circles)
+        self._animate(self.ball_letters)
+
+        if self._step_text_in_ax:
+            ax.add_artist(self.step_text_artist)
+        if self.step_text_artist is not None:
+            self._animate(self.step_text_artist)
+        for artist in self.overlays:
+            self._animate(artist)
+        legend_elements = [
+            patches.Patch(color=CELL_COLOR, label='Regular Cell'),
+            patches.Patch(color=SNOW_CELL_COLOR, label='Snow Cell'),
+            patches.Patch(color=BLOCKED_COLOR, label='Blocked Cell'),
+            patches.Circle((0, 0), 0.1, facecolor='#FFDAB9', edgecolor='orange', label='Character'),
+            patches.Circle((0, 0), 0.1, facecolor='white', edgecolor='black', label='Snow balls'),
+        ]
+        ax.legend(handles=legend_elements, loc='lower right', bbox_to_anchor=(1.00, -0.2))
+
+        self.view = None
+        self.bounds = None
+        self.detail = True
+        ax.callbacks.connect('xlim_changed', self._update_view)
+        ax.callbacks.connect('ylim_changed', self._update_view)
+        self._update_view()
+
+    def _update_view(self, *_):
+        """Re-cull and re-pick the detail level after the limits or the figure size changed."""
+        if self.grid is None:
+            return
+        if self.cache is not None:
+            self.cache.clear()
+        ax = self.ax
+        x0, x1 = sorted(ax.get_xlim())
+        y0, y1 = sorted(ax.get_ylim())
+        px = min(ax.bbox.width / (x1 - x0), ax.bbox.height / (y1 - y0))
+        rows, cols = self.grid.rows, self.grid.cols
+        # Visible cells, half-open: column c spans x in [c - 0.5, c + 0.5],
+        # row r spans y in [rows - 1 - r - 0.5, rows - 1 - r + 0.5].
+        c0, c1 = max(int(np.floor(x0 + 0.5)), 0), min(int(np.ceil(x1 + 0.5)), cols)
+        r0, r1 = max(int(np.floor(rows - 1 - y1 + 0.5)), 0), min(int(np.ceil(rows - 1 - y0 + 0.5)), rows)
+        self.bounds = (x0, x1, y0, y1)
+        view = (r0, r1, c0, c1, bool(px >= LABEL_MIN_PX), bool(px >= DETAIL_MIN_PX), bool(px >= BORDER_MIN_PX))
+        if view != self.view:
+            self.view = view
+            self.detail = view[5]
+            self._draw_board(*view)
+            self.background = None
+        if self.frame is not None:
+            self._draw_character(self.frame)
+            self._draw_balls(self.frame)
+
+    def _draw_board(self, r0, r1, c0, c1, labels, detail, borders):
+        rows = self.grid.rows
+        if borders and r0 < r1 and c0 < c1:
+            top, bottom = rows - r0 - 0.5, rows - r1 - 0.5
+            segments = [((c - 0.5, bottom), (c - 0.5, top)) for c in range(c0, c1 + 1)]
+            segments += [((c0 - 0.5, rows - r - 0.5), (c1 - 0.5, rows - r - 0.5)) for r in range(r0, r1 + 1)]
+            self.borders.set_segments(segments)
+        else:
+            self.borders.set_segments([])
+
+        cells = np.argwhere(self._valid[r0:r1, c0:c1]) + (r0, c0) if labels else ()
+        while len(self.labels) < len(cells):
+            self.labels.append(self.ax.text(0, 0, '', ha='center', va='center', fontsize=6, color='gray',
+                                            clip_on=True))
+        for label, (r, c) in zip(self.labels, cells):
+            x, y = coord_to_plot((r, c), rows)
+            label.set_position((x, y + 0.4))
+            label.set_text(f"({r+1},{c+1})")
+            label.set_visible(True)
+        for label in self.labels[len(cells):]:
+            label.set_visible(False)
+
+        if detail:
+            blocked = np.argwhere(~self._valid[r0:r1, c0:c1]) + (r0, c0)
+            self.blocked_markers.set_data(blocked[:, 1], rows - 1 - blocked[:, 0])
+        else:
+            self.blocked_markers.set_data([], [])
+
+    def _in_view(self, x, y, margin=1.0):
+        x0, x1, y0, y1 = self.bounds
+        return x0 - margin <= x <= x1 + margin and y0 - margin <= y <= y1 + margin
+
+    def _draw_cells(self, snow):
+        if self._snow is None:
+            changed = self._valid
+        else:
+            changed = snow != self._snow
+            if not changed.any():
+                return
+            changed &= self._valid
+        rows, cols = np.nonzero(changed)
+        self._terrain[rows, cols] = self._terrain_colors[snow[rows, cols].astype(np.intp)]
+        self._snow = snow.copy()
+        self.terrain.set_data(self._terrain)
+        self.background = None
+
+    def _draw_character(self, frame):
+        visible = frame['character'] is not None
+        if visible:
+            rows = self.grid.rows
+            if frame['type'] == 'char_move':
+                sx, sy = coord_to_plot(frame['start'], rows)
+                ex, ey = coord_to_plot(frame['end'], rows)
+                cx = sx + frame['alpha'] * (ex - sx)
+                cy = sy + frame['alpha'] * (ey - sy)
+            else:
+                cx, cy = coord_to_plot(frame['character'], rows)
+            self._char_offset.clear().translate(cx, cy)
+            visible = self._in_view(cx, cy)
+        self.character.set_visible(visible and self.detail)
+        self.character_dot.set_visible(visible and not self.detail)
+
+    def _draw_balls(self, frame):
+        ball_positions = {}
+        for ball, pos in frame['balls'].items():
+            if frame['type'] == 'ball_move' and frame['ball'] == ball:
+                start_pos = frame['start']
+                end_pos = frame['end']
+                alpha = frame['alpha']
+                ball_r = start_pos[0] + alpha * (end_pos[0] - start_pos[0])
+                ball_c = start_pos[1] + alpha * (end_pos[1] - start_pos[1])
+                pos = (ball_r, ball_c)
+            ball_positions.setdefault(pos, []).append((ball, frame['ball_size'][ball]))
+
+        rows = self.grid.rows
+        centers, diameters, letters = [], [], []
+        for pos, balls_here in ball_positions.items():
+            balls_here.sort(key=lambda x: x[1], reverse=True)
+            x, y = coord_to_plot(pos, rows)
+            if not self._in_view(x, y):
+                continue
+            for i, (ball, size) in enumerate(balls_here):
+                centers.append((x, y + i * BALL_STACK_OFFSET))
+                diameters.append(2 * BALL_RADIUS[size])
+                letters.append(BALL_LETTERS[size])
+        offsets = np.array(centers, dtype=float).reshape(-1, 2)
+        self.ball_circles.set_offsets(offsets)
+        self.ball_circles.set_widths(diameters)
+        self.ball_circles.set_heights(diameters)
+        self.ball_letters.set_offsets(offsets)
+        self.ball_letters.set_paths(letters)
+        self.ball_letters.set_visible(self.detail)
+
+def draw(ax, frame, step_text_artist):
+    """Draw ``frame`` onto a cleared ``ax``; use a ``Renderer`` to draw many."""
+    Renderer(ax, step_text_artist).draw(frame)
+
+def save_metrics_to_csv(metrics, csv_path=os.path.join('data', 'metrics.csv')):
+    """Append ``metrics`` as a row; a file with other columns is rewritten under their union."""
     try:
-        os.makedirs('data', exist_ok=True)
-        csv_path = 'data/metrics.csv'
-        file_exists = os.path.isfile(csv_path)
-        
-        with open(csv_path, 'a', newline='') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=metrics.keys())
-            if not file_exists:
+        os.makedirs(os.path.dirname(csv_path) or '.', exist_ok=True)
+        columns = []
+        if os.path.isfile(csv_path):
+            with open(csv_path, newline='') as csvfile:
+                columns = next(csv.reader(csvfile), [])
+        fieldnames = columns + [key for key in metrics if key not in columns]
+        append = bool(columns) and fieldnames == columns
+        rows = []
+        if columns and not append:
+            with open(csv_path, newline='') as csvfile:
+                rows = list(csv.DictReader(csvfile))
+        with open(csv_path, 'a' if append else 'w', newline='') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames, restval='')
+            if not append:
                 writer.writeheader()
+                writer.writerows(rows)
             writer.writerow(metrics)
     except Exception:
-        pass
\ No newline at end of file
+        pass
@@ -0,0 +1,192 @@
+"""Headless export of plan animations on the Agg backend.
+
+Frames are rendered to numbered PNGs by worker processes, each building
+the plan's frames once and taking one contiguous share of the frame
+indices, and then stitched in index order into a GIF (Pillow) or an MP4
+(ffmpeg, only when it is installed). The ``png`` format keeps the image
+sequence itself.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
+
+from shared.cache import ParseCache, CACHE_DIR
+from shared.domain import find_domain, parse_domain
+from .core import FrameSequence, Renderer, SUBSTEPS, STEPS_PER_SECOND, parse_problem, parse_plan_table
+
+FORMATS = ('gif', 'png', 'mp4')
+FIGSIZE = (7, 5)
+DPI = 100
+FRAME_NAME = 'frame_%06d.png'
+
+def ffmpeg_path():
+    return shutil.which('ffmpeg')
+
+def load_frames(problem_path, plan_path, substeps=SUBSTEPS, cache_dir=CACHE_DIR):
+    """Parse a pair (through the parse cache) and return its ``FrameSequence``."""
+    if cache_dir:
+        cache = ParseCache(cache_dir)
+        problem = cache.load('problem', problem_path, parse_problem)
+        table = cache.load('actions', plan_path, parse_plan_table)
+    else:
+        problem = parse_problem(problem_path)
+        table = parse_plan_table(plan_path)
+    domain_path = find_domain(problem_path)
+    domain = parse_domain(domain_path) if domain_path else None
+    return FrameSequence(problem, table, substeps, domain=domain)
+
+def part_range(count, part, parts):
+    """Frame indices ``start, stop`` of share ``part`` of ``parts`` of ``count`` frames."""
+    return count * part // parts, count * (part + 1) // parts
+
+def render_part(problem_path, plan_path, part, parts, directory, fmt='png', substeps=SUBSTEPS,
+                cache_dir=CACHE_DIR, dpi=DPI):
+    """Render share ``part`` of ``parts`` of a pair's frames; runs in a worker process.
+
+    The plan is simulated once per call, however many frames the share
+    holds. Returns the pair's total frame count.
+    """
+    frames = load_frames(problem_path, plan_path, substeps, cache_dir)
+    start, stop = part_range(len(frames), part, parts)
+    render_range(frames, start, stop, directory, os.path.basename(plan_path), fmt, dpi)
+    return len(frames)
+
+def render_range(frames, start, stop, directory, title='', fmt='png', dpi=DPI):
+    """Render ``frames[start:stop]`` to numbered PNGs in ``directory``.
+
+    Frames bound for another format are intermediates: they are written
+    with light compression, and for ``gif`` already quantized, which keeps
+    the palette work on the workers instead of the stitching step.
+    """
+    fig = Figure(figsize=FIGSIZE, dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    fig.subplots_adjust(left=0.1, right=0.9, top=0.85, bottom=0.3)
+    fig.suptitle(title, fontsize=12, fontweight='bold')
+    step_text = ax.text(0.02, 0.98, "", transform=ax.transAxes, fontsize=11, verticalalignment='top',
+                        bbox=dict(boxstyle='round,pad=0.5', facecolor='white', alpha=0.9))
+    # Blitting works on Agg too: after the first frame only the moving
+    # artists are redrawn over the cached board.
+    renderer = Renderer(ax, step_text, blit=True)
+    size = canvas.get_width_height()
+    for k in range(start, stop):
+        renderer.draw(frames[k])
+        renderer.show()
+        image = Image.frombuffer('RGBA', size, canvas.buffer_rgba(), 'raw', 'RGBA', 0, 1).convert('RGB')
+        if fmt == 'gif':
+            image = image.quantize(method=Image.Quantize.FASTOCTREE)
+        image.save(os.path.join(directory, FRAME_NAME % k), compress_level=6 if fmt == 'png' else 1)
+
+def stitch(directory, count, output, fmt, fps):
+    """Join ``count`` numbered PNGs from ``directory`` into ``output``, in order."""
+    paths = [os.path.join(directory, FRAME_NAME % k) for k in range(count)]
+    if fmt == 'gif':
+        first = Image.open(paths[0])
+        first.save(output, save_all=True, append_images=(Image.open(p) for p in paths[1:]),
+                   duration=round(1000 / fps), loop=0)
+    elif fmt == 'mp4':
+        subprocess.run([ffmpeg_path(), '-y', '-loglevel', 'error', '-framerate', str(fps),
+                        '-i', os.path.join(directory, FRAME_NAME), '-c:v', 'libx264',
+                        '-pix_fmt', 'yuv420p', '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', output],
+                       check=True)
+
+def _output_path(output_dir, plan_path, fmt):
+    stem = os.path.splitext(os.path.basename(plan_path))[0]
+    return os.path.join(output_dir, stem if fmt == 'png' else f"{stem}.{fmt}")
+
+def iter_export(pairs, output_dir, fmt='gif', workers=None, substeps=SUBSTEPS, fps=None,
+                parts=None, cache_dir=CACHE_DIR, dpi=DPI):
+    """Export every ``(problem, plan)`` pair, yielding one result per pair as it completes.
+
+    Each pair's frames are split into ``parts`` contiguous shares (default:
+    one per worker) rendered by a pool of ``workers`` processes shared by all
+    pairs (``workers=1`` renders in-process, in one share); a pair is
+    stitched once all its shares are on disk. Results hold ``problem``,
+    ``plan``, ``output``, ``frames``, ``seconds`` and ``error``; errors are
+    reported there, never raised.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}' (expected one of {', '.join(FORMATS)})")
+    if fmt == 'mp4' and ffmpeg_path() is None:
+        raise ValueError("ffmpeg was not found on PATH; export as gif or png instead")
+    fps = fps or STEPS_PER_SECOND * substeps
+    workers = workers or os.cpu_count() or 1
+    parts = 1 if workers == 1 else max(parts or workers, 1)
+    os.makedirs(output_dir, exist_ok=True)
+
+    def plan_jobs(problem, plan):
+        result = {'problem': problem, 'plan': plan, 'output': _output_path(output_dir, plan, fmt),
+                  'frames': 0, 'error': '', 'start': time.perf_counter()}
+        try:
+            if fmt == 'png':
+                directory = result['output']
+                os.makedirs(directory, exist_ok=True)
+            else:
+                directory = tempfile.mkdtemp(prefix='frames-', dir=output_dir)
+            result['directory'] = directory
+        except Exception as e:
+            result['error'] = f"{type(e).__name__}: {e}"
+            return result, []
+        return result, [(problem, plan, part, parts, directory, fmt, substeps, cache_dir, dpi)
+                        for part in range(parts)]
+
+    def finish(result):
+        directory = result.pop('directory', None)
+        if not result['error']:
+            try:
+                stitch(directory, result['frames'], result['output'], fmt, fps)
+            except Exception as e:
+                result['error'] = f"{type(e).__name__}: {e}"
+        if directory and fmt != 'png':
+            shutil.rmtree(directory, ignore_errors=True)
+        result['seconds'] = time.perf_counter() - result.pop('start')
+        return result
+
+    if workers == 1:
+        for problem, plan in pairs:
+            result, jobs = plan_jobs(problem, plan)
+            for job in jobs:
+                try:
+                    result['frames'] = render_part(*job)
+                except Exception as e:
+                    result['error'] = f"{type(e).__name__}: {e}"
+            yield finish(result)
+        return
+
+    remaining = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+
+        def collect(done):
+            for future in done:
+                result = pending.pop(future)
+                try:
+                    result['frames'] = future.result()
+                except Exception as e:
+                    result['error'] = result['error'] or f"{type(e).__name__}: {e}"
+                remaining[id(result)] -= 1
+                if not remaining[id(result)]:
+                    del remaining[id(result)]
+                    yield finish(result)
+
+        for problem, plan in pairs:
+            result, jobs = plan_jobs(problem, plan)
+            if not jobs:
+                yield finish(result)
+                continue
+            remaining[id(result)] = len(jobs)
+            for job in jobs:
+                pending[pool.submit(render_part, *job)] = result
+                if len(pending) >= 2 * workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    yield from collect(done)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            yield from collect(done)
@@ -49,6 +49,19 @@ def show_metrics_popup(metrics):
         'Final Ball Sizes': metrics.get('final_ball_sizes', 'N/A')
     }
     
+    timing_metrics = {
+        'File Read (ms)': metrics.get('file_read_ms', 0),
+        'Problem Parse (ms)': metrics.get('problem_parse_ms', 0),
+        'Plan Parse (ms)': metrics.get('plan_parse_ms', 0),
+        'Frame Build (ms)': metrics.get('frame_build_ms', 0),
+        'First Draw (ms)': metrics.get('first_draw_ms', 0),
+        'Frames Drawn': metrics.get('frames_drawn', 0),
+        'Frame Draw Mean (ms)': metrics.get('frame_draw_mean_ms', 0),
+        'Frame Draw p95 (ms)': metrics.get('frame_draw_p95_ms', 0),
+        'Canvas Flush Mean (ms)': metrics.get('canvas_flush_mean_ms', 0),
+        'Canvas Flush p95 (ms)': metrics.get('canvas_flush_p95_ms', 0)
+    }
+    
     text.insert(tk.END, f"{'='*60}\n")
     text.insert(tk.END, f"SNOWMAN PLANNER EXECUTION METRICS\n")
     text.insert(tk.END, f"{'='*60}\n\n")
@@ -57,6 +70,7 @@ def show_metrics_popup(metrics):
         ('EXECUTION INFO', execution_metrics),
         ('PLAN METRICS', plan_metrics),
         ('ACTION BREAKDOWN', action_metrics),
+        ('STAGE TIMINGS', timing_metrics),
         ('FINAL STATE', final_state)
     ]:
         text.insert(tk.END, f"{category}\n")
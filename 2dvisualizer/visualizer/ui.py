@@ -4,9 +4,11 @@ import matplotlib
 matplotlib.use('TkAgg')
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-from matplotlib.animation import FuncAnimation
 from .core import *
 from .metrics import show_metrics_popup
+from shared.cache import ParseCache
+from shared.domain import find_domain
+import queue
 import time
 import platform
 import os
@@ -18,13 +20,20 @@ class VisualizerApp(tk.Frame):
         self.selected_problem_file = None
         self.selected_plan_file = None
         self.current_metrics = {}
+        self.metrics_saved = False
         self.visualization_completed = False
         self.animation_running = False
         self.frames = []
         self.current_frame = 0
         self.paused = True
-        self.ani = None
+        self.builder = None
+        self.building = False
+        # Step last set on the jump slider; its queued callback is then ignored.
+        self.synced_step = 0
+        self.prefetch_queue = []
+        self.prefetch_job = None
         self.metrics_calculator = MetricsCalculator()
+        self.parse_cache = ParseCache()
         
         # Modern color scheme
         self.colors = {
@@ -100,6 +109,9 @@ class VisualizerApp(tk.Frame):
             bbox=dict(boxstyle='round,pad=0.5', facecolor=self.colors['surface'], 
                       alpha=0.9, edgecolor=self.colors['primary'], linewidth=1)
         )
+        self.renderer = Renderer(self.ax, self.step_text_artist, blit=BLIT, cache_bytes=FRAME_CACHE_MB << 20)
+        self.scheduler = PlaybackScheduler(self, self.animate)
+        self.canvas.mpl_connect('scroll_event', self.on_scroll)
         self.create_header_section()
         self.create_control_section()
 
@@ -254,6 +266,54 @@ class VisualizerApp(tk.Frame):
                                      length=150)
         self.speed_slider.set(50)
         self.speed_slider.pack(side=tk.RIGHT, padx=(10,0))
+
+        # Jump-to-step slider; frames are rebuilt from the state timeline, so
+        # any step is reachable without replaying the plan.
+        jump_frame = tk.Frame(control_card, bg=self.colors['surface'])
+        jump_frame.pack(fill=tk.X, padx=15, pady=(0,10))
+        tk.Label(jump_frame,
+                 text="⏭️ Jump to Step",
+                 font=('Segoe UI', 9, 'bold'),
+                 fg=self.colors['text_primary'],
+                 bg=self.colors['surface']).pack(side=tk.LEFT)
+        self.step_slider = tk.Scale(jump_frame,
+                                    from_=0, to=0,
+                                    orient=tk.HORIZONTAL,
+                                    command=self.jump_to_step,
+                                    font=('Segoe UI', 8),
+                                    fg=self.colors['text_primary'],
+                                    bg=self.colors['surface'],
+                                    activebackground=self.colors['primary'],
+                                    highlightthickness=0,
+                                    length=150)
+        self.step_slider.pack(side=tk.RIGHT, padx=(10,0))
+
+        # Frame build progress; playback can start before the build finishes.
+        build_frame = tk.Frame(control_card, bg=self.colors['surface'])
+        build_frame.pack(fill=tk.X, padx=15, pady=(0,10))
+        tk.Label(build_frame,
+                 text="🏗️ Build Progress",
+                 font=('Segoe UI', 9, 'bold'),
+                 fg=self.colors['text_primary'],
+                 bg=self.colors['surface']).pack(side=tk.LEFT)
+        self.cancel_btn = tk.Button(build_frame,
+                                    text="✖️ Cancel",
+                                    command=self.cancel_build,
+                                    font=('Segoe UI', 9),
+                                    fg='white',
+                                    bg=self.colors['error'],
+                                    activebackground='#B71C1C',
+                                    relief='flat',
+                                    cursor='hand2',
+                                    state=tk.DISABLED,
+                                    padx=10, pady=2)
+        self.cancel_btn.pack(side=tk.RIGHT, padx=(10,0))
+        self.build_progress = ttk.Progressbar(build_frame,
+                                              orient=tk.HORIZONTAL,
+                                              mode='determinate',
+                                              maximum=100,
+                                              length=150)
+        self.build_progress.pack(side=tk.RIGHT, padx=(10,0))
         
         # File status labels
         status_frame = tk.Frame(control_card, bg=self.colors['surface'])
@@ -283,24 +343,29 @@ class VisualizerApp(tk.Frame):
         self.status_indicator.config(fg=colors.get(status_type, self.colors['text_secondary']))
 
     def reset_ui(self):
+        self.cancel_build()
+        self.cancel_prefetch()
+        self.save_metrics()
+        self.builder = None
+        self.building = False
+        self.cancel_btn.config(state=tk.DISABLED)
+        self.build_progress['value'] = 0
         self.frames = []
         self.current_metrics = {}
+        self.metrics_saved = False
         self.visualization_completed = False
         self.animation_running = False
-        
-        if self.ani is not None:
-            try:
-                self.ani.event_source.stop()
-            except:
-                pass
-            self.ani = None
+        self.scheduler.load(None)
         
         self.current_frame = 0
         self.paused = True
         self.toggle_btn.config(text='▶️ Play')
+        self.synced_step = 0
+        self.step_slider.config(to=0)
+        self.step_slider.set(0)
         
         # Modern welcome screen
-        self.ax.clear()
+        self.renderer.reset()
         self.ax.axis('off')
         self.ax.set_xlim(0, 1)
         self.ax.set_ylim(0, 1)
@@ -377,75 +442,128 @@ class VisualizerApp(tk.Frame):
             self.update_status("Error: Missing files", "error")
             return False
             
-        try:
-            self.update_status("Loading files...", "info")
-            self.reset_ui()
-            self.metrics_calculator.start_timing()
-            
-            problem = parse_problem(self.selected_problem_file)
-            plan = parse_plan(self.selected_plan_file)
-            
-            with open(self.selected_problem_file, 'r') as f:
-                content = f.read()
-                domain_match = re.search(r'\(:domain (\S+)\)', content)
-                problem['domain'] = domain_match.group(1) if domain_match else 'unknown'
-            
-            self.frames = build_frames(problem, plan)
+        self.reset_ui()
+        # A fresh calculator per build, so a cancelled builder still winding
+        # down never touches the metrics of the next one.
+        self.metrics_calculator = calculator = MetricsCalculator()
+        self.renderer.timer = calculator.timer
+        
+        # Both callbacks run on the builder thread.
+        final_state = {}
+        def on_step(table, i, state, grew):
+            calculator.process_action(table, i, grew)
+            final_state['balls'] = state['balls']
+            final_state['ball_size'] = state['ball_size']
+        
+        plan_name = os.path.splitext(os.path.basename(self.selected_plan_file))[0]
+        def on_done(frames):
+            final_state.setdefault('balls', builder.problem['balls'])
+            final_state.setdefault('ball_size', builder.problem['ball_size'])
+            return calculator.finalize_metrics(final_state, plan_name)
+        
+        self.builder = builder = FrameBuilder(self.selected_problem_file, self.selected_plan_file,
+                                              on_step, on_done, self.parse_cache,
+                                              domain_path=find_domain(self.selected_problem_file),
+                                              timer=calculator.timer)
+        self.building = True
+        self.cancel_btn.config(state=tk.NORMAL)
+        builder.start()
+        self.update_status("Loading files...", "info")
+        self.after(BUILD_POLL_MS, self.poll_build, builder)
+        return True
+
+    def cancel_build(self):
+        if self.builder is not None and self.building:
+            self.builder.cancel()
+            self.update_status("Cancelling frame build...", "warning")
+
+    def poll_build(self, builder):
+        """Drain the builder's queue on the Tk thread; reschedules itself until the build ends."""
+        if builder is not self.builder:
+            return
+        while True:
+            try:
+                kind, value, frame_count = builder.queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'error':
+                self.building = False
+                self.cancel_btn.config(state=tk.DISABLED)
+                messagebox.showerror("Error", f"Error loading files: {value}")
+                self.update_status("Error loading files", "error")
+                self.reset_ui()
+                return
+            self.publish_frames(builder, value, frame_count)
+            if kind == 'progress':
+                self.update_status(f"Building frames... step {value}/{builder.total}", "info")
+                continue
+            self.building = False
+            self.cancel_btn.config(state=tk.DISABLED)
+            if kind == 'cancelled':
+                self.update_status(f"Build cancelled at step {value}/{builder.total}", "warning")
+            else:
+                self.current_metrics = builder.result
+                self.update_status("Files loaded successfully!", "success")
+                if self.paused:
+                    messagebox.showinfo("Success", "Files loaded successfully!")
+            return
+        self.after(BUILD_POLL_MS, self.poll_build, builder)
+
+    def publish_frames(self, builder, steps, frame_count):
+        """Make the first ``frame_count`` frames (``steps`` plan steps) playable."""
+        self.build_progress['value'] = steps / max(builder.total, 1) * 100
+        self.step_slider.config(to=steps)
+        clock = self.scheduler.clock
+        if clock is None:
+            self.frames = builder.frames
             self.current_frame = 0
             self.paused = True
-            
-            plan_name = os.path.splitext(os.path.basename(self.selected_plan_file))[0]
-            self.current_metrics = self.metrics_calculator.finalize_metrics(
-                {'balls': self.frames[-1]['balls'], 'ball_size': self.frames[-1]['ball_size']}, 
-                plan_name
-            )
-            
-            save_metrics_to_csv(self.current_metrics)
-            
-            if self.frames:
-                draw(self.ax, self.frames[0], self.step_text_artist)
-                self.fig.suptitle("Snowman Planner Visualizer - Ready to Play", 
-                                 fontsize=12, fontweight='bold', color=self.colors['primary'])
-                self.canvas.draw()
-                
-            self.update_status("Files loaded successfully!", "success")
-            messagebox.showinfo("Success", "Files loaded successfully!")
-            return True
-            
-        except Exception as e:
-            error_msg = f"Error loading files: {str(e)}"
-            messagebox.showerror("Error", error_msg)
-            self.update_status("Error loading files", "error")
-            self.reset_ui()
-            return False
-        finally:
-            self.metrics_calculator.end_timing()
+            self.scheduler.load(PlaybackClock(frame_count, STEPS_PER_SECOND * self.frames.substeps,
+                                              speed_from_slider(self.speed_slider.get())))
+            self.show_frame(0, "Snowman Planner Visualizer - Ready to Play")
+            return
+        # Playback that caught up with the build resumes from where it stalled.
+        if clock.finished:
+            clock.seek(clock.last)
+        clock.frame_count = frame_count
+
+    def start_playback(self):
+        """Resume the playback loop from the clock's current position."""
+        self.cancel_prefetch()
+        self.scheduler.play()
 
-    def animate(self, frame_num):
+    def animate(self, position):
         if not self.frames or self.paused:
             return
             
-        if frame_num >= len(self.frames):
-            if not self.visualization_completed:
-                self.visualization_completed = True
-                self.paused = True
-                self.toggle_btn.config(text='▶️ Play')
-                self.animation_running = False
-                self.update_status("Animation completed", "success")
-                if self.current_metrics:
-                    show_metrics_popup(self.current_metrics)
-            return
-            
-        self.current_frame = frame_num
-        draw(self.ax, self.frames[frame_num], self.step_text_artist)
-        
-        progress = (frame_num) / max(len(self.frames), 1) * 100
-        self.fig.suptitle(f"Snowman Planner Visualizer - Progress: {progress:.1f}%", 
-                         fontsize=12, fontweight='bold', color=self.colors['primary'])
-        self.canvas.draw()
+        self.current_frame = int(position)
+        self.renderer.draw(self.frames.frame_at(position))
+        self.sync_step_slider()
+        
+        progress = (self.current_frame) / max(len(self.frames), 1) * 100
+        title = self.fig.suptitle(f"Snowman Planner Visualizer - Progress: {progress:.1f}%", 
+                                  fontsize=12, fontweight='bold', color=self.colors['primary'])
+        self.renderer.show(title)
         self.animation_running = True
         self.update_status(f"Playing animation - {progress:.1f}%", "info")
 
+        if position >= self.scheduler.clock.last and not self.building and not self.visualization_completed:
+            self.visualization_completed = True
+            self.paused = True
+            self.scheduler.pause()
+            self.toggle_btn.config(text='▶️ Play')
+            self.animation_running = False
+            self.update_status("Animation completed", "success")
+            if self.current_metrics:
+                self.save_metrics()
+                show_metrics_popup(self.current_metrics)
+
+    def on_scroll(self, event):
+        if event.inaxes is not self.ax:
+            return
+        self.renderer.zoom(1 / ZOOM_STEP if event.button == 'up' else ZOOM_STEP, event.xdata, event.ydata)
+        self.canvas.draw_idle()
+
     def toggle_animation(self):
         if not self.frames:
             messagebox.showwarning("No Animation", "Please load files first to start animation.")
@@ -455,6 +573,7 @@ class VisualizerApp(tk.Frame):
         self.paused = not self.paused
         
         if self.paused:
+            self.scheduler.pause()
             self.toggle_btn.config(text='▶️ Play')
             self.animation_running = False
             self.update_status("Animation paused", "info")
@@ -463,23 +582,12 @@ class VisualizerApp(tk.Frame):
             self.animation_running = True
             self.update_status("Animation playing", "info")
             
-            if self.visualization_completed or self.current_frame >= len(self.frames):
+            if self.visualization_completed or self.current_frame >= len(self.frames) - 1:
                 self.current_frame = 0
                 self.visualization_completed = False
+                self.scheduler.seek(0)
             
-            if self.ani is not None:
-                try:
-                    self.ani.event_source.stop()
-                except:
-                    pass
-            
-            self.ani = FuncAnimation(
-                self.fig, self.animate, 
-                frames=range(self.current_frame, len(self.frames)), 
-                interval=int(PLT_PAUSE * 1000),
-                repeat=False
-            )
-        self.canvas.draw()
+            self.start_playback()
 
     def step_forward(self):
         if not self.frames:
@@ -488,11 +596,9 @@ class VisualizerApp(tk.Frame):
             
         if self.current_frame < len(self.frames) - 1:
             self.current_frame += 1
-            draw(self.ax, self.frames[self.current_frame], self.step_text_artist)
-            progress = (self.current_frame) / max(len(self.frames), 1) * 100
-            self.fig.suptitle(f"Snowman Planner Visualizer - Progress: {progress:.1f}%", 
-                             fontsize=12, fontweight='bold', color=self.colors['primary'])
-            self.canvas.draw()
+            self.scheduler.seek(self.current_frame)
+            self.show_frame(self.current_frame, self.progress_title(self.current_frame), direction=1)
+            self.sync_step_slider()
             self.update_status(f"Step {self.current_frame + 1}/{len(self.frames)}", "info")
 
     def step_backward(self):
@@ -502,47 +608,111 @@ class VisualizerApp(tk.Frame):
             
         if self.current_frame > 0:
             self.current_frame -= 1
-            draw(self.ax, self.frames[self.current_frame], self.step_text_artist)
-            progress = (self.current_frame) / max(len(self.frames), 1) * 100
-            self.fig.suptitle(f"Snowman Planner Visualizer - Progress: {progress:.1f}%", 
-                             fontsize=12, fontweight='bold', color=self.colors['primary'])
-            self.canvas.draw()
+            self.scheduler.seek(self.current_frame)
+            self.show_frame(self.current_frame, self.progress_title(self.current_frame), direction=-1)
+            self.sync_step_slider()
             self.update_status(f"Step {self.current_frame + 1}/{len(self.frames)}", "info")
 
+    def progress_title(self, index):
+        progress = index / max(len(self.frames), 1) * 100
+        return f"Snowman Planner Visualizer - Progress: {progress:.1f}%"
+
+    def show_frame(self, index, text, direction=0):
+        """Show frame ``index`` under the title ``text`` through the frame cache.
+
+        A ``direction`` (+1 or -1) is where stepping is heading: the next
+        frames that way are rasterized while the UI is idle.
+        """
+        self.renderer.draw(self.frames[index])
+        title = self.fig.suptitle(text, fontsize=12, fontweight='bold', color=self.colors['primary'])
+        self.renderer.show(title, key=(index, text))
+        self.cancel_prefetch()
+        if direction:
+            stop = len(self.frames) if direction > 0 else -1
+            self.prefetch_queue = list(range(index + direction, stop, direction))[:PREFETCH_FRAMES]
+            self.prefetch_job = self.after_idle(self.prefetch_next, index, text)
+
+    def prefetch_next(self, index, text):
+        """Rasterize one queued frame off screen; reschedules itself."""
+        self.prefetch_job = None
+        if not self.paused or not self.prefetch_queue:
+            return
+        ahead = self.prefetch_queue.pop(0)
+        ahead_text = self.progress_title(ahead)
+        if (ahead, ahead_text) not in self.renderer.cache:
+            title = self.fig.suptitle(ahead_text, fontsize=12, fontweight='bold', color=self.colors['primary'])
+            self.renderer.render(self.frames[ahead], title, key=(ahead, ahead_text))
+            title.set_text(text)
+        if self.prefetch_queue:
+            self.prefetch_job = self.after_idle(self.prefetch_next, index, text)
+
+    def cancel_prefetch(self):
+        self.prefetch_queue = []
+        if self.prefetch_job is not None:
+            self.after_cancel(self.prefetch_job)
+            self.prefetch_job = None
+
+    def sync_step_slider(self):
+        """Move the jump slider to the plan step of the current frame."""
+        step = self.frames.step_of_frame(self.current_frame)
+        if self.step_slider.get() != step:
+            self.synced_step = step
+            self.step_slider.set(step)
+
+    def jump_to_step(self, val):
+        # Scale runs its command at idle after set(), so a callback for the
+        # step playback already moved to is not a jump.
+        step = int(val)
+        if not self.frames or step == self.synced_step:
+            return
+
+        self.synced_step = step
+        self.current_frame = min(self.frames.frame_of_step(step), len(self.frames) - 1)
+        self.visualization_completed = False
+        self.scheduler.seek(self.current_frame)
+        self.show_frame(self.current_frame, self.progress_title(self.current_frame))
+        self.update_status(f"Jumped to step {step}/{self.frames.step_count}", "info")
+
     def restart_animation(self):
         if not self.frames:
             self.update_status("No animation loaded", "warning")
             return
             
         self.current_frame = 0
+        self.scheduler.pause()
+        self.scheduler.seek(0)
         self.paused = True
         self.visualization_completed = False
         self.animation_running = False
         self.toggle_btn.config(text='▶️ Play')
         
-        if self.ani is not None:
-            try:
-                self.ani.event_source.stop()
-            except:
-                pass
-        
-        draw(self.ax, self.frames[0], self.step_text_artist)
-        self.fig.suptitle("Snowman Planner Visualizer - Ready to Play", 
-                         fontsize=12, fontweight='bold', color=self.colors['primary'])
-        self.canvas.draw()
+        self.show_frame(0, "Snowman Planner Visualizer - Ready to Play", direction=1)
+        self.sync_step_slider()
         self.update_status("Animation restarted", "info")
 
     def update_animation_speed(self, val):
-        global PLT_PAUSE
-        PLT_PAUSE = 0.001 + (100 - int(val)) * 0.001
-        self.update_status(f"Speed: {val}%", "info")
+        speed = speed_from_slider(val)
+        self.scheduler.set_speed(speed)
+        self.update_status(f"Speed: {speed:.2f}x", "info")
 
     def show_metrics(self):
         if not self.current_metrics:
             messagebox.showwarning("No Metrics", "No metrics available. Please load and run a visualization first.")
             self.update_status("No metrics available", "warning")
             return
-        show_metrics_popup(self.current_metrics)
+        show_metrics_popup(self.refresh_metrics())
+
+    def refresh_metrics(self):
+        """Fold the stage timings measured so far (draws keep coming in) into the run's metrics."""
+        if self.current_metrics:
+            self.current_metrics.update(self.metrics_calculator.timing_metrics())
+        return self.current_metrics
+
+    def save_metrics(self):
+        """Append the run's metrics to the CSV, once: when it first plays to the end or is replaced."""
+        if self.current_metrics and not self.metrics_saved:
+            save_metrics_to_csv(self.refresh_metrics())
+            self.metrics_saved = True
 
     def show_settings_menu(self):
         settings_window = tk.Toplevel(self)
@@ -619,6 +789,8 @@ SNOWMAN PLANNER VISUALIZER HELP
 • Step Forward: Move one frame forward
 • Restart: Reset animation to beginning
 • Speed Slider: Adjust animation speed
+• Jump Slider: Go straight to any plan step
+• Mouse Wheel: Zoom the board (pan with the toolbar)
 
 📊 ADDITIONAL FEATURES:
 • Metrics: View detailed execution metrics
@@ -0,0 +1,67 @@
+"""Scaling benchmark for the PDDL problem parser.
+
+Generates square Snowman grids (every cell a location, 4-neighbour ``next``
+facts, alternating snow) and times ``parse_problem`` on each. Time per
+location should stay flat as the grid grows if parsing is linear.
+
+    python benchmarks/bench_parse_problem.py            # 5 50 100 200 500
+    python benchmarks/bench_parse_problem.py 5 20 80
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '2dvisualizer'))
+from visualizer.core import parse_problem
+
+DEFAULT_SIZES = [5, 50, 100, 200, 500]
+DIRECTIONS = [(0, 1, 'right'), (0, -1, 'left'), (1, 0, 'up'), (-1, 0, 'down')]
+
+def generate_problem(n):
+    locs = [f"loc_{r}_{c}" for r in range(1, n + 1) for c in range(1, n + 1)]
+    lines = [
+        "(define (problem bench)",
+        "  (:domain snowman_numeric)",
+        "  (:objects",
+        "    right left up down - direction",
+        "    ball_0 ball_1 ball_2 - ball",
+        "    " + " ".join(locs) + " - location",
+        "  )",
+        "  (:init",
+        "    (= (total-cost) 0)",
+    ]
+    for r in range(1, n + 1):
+        for c in range(1, n + 1):
+            for dr, dc, d in DIRECTIONS:
+                if 1 <= r + dr <= n and 1 <= c + dc <= n:
+                    lines.append(f"    (next loc_{r}_{c} loc_{r + dr}_{c + dc} {d})")
+    for r in range(1, n + 1):
+        for c in range(1, n + 1):
+            lines.append(f"    (= (location_type loc_{r}_{c}) {(r + c) % 2})")
+    for i in range(3):
+        lines.append(f"    (ball_at ball_{i} loc_{min(i + 2, n)}_{min(2, n)})   (= (ball_size ball_{i}) 0)")
+    lines += ["    (character_at loc_1_1)", "  )", "  (:goal (goal))", "  (:metric minimize (total-cost))", ")"]
+    return "\n".join(lines) + "\n"
+
+def main(sizes):
+    print(f"{'grid':>9} {'locations':>10} {'MB':>7} {'parse s':>9} {'us/loc':>8}")
+    baseline = None
+    for n in sizes:
+        with tempfile.NamedTemporaryFile('w', suffix='.pddl', delete=False) as f:
+            f.write(generate_problem(n))
+            path = f.name
+        try:
+            size_mb = os.path.getsize(path) / 1e6
+            start = time.perf_counter()
+            prob = parse_problem(path)
+            elapsed = time.perf_counter() - start
+        finally:
+            os.unlink(path)
+        assert len(prob['valid_locations']) == n * n
+        per_loc = elapsed / (n * n) * 1e6
+        baseline = baseline or per_loc
+        print(f"{n:>4}x{n:<4} {n * n:>10} {size_mb:>7.1f} {elapsed:>9.3f} {per_loc:>8.2f}  (x{per_loc / baseline:.2f})")
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or DEFAULT_SIZES)
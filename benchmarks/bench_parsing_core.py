@@ -0,0 +1,97 @@
+"""Throughput benchmark pinning the shared parsing core.
+
+Times each stage every front end goes through on generated inputs and
+compares the MB/s against a floor. Exits non-zero when any stage falls
+below its floor, so a regression in shared/ fails loudly instead of slowing
+every tool a little.
+
+    python benchmarks/bench_parsing_core.py
+    python benchmarks/bench_parsing_core.py --scale 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '2dvisualizer'))
+from shared.parsing import parse_problem_text, iter_plan_actions
+from shared.actions import ActionTable
+from shared.planlog import mapped, scan_metrics, iter_plan_block
+from bench_parse_problem import generate_problem
+
+# MB/s on one core of a modest CI machine, set at roughly a third of what the
+# parsers do today so only real regressions trip them.
+FLOORS = {
+    'problem': 5.0,
+    'plan': 5.0,
+    'log': 20.0,
+}
+REPEATS = 3
+
+def generate_plan(steps):
+    lines = []
+    for i in range(steps):
+        r, c = i % 50 + 1, i // 50 % 50 + 1
+        if i % 3:
+            lines.append(f"{i}.000: (move_character loc_{r}_{c} loc_{r}_{c + 1} right)")
+        else:
+            lines.append(f"{i}.000: (move_ball ball_{i % 3} loc_{r}_{c} loc_{r}_{c + 1} loc_{r}_{c + 2} right)")
+    return "\n".join(lines) + "\n"
+
+def generate_log(steps, noise_lines):
+    noise = "".join(f"[t={i}s] g=12, {i} evaluated, {i * 3} expanded, h=7\n" for i in range(noise_lines))
+    return (noise + "found plan:\n" + generate_plan(steps) + "plan-length:%d\n" % steps
+            + "planning time (msec): 1200\nexpanded nodes:42\nstates evaluated:99\n" + noise)
+
+def bench_problem(path):
+    with open(path) as f:
+        parse_problem_text(f.read())
+
+def bench_plan(path):
+    with open(path) as f:
+        ActionTable(iter_plan_actions(f))
+
+def bench_log(path):
+    with mapped(path) as buf:
+        scan_metrics(buf)
+        ActionTable(iter_plan_block(buf))
+
+def best_of(fn, path):
+    best = float('inf')
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=int, default=1, help='multiply input sizes')
+    args = parser.parse_args(argv)
+
+    inputs = {
+        'problem': (generate_problem(100 * args.scale), bench_problem),
+        'plan': (generate_plan(100_000 * args.scale), bench_plan),
+        'log': (generate_log(20_000 * args.scale, 200_000 * args.scale), bench_log),
+    }
+    failed = []
+    print(f"{'stage':>8} {'MB':>7} {'best s':>8} {'MB/s':>8} {'floor':>7}")
+    for name, (text, fn) in inputs.items():
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.write(text)
+            path = f.name
+        try:
+            size_mb = os.path.getsize(path) / 1e6
+            elapsed = best_of(fn, path)
+        finally:
+            os.unlink(path)
+        rate = size_mb / elapsed
+        ok = rate >= FLOORS[name]
+        if not ok:
+            failed.append(name)
+        print(f"{name:>8} {size_mb:>7.1f} {elapsed:>8.3f} {rate:>8.1f} {FLOORS[name]:>7.1f}  {'ok' if ok else 'BELOW FLOOR'}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -55,6 +55,8 @@ def move_files():
 def create_requirements():
     requirements = """flask==2.3.3
 matplotlib==3.9.2
+numpy==2.4.6
+Pillow==12.3.0
 pytest==8.3.3
 """
     with open('snowman-planner/requirements.txt', 'w') as f:
@@ -1,7 +1,6 @@
-import re
+import sys
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
-from matplotlib.animation import FuncAnimation
 from matplotlib.widgets import Button
 import tkinter as tk
 from tkinter import filedialog, messagebox
@@ -10,6 +9,17 @@ import os
 import time
 import json
 from datetime import datetime
+
+# Parsing and frame building live in the 2dvisualizer package; make it importable
+# when this script is run directly.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '2dvisualizer')))
+from shared.parsing import parse_loc, parse_problem_text, iter_plan_actions
+from shared.cache import ParseCache
+from shared.domain import find_domain, parse_domain
+from shared.actions import ActionTable, OP_MOVE_CHARACTER, OP_MOVE_BALL, OP_GOAL
+from visualizer.core import FrameSequence, PlaybackClock, Renderer, speed_from_slider, STEPS_PER_SECOND, BLIT, ZOOM_STEP
+from visualizer.core import PlaybackScheduler, StageTimer, LOAD_STAGES, save_metrics_to_csv as append_metrics_csv
+
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning)
 import matplotlib.font_manager as fm
@@ -21,12 +31,12 @@ BALL_SIZE_LABELS = {0: '', 1: '', 2: ''}
 BALL_SIZE_NAMES = {0: 'Small', 1: 'Medium', 2: 'Large'}
 SHOW_DESCRIPTION = True
 SUBSTEPS = 10
-PLT_PAUSE = 0.03
 
 # Global variables
 metrics_calculator = None
 metrics_window = None
 current_metrics = {}
+metrics_saved = False
 selected_plan_file = None
 selected_problem_file = None
 current_plan = None
@@ -41,7 +51,7 @@ toggle_button = None
 settings_button = None
 problem_label = None
 plan_label = None
-ani = None
+scheduler = None
 current_frame = [0]
 paused = [True]
 step_text_artist = None
@@ -53,6 +63,7 @@ class MetricsCalculator:
         
     def reset(self):
         """Reset all metrics to initial state."""
+        self.timer = StageTimer()
         self.start_time = None
         self.end_time = None
         self.timing_started = False
@@ -100,54 +111,39 @@ class MetricsCalculator:
             print(f"MetricsCalculator: {self.timing_log[-1]}")
         
     def get_execution_time_ms(self, plan_name):
-        """Return execution time based on plan name or measured time."""
-        if self.start_time is None or self.end_time is None:
-            self.timing_log.append(f"Warning: Incomplete timing (start_time or end_time missing), step_count: {self.step_count}, substep_count: {self.substep_count}")
-            print(f"MetricsCalculator: {self.timing_log[-1]}")
-            return 0
-        measured_time = (self.end_time - self.start_time) * 1000
-        if plan_name == 'plan_numeric':
-            execution_time = 512
-            self.timing_log.append(f"Assigned execution time: {execution_time:.2f} ms for {plan_name} (step_count: {self.step_count}, substep_count: {self.substep_count})")
-        elif plan_name == 'plan_classic':
-            execution_time = 4541
-            self.timing_log.append(f"Assigned execution time: {execution_time:.2f} ms for {plan_name} (step_count: {self.step_count}, substep_count: {self.substep_count})")
-        else:
-            execution_time = measured_time
-            self.timing_log.append(f"Using measured time: {execution_time:.2f} ms for {plan_name} (step_count: {self.step_count}, substep_count: {self.substep_count})")
+        """Return the measured time of the load stages (file read through frame build)."""
+        execution_time = self.timer.total_ms(*LOAD_STAGES)
+        self.timing_log.append(f"Measured load stages: {execution_time:.2f} ms for {plan_name} (step_count: {self.step_count}, substep_count: {self.substep_count})")
         print(f"MetricsCalculator: {self.timing_log[-1]}")
         return int(execution_time)
     
-    def process_action(self, action, state_before, state_after, substeps=10):
-        """Process action and increment substep count."""
+    def process_action(self, table, i, grew=False, substeps=10):
+        """Process action table row ``i`` and increment substep count."""
         self.step_count += 1
         self.substep_count += substeps
-        parts = action.split()
+        op = table.opcode[i]
         
-        if parts[0] in ['move_character', 'move', 'move_to', 'move_char']:
+        if op == OP_MOVE_CHARACTER:
             self.move_character_count += 1
             self.total_cost += 1
             print(f"MetricsCalculator: Processed move_character action, count: {self.move_character_count}")
             
-        elif parts[0] in ['move_ball', 'push', 'roll', 'roll_ball']:
+        elif op == OP_MOVE_BALL:
             self.move_ball_count += 1
             self.total_cost += 1
-            if len(parts) >= 2:
-                ball = parts[1]
-                if (ball in state_before['ball_size'] and ball in state_after['ball_size'] and
-                    state_after['ball_size'][ball] > state_before['ball_size'][ball]):
-                    self.ball_growth_count += 1
-                    print(f"MetricsCalculator: Processed move_ball action with growth, count: {self.move_ball_count}, growth: {self.ball_growth_count}")
-                else:
-                    print(f"MetricsCalculator: Processed move_ball action, count: {self.move_ball_count}")
+            if grew:
+                self.ball_growth_count += 1
+                print(f"MetricsCalculator: Processed move_ball action with growth, count: {self.move_ball_count}, growth: {self.ball_growth_count}")
+            else:
+                print(f"MetricsCalculator: Processed move_ball action, count: {self.move_ball_count}")
                     
-        elif parts[0] == 'goal':
+        elif op == OP_GOAL:
             self.goal_count += 1
             self.total_cost += 1
             print(f"MetricsCalculator: Processed goal action, count: {self.goal_count}")
             
     def finalize_metrics(self, final_state, plan_name):
-        """Finalize metrics with plan-specific execution time."""
+        """Finalize metrics with the measured execution time and stage timings."""
         for ball, pos in final_state['balls'].items():
             self.final_ball_locations[ball] = f"loc_{pos[0]+1}_{pos[1]+1}"
             size = final_state['ball_size'].get(ball, 0)
@@ -172,13 +168,15 @@ class MetricsCalculator:
             'expanded_nodes': self.expanded_nodes,
             'states_evaluated': self.states_evaluated,
             'dead_ends_detected': self.dead_ends_detected,
-            'duplicates_detected': self.duplicates_detected
+            'duplicates_detected': self.duplicates_detected,
+            **self.timer.summary()
         }
         print(f"MetricsCalculator: Finalized metrics: {metrics}")
         return metrics
 
 # Initialize metrics calculator
 metrics_calculator = MetricsCalculator()
+parse_cache = ParseCache()
 
 def show_metrics_popup():
     """Metrics popup with auto-show at end and placeholder if no metrics"""
@@ -251,6 +249,21 @@ def show_metrics_popup():
                 'Final Ball Sizes': current_metrics.get('final_ball_sizes', 'N/A')
             }
             
+            # Draw timings keep coming in after the metrics were finalized
+            current_metrics.update(metrics_calculator.timer.summary())
+            timing_metrics = {
+                'File Read (ms)': current_metrics.get('file_read_ms', 0),
+                'Problem Parse (ms)': current_metrics.get('problem_parse_ms', 0),
+                'Plan Parse (ms)': current_metrics.get('plan_parse_ms', 0),
+                'Frame Build (ms)': current_metrics.get('frame_build_ms', 0),
+                'First Draw (ms)': current_metrics.get('first_draw_ms', 0),
+                'Frames Drawn': current_metrics.get('frames_drawn', 0),
+                'Frame Draw Mean (ms)': current_metrics.get('frame_draw_mean_ms', 0),
+                'Frame Draw p95 (ms)': current_metrics.get('frame_draw_p95_ms', 0),
+                'Canvas Flush Mean (ms)': current_metrics.get('canvas_flush_mean_ms', 0),
+                'Canvas Flush p95 (ms)': current_metrics.get('canvas_flush_p95_ms', 0)
+            }
+            
             text.insert(tk.END, f"{'='*60}\n")
             text.insert(tk.END, f"SNOWMAN PLANNER EXECUTION METRICS\n")
             text.insert(tk.END, f"{'='*60}\n\n")
@@ -259,6 +272,7 @@ def show_metrics_popup():
                 ('📋 EXECUTION INFO', execution_metrics),
                 ('📊 PLAN METRICS', plan_metrics),
                 ('📮 ACTION BREAKDOWN', action_metrics),
+                ('⏱ STAGE TIMINGS', timing_metrics),
                 ('🎯 FINAL STATE', final_state)
             ]:
                 text.insert(tk.END, f"{category}\n")
@@ -335,368 +349,99 @@ def export_metrics_csv():
         messagebox.showerror("Export Error", f"Failed to export metrics: {str(e)}")
 
 # Parsing functions
-def parse_loc(loc):
-    try:
-        parts = loc.split('_')
-        if len(parts) < 3:
-            raise ValueError(f"Invalid location format: {loc}")
-        return int(parts[1])-1, int(parts[2])-1
-    except Exception as e:
-        raise ValueError(f"Error parsing location '{loc}': {e}")
-
-def coord_to_plot(coord, grid_size):
+def coord_to_plot(coord, rows):
     r, c = coord
-    return c, grid_size-1-r
+    return c, rows-1-r
 
-def parse_problem(path):
+def parse_problem(path, content=None):
     """Problem parser with enhanced error handling and blocked cell detection"""
     try:
-        if not os.path.exists(path):
-            raise FileNotFoundError(f"Problem file not found: {path}")
-            
-        snow, balls, ball_size = {}, {}, {}
-        character = None
-        grid_positions = set()
-        valid_locations = set()
-        
-        with open(path, 'r') as file:
-            content = file.read()
-            
-            if not content.strip():
-                raise ValueError("Problem file is empty")
-            
-            objects_match = re.search(r':objects\s+(.*?)\)', content, re.DOTALL)
-            if objects_match:
-                objects_section = objects_match.group(1)
-                for match in re.finditer(r'(loc_\d+_\d+)\s*-\s*location', objects_section):
-                    loc = match.group(1)
-                    coord = parse_loc(loc)
-                    valid_locations.add(coord)
-                    grid_positions.add(coord)
+        if content is None:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Problem file not found: {path}")
+            with open(path, 'r') as file:
+                content = file.read()
             
-            for match in re.finditer(r"\(= \(location_type (\S+)\) (\d+)\)", content):
-                loc, t = match.groups()
-                coord = parse_loc(loc)
-                valid_locations.add(coord)
-                snow[coord] = (t == '1')
-                grid_positions.add(coord)
+        if not content.strip():
+            raise ValueError("Problem file is empty")
             
-            for match in re.finditer(r"\(snow (\S+)\)", content):
-                loc = match.group(1)
-                coord = parse_loc(loc)
-                snow[coord] = True
-                valid_locations.add(coord)
-                grid_positions.add(coord)
-            
-            for match in re.finditer(r"\(ball_at (\S+) (\S+)\)", content):
-                ball, loc = match.groups()
-                coord = parse_loc(loc)
-                grid_positions.add(coord)
-                valid_locations.add(coord)
-                balls[ball] = coord
-                
-            for match in re.finditer(r"\(= \(ball_size (\S+)\) (\d+)\)", content):
-                ball, size = match.groups()
-                size = int(size)
-                if size not in [0, 1, 2]:
-                    raise ValueError(f"Invalid ball size {size} for ball {ball}")
-                ball_size[ball] = size
-                
-            for match in re.finditer(r"\(ball_size_(small|medium|large) (\S+)\)", content):
-                size_str, ball = match.groups()
-                size_map = {'small': 0, 'medium': 1, 'large': 2}
-                size = size_map.get(size_str.lower(), 0)
-                ball_size[ball] = size
-                
-            char_match = re.search(r"\(character_at (\S+)\)", content)
-            if char_match:
-                character = parse_loc(char_match.group(1))
-                valid_locations.add(character)
-                grid_positions.add(character)
-                
-        if not balls:
+        prob = parse_problem_text(content)
+        
+    except Exception as e:
+        raise Exception(f"Error parsing problem file '{path}': {str(e)}")
+    return check_problem(prob, path)
+
+def check_problem(prob, path):
+    """Reject problems the visualizer cannot show; returns ``prob``.
+
+    Kept apart from parsing so problems served by the shared parse cache,
+    which holds plain parses, are checked too.
+    """
+    try:
+        for ball, size in prob['ball_size'].items():
+            if size not in [0, 1, 2]:
+                raise ValueError(f"Invalid ball size {size} for ball {ball}")
+        if not prob['balls']:
             raise ValueError("No balls found in problem file")
-        if character is None:
+        if prob['character'] is None:
             raise ValueError("No character position found in problem file")
-            
-        for ball in balls:
-            ball_size.setdefault(ball, 0)
-            
-        if grid_positions:
-            max_r = max(r for r, _ in grid_positions)
-            max_c = max(c for _, c in grid_positions)
-            grid_size = max(max_r, max_c) + 1
-        else:
-            grid_size = 5
-            
-        blocked_cells = set()
-        for r in range(grid_size):
-            for c in range(grid_size):
-                if (r, c) not in valid_locations:
-                    blocked_cells.add((r, c))
-        
-        for r in range(grid_size):
-            for c in range(grid_size):
-                if (r, c) not in blocked_cells:
-                    snow.setdefault((r, c), False)
-                
-        return {
-            'snow': snow,
-            'balls': balls,
-            'ball_size': ball_size,
-            'character': character,
-            'grid_size': grid_size,
-            'blocked_cells': blocked_cells,
-            'valid_locations': valid_locations
-        }
-        
     except Exception as e:
         raise Exception(f"Error parsing problem file '{path}': {str(e)}")
+    return prob
 
-def parse_plan(path):
+def parse_plan(path, content=None):
     """Plan parser with multiple format support"""
     try:
-        if not os.path.exists(path):
-            raise FileNotFoundError(f"Plan file not found: {path}")
+        if content is None:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Plan file not found: {path}")
+            with open(path, 'r') as file:
+                content = file.read()
             
-        steps = []
-        with open(path, 'r') as file:
-            content = file.read()
+        steps = list(iter_plan_actions(content.splitlines()))
             
+        print(f"Parsed {len(steps)} actions")
+        
+        if not steps:
             if not content.strip():
                 raise ValueError("Plan file is empty")
-                
-            lines = content.strip().split('\n')
+            print("Plan file content:")
+            print("-" * 40)
+            print(content)
+            print("-" * 40)
+            raise ValueError("No valid actions found in plan file. Please check the file format.")
             
-            print(f"Plan file format analysis:")
-            print(f"Total lines: {len(lines)}")
-            for i, line in enumerate(lines[:5]):
-                print(f"Line {i+1}: '{line.strip()}'")
-                
-            for line_num, line in enumerate(lines, 1):
-                line = line.strip()
-                if not line or line.startswith(';'):
-                    continue
-                    
-                cleaned_line = re.sub(r'^\d+\.\d+:\s*', '', line)
-                if cleaned_line.startswith('(') and cleaned_line.endswith(')'):
-                    action = cleaned_line[1:-1].strip()
-                    if action:
-                        steps.append(action)
-                        continue
-                        
-                if any(keyword in line.lower() for keyword in ['move', 'push', 'roll', 'goal']):
-                    cleaned_line = re.sub(r'^\d+[.:]?\s*', '', line)
-                    cleaned_line = re.sub(r'^\d+\s*:', '', cleaned_line)
-                    if cleaned_line.startswith('(') and cleaned_line.endswith(')'):
-                        cleaned_line = cleaned_line[1:-1]
-                    if cleaned_line:
-                        steps.append(cleaned_line)
-                        continue
-                        
-            print(f"Parsed {len(steps)} actions")
+        print("First few parsed actions:")
+        for i, action in enumerate(steps[:3]):
+            print(f"Action {i+1}: '{action}'")
             
-            if not steps:
-                print("Plan file content:")
-                print("-" * 40)
-                print(content)
-                print("-" * 40)
-                raise ValueError("No valid actions found in plan file. Please check the file format.")
-                
-            print("First few parsed actions:")
-            for i, action in enumerate(steps[:3]):
-                print(f"Action {i+1}: '{action}'")
-                
-            return steps
+        return steps
             
     except Exception as e:
         raise Exception(f"Error parsing plan file '{path}': {str(e)}")
 
-def build_frames(prob, plan):
-    """Frame builder with metrics tracking and blocked cells support"""
+def build_frames(prob, plan, domain=None):
+    """Frame builder with metrics tracking and blocked cells support; ``domain`` drives the rules when given"""
     try:
-        frames = []
-        state = {
-            'snow': prob['snow'].copy(),
-            'balls': prob['balls'].copy(),
-            'ball_size': prob['ball_size'].copy(),
-            'character': prob['character'],
-            'grid_size': prob['grid_size'],
-            'blocked_cells': prob['blocked_cells'],
-            'is_numeric': 'snowman_numeric' in prob.get('domain', '')
-        }
-        
-        step_log = []
+        table = plan if isinstance(plan, ActionTable) else ActionTable(plan)
+        final_state = {'balls': prob['balls'], 'ball_size': prob['ball_size']}
         metrics_calculator.start_timing()
         
-        initial_frame = {
-            'type': 'initial',
-            'balls': state['balls'].copy(),
-            'ball_size': state['ball_size'].copy(),
-            'snow': state['snow'].copy(),
-            'character': state['character'],
-            'grid_size': state['grid_size'],
-            'blocked_cells': state['blocked_cells'],
-            'step_text': 'Initial State'
-        }
-        frames.append(initial_frame)
+        def on_step(table, i, state, grew):
+            metrics_calculator.process_action(table, i, grew, SUBSTEPS)
+            final_state['balls'] = state['balls']
+            final_state['ball_size'] = state['ball_size']
         
-        for i, action in enumerate(plan):
-            parts = action.split()
-            step_label = f"Step {i + 1}: {action}"
-            step_log.append(step_label)
-            
-            state_before = {
-                'balls': state['balls'].copy(),
-                'ball_size': state['ball_size'].copy(),
-                'character': state['character']
-            }
-            
-            try:
-                if parts[0] in ['move_character', 'move', 'move_to', 'move_char']:
-                    if len(parts) < 3:
-                        raise ValueError(f"Invalid move action: {action}")
-                    start = parse_loc(parts[1])
-                    end = parse_loc(parts[2])
-                    
-                    for t in range(SUBSTEPS):
-                        alpha = t / (SUBSTEPS - 1)
-                        frame = {
-                            'type': 'char_move',
-                            'start': start,
-                            'end': end,
-                            'alpha': alpha,
-                            'balls': state['balls'].copy(),
-                            'ball_size': state['ball_size'].copy(),
-                            'snow': state['snow'].copy(),
-                            'character': state['character'],
-                            'grid_size': state['grid_size'],
-                            'blocked_cells': state['blocked_cells'],
-                            'step_text': step_label if t == 0 else None
-                        }
-                        frames.append(frame)
-                    
-                    state['character'] = end
-                    
-                elif parts[0] in ['move_ball', 'push', 'roll', 'roll_ball']:
-                    if len(parts) < 5:
-                        raise ValueError(f"Invalid move_ball action: {action}")
-                    ball, from_cell, mid_cell, to_cell = parts[1:5]
-                    start = parse_loc(from_cell)
-                    end = parse_loc(to_cell)
-                    
-                    char_start = state['character']
-                    for t in range(SUBSTEPS):
-                        alpha = t / (SUBSTEPS - 1)
-                        frame = {
-                            'type': 'char_move',
-                            'start': char_start,
-                            'end': start,
-                            'alpha': alpha,
-                            'balls': state['balls'].copy(),
-                            'ball_size': state['ball_size'].copy(),
-                            'snow': state['snow'].copy(),
-                            'character': state['character'],
-                            'grid_size': state['grid_size'],
-                            'blocked_cells': state['blocked_cells'],
-                            'step_text': step_label if t == 0 else None
-                        }
-                        frames.append(frame)
-                    
-                    state['character'] = start
-                    
-                    for t in range(SUBSTEPS):
-                        alpha = t / (SUBSTEPS - 1)
-                        frame = {
-                            'type': 'ball_move',
-                            'ball': ball,
-                            'start': start,
-                            'end': end,
-                            'alpha': alpha,
-                            'balls': state['balls'].copy(),
-                            'ball_size': state['ball_size'].copy(),
-                            'snow': state['snow'].copy(),
-                            'character': state['character'],
-                            'grid_size': state['grid_size'],
-                            'blocked_cells': state['blocked_cells'],
-                            'step_text': None
-                        }
-                        frames.append(frame)
-                    
-                    state['balls'][ball] = end
-                    if state['snow'].get(end, False):
-                        state['ball_size'][ball] = min(state['ball_size'][ball] + 1, 2)
-                        state['snow'][end] = False
-                        
-                elif parts[0] == 'goal':
-                    if not state.get('is_numeric', False):
-                        balls_at_goal = [b for b, pos in state['balls'].items() if pos == (2, 0)]
-                        if len(balls_at_goal) >= 3:
-                            state['ball_size'][balls_at_goal[0]] = 2
-                            state['ball_size'][balls_at_goal[1]] = 1
-                            state['ball_size'][balls_at_goal[2]] = 0
-                    else:
-                        balls_at_goal = [(b, state['ball_size'][b]) for b, pos in state['balls'].items() if pos == (2, 0)]
-                        if len(balls_at_goal) >= 3:
-                            balls_at_goal.sort(key=lambda x: x[1])
-                            for idx, (ball, _) in enumerate(balls_at_goal):
-                                state['ball_size'][ball] = idx
-                                
-                    for t in range(SUBSTEPS):
-                        frame = {
-                            'type': 'goal',
-                            'balls': state['balls'].copy(),
-                            'ball_size': state['ball_size'].copy(),
-                            'snow': state['snow'].copy(),
-                            'character': state['character'],
-                            'grid_size': state['grid_size'],
-                            'blocked_cells': state['blocked_cells'],
-                            'step_text': step_label if t == 0 else None
-                        }
-                        frames.append(frame)
-                else:
-                    print(f"Warning: Unknown action '{action}' on step {i+1}")
-                    for t in range(SUBSTEPS):
-                        frame = {
-                            'type': 'static',
-                            'balls': state['balls'].copy(),
-                            'ball_size': state['ball_size'].copy(),
-                            'snow': state['snow'].copy(),
-                            'character': state['character'],
-                            'grid_size': state['grid_size'],
-                            'blocked_cells': state['blocked_cells'],
-                            'step_text': f"Unknown action: {action}" if t == 0 else None
-                        }
-                        frames.append(frame)
-                    
-            except Exception as e:
-                print(f"Error processing action '{action}' on step {i+1}: {e}")
-                for t in range(SUBSTEPS):
-                    frame = {
-                        'type': 'error',
-                        'balls': state['balls'].copy(),
-                        'ball_size': state['ball_size'].copy(),
-                        'snow': state['snow'].copy(),
-                        'character': state['character'],
-                        'grid_size': state['grid_size'],
-                        'blocked_cells': state['blocked_cells'],
-                        'step_text': f"Error in action: {action}" if t == 0 else None
-                    }
-                    frames.append(frame)
-                continue
-            
-            metrics_calculator.process_action(action, state_before, state)
+        with metrics_calculator.timer.span('frame_build'):
+            frames = FrameSequence(prob, table, substeps=SUBSTEPS, on_step=on_step, domain=domain)
         
         metrics_calculator.end_timing()
         global current_metrics
         plan_name = os.path.splitext(os.path.basename(selected_plan_file))[0] if selected_plan_file else 'unknown'
-        current_metrics = metrics_calculator.finalize_metrics(
-            {'balls': state['balls'], 'ball_size': state['ball_size']}, 
-            plan_name
-        )
-        save_metrics_to_csv(current_metrics)
+        current_metrics = metrics_calculator.finalize_metrics(final_state, plan_name)
         print(f"MetricsCalculator: Finalized metrics: {current_metrics}")
         
+        step_log = [f"Step {i + 1}: {table.text(i)}" for i in range(len(table))]
         os.makedirs('data', exist_ok=True)
         with open('data/step_log.json', 'w') as f:
             json.dump(step_log, f, indent=2)
@@ -708,116 +453,9 @@ def build_frames(prob, plan):
         raise Exception(f"Error building frames: {e}")
 
 def draw(ax, frame):
-    """Enhanced drawing function with blocked cells visualization and legend in bottom-right"""
+    """Draw a frame through the shared persistent-artist renderer"""
     try:
-        ax.clear()
-        ax.axis('off')
-        grid = frame['grid_size']
-        ax.set_xlim(-0.5, grid - 0.5)
-        ax.set_ylim(-0.5, grid - 0.5)
-        
-        blocked_cells = frame.get('blocked_cells', set())
-        special_positions = [(1, 1), (1, 3), (3, 1), (3, 3)]  # (2,2), (2,4), (4,2), (4,4) in 1-based indexing
-        
-        for r in range(grid):
-            for c in range(grid):
-                coord = (r, c)
-                x, y = coord_to_plot(coord, grid)
-                
-                if coord in blocked_cells:
-                    color = '#2F2F2F'
-                    edge_color = 'black'
-                    edge_width = 2
-                elif coord in special_positions:
-                    color = 'white'
-                    edge_color = 'black'
-                    edge_width = 1
-                else:
-                    is_snow = frame['snow'].get(coord, False)
-                    color = '#E0FFFF' if is_snow else '#90EE90'
-                    edge_color = 'black'
-                    edge_width = 1
-                
-                ax.add_patch(patches.Rectangle((x - 0.5, y - 0.5), 1, 1, 
-                                             facecolor=color, edgecolor=edge_color, 
-                                             linewidth=edge_width, alpha=0.8))
-                
-                if coord in blocked_cells:
-                    ax.text(x, y, '■', ha='center', va='center', 
-                            fontsize=20, color='red', weight='bold')
-                else:
-                    ax.text(x, y + 0.4, f"({r+1},{c+1})", ha='center', va='center', 
-                            fontsize=6, color='gray')
-        
-        ball_positions = {}
-        for ball, pos in frame['balls'].items():
-            if frame['type'] == 'ball_move' and frame['ball'] == ball:
-                start_pos = frame['start']
-                end_pos = frame['end']
-                alpha = frame['alpha']
-                ball_r = start_pos[0] + alpha * (end_pos[0] - start_pos[0])
-                ball_c = start_pos[1] + alpha * (end_pos[1] - start_pos[1])
-                pos = (ball_r, ball_c)
-            else:
-                pos = pos
-            if pos not in ball_positions:
-                ball_positions[pos] = []
-            ball_positions[pos].append((ball, frame['ball_size'][ball]))
-        
-        for pos, balls_here in ball_positions.items():
-            balls_here.sort(key=lambda x: x[1], reverse=True)
-            x, y = coord_to_plot(pos, grid)
-            
-            for i, (ball, size) in enumerate(balls_here):
-                offset_y = i * 0.15
-                size_map = {0: 0.15, 1: 0.2, 2: 0.25}
-                
-                radius = size_map[size]
-                
-                ax.add_patch(patches.Circle((x, y + offset_y), radius, 
-                                          facecolor='white', edgecolor='black', linewidth=1))
-                ax.text(x, y + offset_y, ['S', 'M', 'L'][size], ha='center', va='center', 
-                       fontsize=8, color='black', weight='bold')
-        
-        if frame['character'] is not None:
-            if frame['type'] == 'char_move':
-                sx, sy = coord_to_plot(frame['start'], grid)
-                ex, ey = coord_to_plot(frame['end'], grid)
-                cx = sx + frame['alpha'] * (ex - sx)
-                cy = sy + frame['alpha'] * (ey - sy)
-            else:
-                cx, cy = coord_to_plot(frame['character'], grid)
-            
-            char_head = patches.Circle((cx, cy + 0.05), 0.07, 
-                                       facecolor='#FFDAB9', edgecolor='black', 
-                                       linewidth=1.5, zorder=12)
-            ax.add_patch(char_head)
-            ax.add_patch(patches.Arc((cx, cy + 0.03), 0.04, 0.02, angle=0, theta1=200, theta2=340, 
-                 color='black', linewidth=1, zorder=13))
-            ax.add_patch(patches.Rectangle((cx - 0.03, cy - 0.25), 0.03, 0.1, 
-                                         facecolor='#0000FF', edgecolor='#00008B', zorder=12))
-            ax.add_patch(patches.Rectangle((cx + 0.01, cy - 0.25), 0.03, 0.1, 
-                                         facecolor='#0000FF', edgecolor='#00008B', zorder=12))
-            ax.add_patch(patches.Rectangle((cx - 0.06, cy - 0.15), 0.12, 0.14, 
-                                         facecolor='#FF0000', edgecolor='#8B0000', 
-                                         linewidth=2, zorder=12))
-            ax.add_patch(patches.Circle((cx - 0.02, cy + 0.07), 0.01, 
-                                       facecolor='black', zorder=13))
-            ax.add_patch(patches.Circle((cx + 0.02, cy + 0.07), 0.01, 
-                                       facecolor='black', zorder=13))
-        
-        text = frame.get('step_text')
-        step_text_artist.set_text(text)
-        
-        legend_elements = [
-            patches.Patch(color='#90EE90', label='Regular Cell'),
-            patches.Patch(color='#E0FFFF', label='Snow Cell'),
-            patches.Patch(color='#2F2F2F', label='Blocked Cell'),
-            patches.Circle((0, 0), 0.1, facecolor='#FFDAB9', edgecolor='orange', label='Character'),
-            patches.Circle((0, 0), 0.1, facecolor='white', edgecolor='black', label='Snow balls'),
-        ]
-        ax.legend(handles=legend_elements, loc='lower right', bbox_to_anchor=(1.0, -0.2), fontsize=8)
-        
+        renderer.draw(frame)
     except Exception as e:
         print(f"Error in draw function: {e}")
         ax.text(0.5, 0.5, f"Drawing Error: {e}", ha='center', va='center', 
@@ -825,22 +463,19 @@ def draw(ax, frame):
 
 def reset_ui():
     """Reset the entire UI to initial state with legend"""
-    global problem, plan, frames, current_metrics, visualization_completed, metrics_window, ani, animation_running
+    global problem, plan, frames, current_metrics, visualization_completed, metrics_window, animation_running
+    global metrics_saved
     
+    save_run_metrics()
     problem = None
     plan = []
     frames = []
     current_metrics = {}
+    metrics_saved = False
     visualization_completed = False
     animation_running = False
     metrics_calculator.reset()
-    
-    if ani is not None:
-        try:
-            ani.event_source.stop()
-        except AttributeError:
-            pass
-        ani = None
+    scheduler.load(None)
     
     current_frame[0] = 0
     paused[0] = True
@@ -855,7 +490,7 @@ def reset_ui():
         settings_button.ax.set_visible(True)
     
     if ax:
-        ax.clear()
+        renderer.reset()
         ax.axis('off')
         ax.set_xlim(0, 1)
         ax.set_ylim(0, 1)
@@ -894,24 +529,28 @@ def save_metrics_to_csv(metrics):
         os.makedirs('data', exist_ok=True)
         csv_path = 'data/metrics.csv'
         
-        file_exists = os.path.isfile(csv_path)
-        
-        with open(csv_path, 'a', newline='') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=metrics.keys())
-            
-            if not file_exists:
-                writer.writeheader()
-            
-            writer.writerow(metrics)
+        # Shared with the Tk app, which widens older files to new columns
+        append_metrics_csv(metrics, csv_path)
         
         print(f"📈 Metrics saved to: {csv_path}")
         
     except Exception as e:
         print(f"Warning: Could not save metrics to CSV: {e}")
 
+def save_run_metrics():
+    """Append the run's metrics to the CSV, once: when it first plays to the end or is replaced.
+
+    Waiting until then lets the draw timings be measured instead of written as zeros.
+    """
+    global metrics_saved
+    if current_metrics and not metrics_saved:
+        current_metrics.update(metrics_calculator.timer.summary())
+        save_metrics_to_csv(current_metrics)
+        metrics_saved = True
+
 def load_files():
     """Load files with enhanced error handling and timing"""
-    global problem, plan, frames, current_metrics, visualization_completed, ani, animation_running
+    global problem, plan, frames, current_metrics, visualization_completed, animation_running
     
     try:
         if not selected_problem_file or not selected_plan_file:
@@ -923,29 +562,39 @@ def load_files():
             raise FileNotFoundError(f"Plan file not found: {selected_plan_file}")
             
         reset_ui()
+        timer = renderer.timer = metrics_calculator.timer
+        
+        # Files are only read on cache misses; those reads are timed apart
+        # from the parses around them.
+        def read_timed(path):
+            with timer.span('file_read'):
+                with open(path, 'r') as file:
+                    return file.read()
         
         print(f"Loading problem file: {selected_problem_file}")
         try:
-            problem = parse_problem(selected_problem_file)
+            with timer.span('problem_parse'):
+                problem = parse_cache.load('problem', selected_problem_file,
+                                           lambda path: parse_problem_text(read_timed(path)))
+                check_problem(problem, selected_problem_file)
+                domain_path = find_domain(selected_problem_file)
+                domain = parse_domain(domain_path) if domain_path else None
         except Exception as e:
             raise ValueError(f"Failed to parse problem file: {str(e)}")
             
         print(f"Loading plan file: {selected_plan_file}")
         try:
-            plan = parse_plan(selected_plan_file)
+            with timer.span('plan_parse'):
+                plan = parse_cache.load('plan', selected_plan_file, lambda path: parse_plan(path, read_timed(path)))
         except Exception as e:
             raise ValueError(f"Failed to parse plan file: {str(e)}")
         
         if not problem or not plan:
             raise ValueError("Failed to parse files - invalid content")
-            
-        with open(selected_problem_file, 'r') as f:
-            content = f.read()
-            domain_match = re.search(r'\(:domain (\S+)\)', content)
-            problem['domain'] = domain_match.group(1) if domain_match else 'unknown'
         
         print("Building animation frames...")
-        frames = build_frames(problem, plan)
+        frames = build_frames(problem, plan, domain)
+        scheduler.load(PlaybackClock(len(frames), STEPS_PER_SECOND * SUBSTEPS))
         
         current_frame[0] = 0
         paused[0] = True
@@ -954,19 +603,10 @@ def load_files():
         if toggle_button:
             toggle_button.label.set_text('▶ Play')
         
-        global ani
-        if ani is not None:
-            try:
-                ani.event_source.stop()
-            except AttributeError:
-                pass
-        ani = FuncAnimation(fig, animate, frames=range(len(frames)), interval=int(PLT_PAUSE * 1000), 
-                          repeat=False, cache_frame_data=False)
-        
         if frames:
             draw(ax, frames[0])
-            fig.suptitle("Snowman Planner Visualizer - Progress: 0.0%", fontsize=14, fontweight='bold')
-            fig.canvas.draw()
+            title = fig.suptitle("Snowman Planner Visualizer - Progress: 0.0%", fontsize=14, fontweight='bold')
+            renderer.show(title)
             
         messagebox.showinfo("Success", 
                           f"Files loaded successfully!\n\n"
@@ -998,7 +638,11 @@ def load_files():
     finally:
         metrics_calculator.end_timing()
 
-def animate(frame_num):
+def start_playback():
+    """Resume the playback loop from the clock's current position"""
+    scheduler.play()
+
+def animate(position):
     """Animation function with error handling and automatic metrics popup"""
     global visualization_completed, animation_running
     
@@ -1006,30 +650,30 @@ def animate(frame_num):
         if not frames or paused[0]:
             return
             
-        if frame_num >= len(frames):
-            if not visualization_completed:
-                visualization_completed = True
-                paused[0] = True
-                if toggle_button:
-                    toggle_button.label.set_text('▶ Play')
-                animation_running = False
-                if current_metrics:
-                    show_metrics_popup()
-                print("🎉 Animation completed!")
-            return
-            
-        current_frame[0] = frame_num
-        draw(ax, frames[current_frame[0]])
+        current_frame[0] = int(position)
+        draw(ax, frames.frame_at(position))
         
-        progress = (frame_num) / max(len(frames), 1) * 100
-        fig.suptitle(f"Snowman Planner Visualizer - Progress: {progress:.1f}%", 
-                    fontsize=14, fontweight='bold')
-        fig.canvas.draw()
+        progress = (current_frame[0]) / max(len(frames), 1) * 100
+        title = fig.suptitle(f"Snowman Planner Visualizer - Progress: {progress:.1f}%", 
+                             fontsize=14, fontweight='bold')
+        renderer.show(title)
         
         animation_running = True
         
+        if position >= scheduler.clock.last and not visualization_completed:
+            visualization_completed = True
+            paused[0] = True
+            scheduler.pause()
+            if toggle_button:
+                toggle_button.label.set_text('▶ Play')
+            animation_running = False
+            save_run_metrics()
+            if current_metrics:
+                show_metrics_popup()
+            print("🎉 Animation completed!")
+        
     except Exception as e:
-        print(f"animate: Animation error at frame {frame_num}: {e}")
+        print(f"animate: Animation error at frame {position}: {e}")
         paused[0] = True
         if toggle_button:
             toggle_button.label.set_text('▶ Play')
@@ -1039,7 +683,7 @@ def animate(frame_num):
 
 def toggle_animation(event):
     """Toggle play/pause with state management"""
-    global ani, animation_running, visualization_completed
+    global animation_running, visualization_completed
     
     try:
         if not frames:
@@ -1050,34 +694,21 @@ def toggle_animation(event):
         paused[0] = not paused[0]
         
         if paused[0]:
+            scheduler.pause()
             toggle_button.label.set_text('▶ Play')
             animation_running = False
         else:
             toggle_button.label.set_text('⏸ Pause')
             animation_running = True
-            if visualization_completed or current_frame[0] >= len(frames):
+            if visualization_completed or current_frame[0] >= len(frames) - 1:
                 current_frame[0] = 0
                 visualization_completed = False
                 metrics_calculator.start_timing()
-                global ani
-                if ani is not None:
-                    try:
-                        ani.event_source.stop()
-                    except AttributeError:
-                        pass
-                ani = FuncAnimation(fig, animate, frames=range(len(frames)), interval=int(PLT_PAUSE * 1000), 
-                                  repeat=False, cache_frame_data=False)
-            else:
-                if ani is not None:
-                    try:
-                        ani.event_source.stop()
-                    except AttributeError:
-                        pass
-                ani = FuncAnimation(fig, animate, frames=range(current_frame[0], len(frames)), 
-                                  interval=int(PLT_PAUSE * 1000), repeat=False, 
-                                  cache_frame_data=False)
+                scheduler.seek(0)
+            start_playback()
             
-        fig.canvas.draw()
+        # Only the button label changed: let the next idle draw pick it up
+        fig.canvas.draw_idle()
         print(f"toggle_animation: Animation {'paused' if paused[0] else 'playing'}")
         
     except Exception as e:
@@ -1094,11 +725,12 @@ def step_forward(event):
             
         if current_frame[0] < len(frames) - 1:
             current_frame[0] += 1
+            scheduler.seek(current_frame[0])
             draw(ax, frames[current_frame[0]])
             progress = (current_frame[0]) / max(len(frames), 1) * 100
-            fig.suptitle(f"Snowman Planner Visualizer - Progress: {progress:.1f}%", 
-                        fontsize=14, fontweight='bold')
-            fig.canvas.draw()
+            title = fig.suptitle(f"Snowman Planner Visualizer - Progress: {progress:.1f}%", 
+                                 fontsize=14, fontweight='bold')
+            renderer.show(title)
             print(f"step_forward: Moved to frame {current_frame[0] + 1}/{len(frames)}")
             
     except Exception as e:
@@ -1114,11 +746,12 @@ def step_backward(event):
             
         if current_frame[0] > 0:
             current_frame[0] -= 1
+            scheduler.seek(current_frame[0])
             draw(ax, frames[current_frame[0]])
             progress = (current_frame[0]) / max(len(frames), 1) * 100
-            fig.suptitle(f"Snowman Planner Visualizer - Progress: {progress:.1f}%", 
-                        fontsize=14, fontweight='bold')
-            fig.canvas.draw()
+            title = fig.suptitle(f"Snowman Planner Visualizer - Progress: {progress:.1f}%", 
+                                 fontsize=14, fontweight='bold')
+            renderer.show(title)
             print(f"step_backward: Moved to frame {current_frame[0] + 1}/{len(frames)}")
             
     except Exception as e:
@@ -1126,7 +759,7 @@ def step_backward(event):
 
 def restart_animation(event):
     """Restart animation from beginning"""
-    global visualization_completed, ani, animation_running
+    global visualization_completed, animation_running
     
     try:
         if not frames:
@@ -1141,19 +774,13 @@ def restart_animation(event):
         if toggle_button:
             toggle_button.label.set_text('▶ Play')
         
-        global ani
-        if ani is not None:
-            try:
-                ani.event_source.stop()
-            except AttributeError:
-                pass
-        ani = FuncAnimation(fig, animate, frames=range(len(frames)), interval=int(PLT_PAUSE * 1000), 
-                          repeat=False, cache_frame_data=False)
+        scheduler.pause()
+        scheduler.seek(0)
         
         draw(ax, frames[0])
-        fig.suptitle("Snowman Planner Visualizer - Progress: 0.0%", 
-                    fontsize=14, fontweight='bold')
-        fig.canvas.draw()
+        title = fig.suptitle("Snowman Planner Visualizer - Progress: 0.0%", 
+                             fontsize=14, fontweight='bold')
+        renderer.show(title)
         print("🔄 Animation restarted")
         
     except Exception as e:
@@ -1211,10 +838,10 @@ def select_plan_file():
         messagebox.showerror("File Selection Error", f"Error selecting plan file: {str(e)}")
 
 def update_animation_speed(val):
-    """Update animation speed based on slider value"""
-    global PLT_PAUSE
-    PLT_PAUSE = 0.001 + (100 - val) * 0.001
-    print(f"update_animation_speed: Speed updated to {val}% (pause: {PLT_PAUSE:.3f}s)")
+    """Update animation speed based on slider value; applies to running playback"""
+    speed = speed_from_slider(val)
+    scheduler.set_speed(speed)
+    print(f"update_animation_speed: Speed updated to {val}% ({speed:.2f}x)")
 
 def show_help():
     """Show help dialog with usage instructions"""
@@ -1234,6 +861,7 @@ def show_help():
 • 🔧 Reset: Clear all data and start over
 • 📊 Metrics: View metrics (M)
 • ❓ Help: Show this dialog (H)
+• 🔍 Zoom: Mouse wheel over the board
 
 📊 METRICS:
 • View detailed execution metrics
@@ -1375,6 +1003,7 @@ step_text_artist = ax.text(
     verticalalignment='top',
     bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8)
 )
+renderer = Renderer(ax, step_text_artist, blit=BLIT)
 
 file_frame_ax = plt.axes([0.05, 0.15, 0.9, 0.08])
 file_frame_ax.axis('off')
@@ -1419,8 +1048,19 @@ def on_key_press(event):
     elif event.key.lower() == 'h':
         show_help()
 
+def on_scroll(event):
+    if event.inaxes is not ax:
+        return
+    renderer.zoom(1 / ZOOM_STEP if event.button == 'up' else ZOOM_STEP, event.xdata, event.ydata)
+    fig.canvas.draw_idle()
+
 fig.canvas.mpl_connect('key_press_event', on_key_press)
+fig.canvas.mpl_connect('scroll_event', on_scroll)
 
+# Playback runs on Tk's after() loop; without a Tk canvas (headless imports)
+# a bare Tcl interpreter keeps the controls working, minus the ticking
+scheduler = PlaybackScheduler(fig.canvas.get_tk_widget() if hasattr(fig.canvas, 'get_tk_widget') else tk.Tcl(),
+                              animate)
 reset_ui()
 
 if __name__ == "__main__":
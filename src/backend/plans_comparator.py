@@ -1,42 +1,25 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-import os, re, difflib
+import os, sys, difflib
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import numpy as np
 
-# --- Data Parsing (unchanged) ---
+# Log scanning lives in the 2dvisualizer package; make it importable when this
+# script is run directly.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '2dvisualizer')))
+from shared.planlog import mapped, scan_metrics, iter_plan_block
+
+# --- Data Parsing ---
 def parse_all_metrics(content):
-    metrics = {}
-    patterns = {
-        'plan_length': r'plan-length:(\d+)',
-        'planning_time': r'planning time \(msec\): (\d+)',
-        'search_time': r'search time \(msec\): (\d+)',
-        'heuristic_time': r'heuristic time \(msec\): (\d+)',
-        'grounding_time': r'grounding time: (\d+)',
-        'expanded_nodes': r'expanded nodes:(\d+)',
-        'states_evaluated': r'states evaluated:(\d+)',
-        'dead_ends': r'number of dead-ends detected:(\d+)',
-        'duplicates': r'number of duplicates detected:(\d+)',
-    }
-    for key, pat in patterns.items():
-        m = re.search(pat, content, re.IGNORECASE)
-        metrics[key] = int(m.group(1)) if m else 0
-    return metrics
-
-def parse_plan_actions(content):
-    steps = []
-    block = re.search(r'found plan:(.*?)(?:plan-length|metric|planning time)', content, re.DOTALL|re.IGNORECASE)
-    if block:
-        for ln in block.group(1).splitlines():
-            ln = ln.strip()
-            if not ln or ln.startswith(';'): continue
-            ln = re.sub(r'^\d+\.\d+:\s*', '', ln)
-            if ln.startswith('(') and ln.endswith(')'):
-                steps.append(ln[1:-1].strip())
+    return scan_metrics(content)
+
+def parse_plan_actions(content, metrics=None):
+    steps = list(iter_plan_block(content))
     if not steps:
         raise ValueError("No valid actions found.")
-    metrics = parse_all_metrics(content)
+    if metrics is None:
+        metrics = parse_all_metrics(content)
     if metrics['plan_length'] == 0:
         metrics['plan_length'] = len(steps)
     return steps, metrics
@@ -137,9 +120,9 @@ class PlanComparatorApp(ttk.Frame):
     def load_plan(self, idx):
         path = filedialog.askopenfilename(filetypes=[('Text','*.txt')])
         if not path: return
-        with open(path) as f: text = f.read()
         try:
-            actions, metrics = parse_plan_actions(text)
+            with mapped(path) as buf:
+                actions, metrics = parse_plan_actions(buf, scan_metrics(buf))
         except Exception as e:
             messagebox.showerror("Error", str(e)); return
         self.plan_data[idx] = {'actions':actions, 'metrics':metrics}
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The 2dvisualizer tree is run as a script directory (see main_app.py), so its
+# packages are imported top-level: `from visualizer.core import ...`.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '2dvisualizer'))
@@ -0,0 +1,48 @@
+from shared.actions import ActionTable, Symbols, NO_ID, OP_MOVE_CHARACTER, OP_MOVE_BALL, OP_GOAL, OP_UNKNOWN
+from visualizer.core import parse_problem, build_frames, MetricsCalculator
+from comparator.core import parse_plan_actions
+
+PLAN = [
+    'move_character loc_3_2 loc_3_1 down',
+    'move_ball ball_0 loc_3_1 loc_2_1 loc_1_1 left',
+    'goal ball_0 ball_1 ball_2 loc_3_1',
+    'wave_hands',
+]
+
+def test_action_table_columns():
+    table = ActionTable(PLAN)
+    assert len(table) == 4
+    assert list(table.opcode) == [OP_MOVE_CHARACTER, OP_MOVE_BALL, OP_GOAL, OP_UNKNOWN]
+    assert table.locations[table.loc_a[0]] == (2, 1)
+    assert table.locations[table.loc_b[0]] == (2, 0)
+    assert table.balls[table.ball[1]] == 'ball_0'
+    assert table.locations[table.loc_c[1]] == (0, 0)
+    assert table.ball[3] == NO_ID
+    assert list(table) == PLAN
+
+def test_action_table_bad_location_is_no_id():
+    table = ActionTable(['move_character loc_1_1 nowhere'])
+    assert table.loc_b[0] == NO_ID
+
+def test_row_keys_shared_symbols():
+    symbols = Symbols()
+    a = ActionTable(PLAN[:2], symbols)
+    b = ActionTable(PLAN[1:], symbols)
+    assert a.row_key(1) == b.row_key(0)
+    assert a.row_key(0) != b.row_key(1)
+
+def test_build_frames_reports_steps_to_metrics():
+    prob = parse_problem('pddl/problems/problem-numeric.pddl')
+    metrics = MetricsCalculator()
+    build_frames(prob, ActionTable(PLAN[:2]), on_step=lambda table, i, state, grew: metrics.process_action(table, i, grew))
+    assert metrics.step_count == 2
+    assert metrics.move_character_count == 1
+    assert metrics.move_ball_count == 1
+    assert metrics.ball_growth_count == 1
+
+def test_comparator_returns_action_table():
+    log = "found plan:\n0.0: (move_character loc_3_2 loc_3_1 down)\n1.0: (goal ball_0 ball_1 ball_2 loc_3_1)\nplan-length:2\n"
+    actions, metrics = parse_plan_actions(log)
+    assert isinstance(actions, ActionTable)
+    assert actions.text(1) == 'goal ball_0 ball_1 ball_2 loc_3_1'
+    assert metrics['plan_length'] == 2
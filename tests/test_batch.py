@@ -0,0 +1,74 @@
+import shutil
+
+from shared.batch import pair_corpus, discover, iter_batch, write_summary
+
+PLAN = "0.0: (move_character loc_3_2 loc_3_1 left)\n1.0: (goal ball_0 ball_1 ball_2 loc_3_1)\n"
+LOG = "found plan:\n0.0: (move_character loc_3_2 loc_3_1 left)\nplan-length:1\nplanning time (msec): 7\n"
+
+def make_corpus(root):
+    shutil.copy('pddl/problems/problem-classic.pddl', root / 'problem-classic.pddl')
+    shutil.copy('pddl/problems/problem-numeric.pddl', root / 'problem-numeric.pddl')
+    shutil.copy('pddl/domains/domain-classic.pddl', root / 'domain-classic.pddl')
+    plans = root / 'plans'
+    plans.mkdir()
+    (plans / 'plan_classic_lama.txt').write_text(PLAN)
+    (plans / 'plan-numeric.txt').write_text(LOG)
+    (plans / 'plan_other.txt').write_text(PLAN)
+
+def test_pair_corpus_longest_prefix():
+    pairs, unmatched = pair_corpus(
+        ['p/problem-a.pddl', 'p/problem-a_big.pddl'],
+        ['plan_a_1.txt', 'plan_a_big_2.txt', 'plan_b.txt'])
+    assert pairs == [('p/problem-a.pddl', 'plan_a_1.txt'), ('p/problem-a_big.pddl', 'plan_a_big_2.txt')]
+    assert unmatched == ['plan_b.txt']
+
+def test_pair_corpus_needs_a_separator_after_the_key():
+    problems = ['p/problem-classic.pddl', 'p/problem-numeric.pddl']
+    pairs, unmatched = pair_corpus(problems, ['plan_classic-lama.txt', 'plan_classical.txt',
+                                              'plan_classic2_lama.txt', 'plan_numeric.1.txt'])
+    assert pairs == [('p/problem-classic.pddl', 'plan_classic-lama.txt'),
+                     ('p/problem-numeric.pddl', 'plan_numeric.1.txt')]
+    assert unmatched == ['plan_classical.txt', 'plan_classic2_lama.txt']
+    # A lone problem takes the plans that name no problem, but not near misses.
+    pairs, unmatched = pair_corpus(problems[:1], ['plan_classic_1.txt', 'plan_lama.txt', 'plan_classical.txt'])
+    assert [plan for _, plan in pairs] == ['plan_classic_1.txt', 'plan_lama.txt']
+    assert unmatched == ['plan_classical.txt']
+
+def test_discover_skips_domains(tmp_path):
+    make_corpus(tmp_path)
+    pairs, unmatched = discover([str(tmp_path)])
+    assert {(p.split('/')[-1], q.split('/')[-1]) for p, q in pairs} == {
+        ('problem-classic.pddl', 'plan_classic_lama.txt'),
+        ('problem-numeric.pddl', 'plan-numeric.txt'),
+    }
+    assert [u.split('/')[-1] for u in unmatched] == ['plan_other.txt']
+
+def test_iter_batch_pool_matches_inline(tmp_path):
+    make_corpus(tmp_path)
+    pairs, _ = discover([str(tmp_path / '*.pddl'), str(tmp_path / 'plans' / '*.txt')])
+    inline = sorted(iter_batch(pairs, workers=1, cache_dir=None), key=lambda r: r['plan'])
+    pooled = sorted(iter_batch(pairs, workers=2, max_in_flight=1, cache_dir=str(tmp_path / 'cache')),
+                    key=lambda r: r['plan'])
+    strip = lambda r: {k: v for k, v in r.items() if k != 'seconds'}
+    assert [strip(r) for r in inline] == [strip(r) for r in pooled]
+    numeric = next(r for r in pooled if r['plan'].endswith('plan-numeric.txt'))
+    assert numeric['actions'] == 1 and numeric['planning_time'] == 7 and not numeric['error']
+    assert list((tmp_path / 'cache').iterdir())
+
+    write_summary(pooled, str(tmp_path / 'out' / 'summary.csv'))
+    assert len((tmp_path / 'out' / 'summary.csv').read_text().splitlines()) == 3
+
+def test_iter_batch_reports_errors(tmp_path):
+    (tmp_path / 'broken.txt').write_text(PLAN)
+    (tmp_path / 'problem-x.pddl').write_text("(define (problem x)")
+    result, = iter_batch([(str(tmp_path / 'problem-x.pddl'), str(tmp_path / 'broken.txt'))],
+                         workers=1, cache_dir=None)
+    assert result['error'].startswith('ValueError')
+
+def test_iter_batch_reads_only_the_log_plan_block(tmp_path):
+    log = 'tests/conformance/planner_log.txt'
+    result, = iter_batch([('pddl/problems/problem-classic.pddl', log)], workers=1, cache_dir=str(tmp_path))
+    assert not result['error']
+    assert result['actions'] == 3 and result['plan_length'] == 3 and result['planning_time'] == 1250
+    cached, = iter_batch([('pddl/problems/problem-classic.pddl', log)], workers=1, cache_dir=str(tmp_path))
+    assert cached['actions'] == 3
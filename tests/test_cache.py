@@ -0,0 +1,44 @@
+import os
+from shared.cache import ParseCache, file_digest
+from visualizer.core import parse_problem
+
+PROBLEM = 'pddl/problems/problem-numeric.pddl'
+
+def test_cache_hit_skips_parse(tmp_path):
+    cache = ParseCache(directory=str(tmp_path))
+    calls = []
+    def parse(path):
+        calls.append(path)
+        return parse_problem(path)
+    first = cache.load('problem', PROBLEM, parse)
+    second = cache.load('problem', PROBLEM, parse)
+    assert calls == [PROBLEM]
+    assert second == first
+    assert second['domain'] == 'snowman_numeric'
+
+def test_cache_is_content_addressed(tmp_path):
+    cache = ParseCache(directory=str(tmp_path / 'cache'))
+    copy = tmp_path / 'copy.pddl'
+    copy.write_bytes(open(PROBLEM, 'rb').read())
+    assert file_digest(str(copy)) == file_digest(PROBLEM)
+    cache.load('problem', PROBLEM, parse_problem)
+    assert cache.load('problem', str(copy), lambda p: None)['grid_size'] == 5
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ParseCache(directory=str(tmp_path), max_bytes=13_000)
+    payload = os.urandom(4_000)
+    for i, digest in enumerate(['a', 'b', 'c']):
+        cache.put('plan', digest, payload)
+        os.utime(cache.entry_path('plan', digest), (i, i))
+    assert cache.get('plan', 'a') == payload   # refreshes 'a'
+    cache.put('plan', 'd', payload)
+    assert cache.get('plan', 'b') is None
+    assert cache.get('plan', 'a') == payload
+    assert cache.get('plan', 'd') == payload
+
+def test_cache_ignores_corrupt_entry(tmp_path):
+    cache = ParseCache(directory=str(tmp_path))
+    with open(cache.entry_path('plan', 'x'), 'wb') as f:
+        f.write(b'not a pickle')
+    assert cache.get('plan', 'x') is None
+    assert not os.path.exists(cache.entry_path('plan', 'x'))
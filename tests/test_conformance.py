@@ -0,0 +1,99 @@
+"""Every Python entry point must agree with the shared parser on this corpus.
+
+Each ``tests/conformance/<name>.<ext>`` input has a ``<name>.json`` holding
+the expected result. The legacy standalone scripts are loaded from
+``src/backend`` by path since their file names are not importable.
+"""
+import importlib.util
+import json
+import os
+
+import pytest
+
+from shared.cache import ParseCache
+from shared.planlog import mapped
+from visualizer import core as visualizer_core
+from comparator import core as comparator_core
+
+CORPUS = os.path.join(os.path.dirname(__file__), 'conformance')
+
+def corpus(ext):
+    return sorted(n for n in os.listdir(CORPUS) if n.endswith(ext))
+
+def expected(name):
+    with open(os.path.join(CORPUS, os.path.splitext(name)[0] + '.json')) as f:
+        return json.load(f)
+
+def load_legacy(module_name, filename):
+    path = os.path.join(os.path.dirname(__file__), '..', 'src', 'backend', filename)
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture(scope='module')
+def legacy_visualizer():
+    return load_legacy('legacy_2d_visualizer', '2d_visualizer.py')
+
+@pytest.fixture(scope='module')
+def legacy_comparator():
+    return load_legacy('legacy_plans_comparator', 'plans_comparator.py')
+
+def problem_summary(prob):
+    grid, graph = prob['grid'], prob['graph']
+    return {
+        'domain': prob['domain'],
+        'character': list(prob['character']) if prob['character'] else None,
+        'balls': {b: list(pos) for b, pos in sorted(prob['balls'].items())},
+        'ball_size': dict(sorted(prob['ball_size'].items())),
+        'snow': sorted([r, c] for (r, c), s in prob['snow'].items() if s),
+        'valid': sorted([r, c] for r, c in prob['valid_locations']),
+        'blocked': sorted([r, c] for r, c in prob['blocked_cells']),
+        'extent': [grid.rows, grid.cols],
+        'grid_size': prob['grid_size'],
+        'edges': sorted([list(src), list(dst), d] for src in graph.coords
+                        for dst, d in graph.neighbors_of(src)),
+    }
+
+@pytest.mark.parametrize('name', corpus('.pddl'))
+def test_problem_conformance(name, legacy_visualizer):
+    path = os.path.join(CORPUS, name)
+    want = expected(name)
+    assert problem_summary(visualizer_core.parse_problem(path)) == want
+    if want['balls'] and want['character']:
+        assert problem_summary(legacy_visualizer.parse_problem(path)) == want
+
+def test_legacy_checks_cached_problems(tmp_path, legacy_visualizer):
+    # The shared parse cache holds plain parses written by any front end;
+    # the legacy script must still reject what it cannot show.
+    cache = ParseCache(str(tmp_path / 'cache'))
+    for name in corpus('.pddl'):
+        path = os.path.join(CORPUS, name)
+        problem = cache.load('problem', path, visualizer_core.parse_problem)
+        assert legacy_visualizer.check_problem(problem, path) is problem
+    path = tmp_path / 'no_balls.pddl'
+    path.write_text("(define (problem no-balls)\n  (:init (character_at loc_2_5) (snow loc_1_2)))")
+    problem = cache.load('problem', str(path), visualizer_core.parse_problem)
+    with pytest.raises(Exception, match='No balls found'):
+        legacy_visualizer.check_problem(problem, str(path))
+
+@pytest.mark.parametrize('name', [n for n in corpus('.txt') if not n.startswith('planner_log')])
+def test_plan_conformance(name, legacy_visualizer):
+    path = os.path.join(CORPUS, name)
+    want = expected(name)['actions']
+    assert visualizer_core.parse_plan(path) == want
+    assert list(visualizer_core.parse_plan_table(path)) == want
+    assert legacy_visualizer.parse_plan(path) == want
+
+@pytest.mark.parametrize('name', [n for n in corpus('.txt') if n.startswith('planner_log')])
+def test_log_conformance(name, legacy_comparator):
+    path = os.path.join(CORPUS, name)
+    want = expected(name)
+    actions, metrics = comparator_core.load_plan_log(path)
+    assert (list(actions), metrics) == (want['log_actions'], want['metrics'])
+    with open(path) as f:
+        text = f.read()
+    actions, metrics = comparator_core.parse_plan_actions(text)
+    assert (list(actions), metrics) == (want['log_actions'], want['metrics'])
+    with mapped(path) as buf:
+        assert legacy_comparator.parse_plan_actions(buf) == (want['log_actions'], want['metrics'])
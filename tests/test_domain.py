@@ -0,0 +1,61 @@
+import logging
+
+import pytest
+
+from shared.domain import parse_domain, find_domain
+from visualizer.core import build_frames, iter_plan_actions, parse_problem
+
+PLAN = [
+    "(move_ball ball_1 loc_3_2 loc_3_3 loc_3_4 up)",
+    "(move_ball ball_0 loc_3_3 loc_2_3 loc_1_3 left)",
+    "(move_character loc_2_3 loc_1_3 left)",
+    "(dance loc_1_1)",
+    "(goal ball_0 ball_1 ball_2 loc_3_4)",
+]
+
+def test_find_and_parse_domains():
+    for variant in ('classic', 'numeric'):
+        path = find_domain(f'pddl/problems/problem-{variant}.pddl')
+        assert path.endswith(f'domain-{variant}.pddl')
+        domain = parse_domain(path)
+        assert list(domain.actions) == ['move_character', 'move_ball', 'goal']
+        assert [t for _, t in domain.actions['move_ball'].parameters] == ['ball', 'location', 'location', 'location', 'direction']
+
+@pytest.mark.parametrize('variant', ['classic', 'numeric'])
+def test_compiled_domain_drives_frames(variant):
+    prob = parse_problem(f'pddl/problems/problem-{variant}.pddl')
+    domain = parse_domain(f'pddl/domains/domain-{variant}.pddl')
+    grown = []
+    frames = build_frames(prob, iter_plan_actions(PLAN), substeps=2, domain=domain,
+                          on_step=lambda table, i, state, grew: grown.append(grew))
+    assert [f['type'] for f in frames][::2] == [
+        'initial', 'char_move', 'ball_move', 'char_move', 'ball_move', 'error', 'static', 'error']
+    # The character walks into the cell behind the ball, then the ball
+    # rolls from where it is with the character staying put.
+    assert (frames[1]['start'], frames[1]['end']) == ((2, 1), (2, 2))
+    assert frames[3]['character'] == (2, 2)
+    assert (frames[3]['start'], frames[3]['end']) == ((2, 2), (2, 3))
+    world = frames.world
+    # Rolling onto snow grows the ball and clears the cell; the character
+    # follows into the cell the ball left.
+    assert world.ball_map['ball_0'] == (0, 2) and world.size_map['ball_0'] == 1
+    assert not world.has_snow(0, 2)
+    assert world.ball_map['ball_1'] == (2, 3) and world.size_map['ball_1'] == 0
+    assert world.character == (1, 2)
+    assert grown == [False, True, False]
+    assert frames[9]['step_text'] == 'Error in action: move_character loc_2_3 loc_1_3 left'
+    assert frames[11]['step_text'] == 'Unknown action: dance loc_1_1'
+
+def test_uncompilable_domain_falls_back_to_builtin_rules(tmp_path, caplog):
+    text = open('pddl/domains/domain-classic.pddl').read()
+    path = tmp_path / 'domain-forall.pddl'
+    path.write_text(text.replace('(:action goal', '(:action melt :parameters () :effect '
+                                 '(forall (?l - location) (not (snow ?l))))\n  (:action goal', 1))
+    domain = parse_domain(str(path))
+    prob = parse_problem('pddl/problems/problem-classic.pddl')
+    with caplog.at_level(logging.WARNING):
+        frames = build_frames(prob, iter_plan_actions(PLAN), substeps=2, domain=domain)
+    assert frames.transitions is None
+    assert 'Universal effects' in caplog.text
+    builtin = build_frames(prob, iter_plan_actions(PLAN), substeps=2)
+    assert [f['type'] for f in frames] == [f['type'] for f in builtin]
@@ -0,0 +1,64 @@
+import shutil
+
+import numpy as np
+import pytest
+from PIL import Image, ImageChops, ImageSequence
+
+from visualizer import export
+from visualizer.core import SUBSTEPS
+
+PLAN = ("(move_character loc_1_1 loc_1_2 dir_right)\n(move_character loc_1_2 loc_1_1 dir_left)\n"
+        "(move_character loc_1_1 loc_1_2 dir_right)\n")
+FRAMES = 1 + 3 * SUBSTEPS
+
+def make_pair(root):
+    shutil.copy('pddl/problems/problem-numeric.pddl', root / 'problem-numeric.pddl')
+    (root / 'plan-numeric.txt').write_text(PLAN)
+    return [(str(root / 'problem-numeric.pddl'), str(root / 'plan-numeric.txt'))]
+
+def test_png_ranges_match_inline_render(tmp_path):
+    pairs = make_pair(tmp_path)
+    inline, = export.iter_export(pairs, str(tmp_path / 'inline'), 'png', workers=1, cache_dir=None)
+    pooled, = export.iter_export(pairs, str(tmp_path / 'pooled'), 'png', workers=2, parts=3,
+                                 cache_dir=None)
+    assert not inline['error'] and not pooled['error']
+    assert inline['frames'] == pooled['frames'] == FRAMES
+    for k in range(FRAMES):
+        name = export.FRAME_NAME % k
+        a = Image.open(tmp_path / 'inline' / 'plan-numeric' / name)
+        b = Image.open(tmp_path / 'pooled' / 'plan-numeric' / name)
+        assert ImageChops.difference(a, b).getbbox() is None
+
+def test_gif_is_stitched_in_order(tmp_path):
+    pairs = make_pair(tmp_path) + [(str(tmp_path / 'missing.pddl'), str(tmp_path / 'plan-numeric.txt'))]
+    results = sorted(export.iter_export(pairs, str(tmp_path / 'out'), 'gif', workers=2, parts=3,
+                                        cache_dir=None), key=lambda r: r['problem'])
+    missing, ok = results
+    assert 'missing.pddl' in missing['error']
+    assert not ok['error'] and ok['output'].endswith('plan-numeric.gif')
+    list(export.iter_export(pairs[:1], str(tmp_path / 'png'), 'png', workers=1, cache_dir=None))
+    pngs = [np.asarray(Image.open(tmp_path / 'png' / 'plan-numeric' / (export.FRAME_NAME % k)).convert('RGB'),
+                       dtype=float) for k in range(FRAMES)]
+    with Image.open(ok['output']) as gif:
+        assert gif.n_frames == FRAMES
+        # Each GIF frame is (up to quantization) closest to the frame of the
+        # same index; frames the plan repeats tie.
+        for k, frame in enumerate(ImageSequence.Iterator(gif)):
+            image = np.asarray(frame.convert('RGB'), dtype=float)
+            distance = [np.abs(image - png).mean() for png in pngs]
+            assert distance[k] == min(distance)
+    # Only the GIF is left behind; intermediate frames are removed.
+    assert [p.name for p in (tmp_path / 'out').iterdir()] == ['plan-numeric.gif']
+
+def test_mp4_needs_ffmpeg(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, 'ffmpeg_path', lambda: None)
+    with pytest.raises(ValueError, match='ffmpeg'):
+        list(export.iter_export(make_pair(tmp_path), str(tmp_path / 'out'), 'mp4'))
+
+def test_plan_is_simulated_once_per_share(tmp_path, monkeypatch):
+    calls = []
+    load = export.load_frames
+    monkeypatch.setattr(export, 'load_frames', lambda *args: calls.append(args) or load(*args))
+    result, = export.iter_export(make_pair(tmp_path), str(tmp_path / 'out'), 'png', workers=1, cache_dir=None)
+    assert result['frames'] == FRAMES and len(calls) == 1
+    assert [export.part_range(FRAMES, part, 3) for part in range(3)] == [(0, 4), (4, 8), (8, 13)]
@@ -0,0 +1,132 @@
+import pytest
+from shared.parsing import read_sexpr, typed_names, parse_problem_text
+from visualizer.core import parse_problem
+
+def test_read_sexpr_strips_comments():
+    tree = read_sexpr("(define (problem p) ;; a comment (with parens)\n  (:goal (goal)))")
+    assert tree == [['define', ['problem', 'p'], [':goal', ['goal']]]]
+
+def test_read_sexpr_unbalanced():
+    with pytest.raises(ValueError):
+        read_sexpr("(define (problem p)")
+    with pytest.raises(ValueError):
+        read_sexpr("(define))")
+
+def test_typed_names_groups_lists():
+    names = list(typed_names(['a', 'b', '-', 'ball', 'loc_1_1', '-', 'location', 'x']))
+    assert names == [('a', 'ball'), ('b', 'ball'), ('loc_1_1', 'location'), ('x', 'object')]
+
+def test_parse_problem_numeric():
+    prob = parse_problem('pddl/problems/problem-numeric.pddl')
+    assert prob['grid_size'] == 5
+    assert prob['character'] == (2, 1)
+    assert prob['balls'] == {'ball_0': (1, 2), 'ball_1': (2, 2), 'ball_2': (3, 2)}
+    assert prob['ball_size'] == {'ball_0': 0, 'ball_1': 0, 'ball_2': 0}
+    assert prob['snow'][(0, 0)] is True
+    assert prob['snow'][(1, 2)] is False
+    assert prob['blocked_cells'] == {(1, 1), (1, 3), (3, 1), (3, 3)}
+
+def test_parse_problem_classic_matches_numeric_layout():
+    classic = parse_problem('pddl/problems/problem-classic.pddl')
+    numeric = parse_problem('pddl/problems/problem-numeric.pddl')
+    for key in ('snow', 'balls', 'ball_size', 'character', 'grid_size', 'blocked_cells'):
+        assert classic[key] == numeric[key]
+
+def test_parse_problem_objects_typed_list():
+    prob = parse_problem_text("""
+    (define (problem p) (:domain d)
+      (:objects loc_1_1 loc_1_2 loc_2_2 - location b - ball)
+      (:init (ball_at b loc_1_2) (ball_size_large b) (character_at loc_1_1)))
+    """)
+    assert prob['valid_locations'] == {(0, 0), (0, 1), (1, 1)}
+    assert prob['blocked_cells'] == {(1, 0)}
+    assert prob['ball_size'] == {'b': 2}
+
+def test_normalize_action_line_formats():
+    from shared.parsing import normalize_action_line
+    assert normalize_action_line('0.0: (move_character loc_3_2 loc_3_1 down)') == 'move_character loc_3_2 loc_3_1 down'
+    assert normalize_action_line('2: move_character loc_1_1 loc_1_2 up') == 'move_character loc_1_1 loc_1_2 up'
+    assert normalize_action_line('(goal ball_0 ball_1 ball_2 loc_3_1)') == 'goal ball_0 ball_1 ball_2 loc_3_1'
+    assert normalize_action_line('; comment (move)') is None
+    assert normalize_action_line('plan-length:92') is None
+    assert normalize_action_line('()') is None
+
+def test_iter_plan_actions_is_lazy():
+    from shared.parsing import iter_plan_actions
+    lines = iter(['found plan:\n', '0.0: (move_character loc_1_1 loc_1_2 up)\n', '1.0: (move_character loc_1_2 loc_1_3 up)\n'])
+    actions = iter_plan_actions(lines)
+    assert next(actions) == 'move_character loc_1_1 loc_1_2 up'
+    assert next(lines) == '1.0: (move_character loc_1_2 loc_1_3 up)\n'
+
+def test_iter_frames_consumes_iterator():
+    from visualizer.core import iter_frames, build_frames, SUBSTEPS
+    prob = parse_problem('pddl/problems/problem-numeric.pddl')
+    plan = ['move_character loc_3_2 loc_3_1 down', 'move_character loc_3_1 loc_2_1 left']
+    frames = iter_frames(prob, iter(plan))
+    assert next(frames)['type'] == 'initial'
+    assert next(frames)['step_text'] == 'Step 1: move_character loc_3_2 loc_3_1 down'
+    assert len(build_frames(prob, iter(plan))) == 1 + 2 * SUBSTEPS
+
+def test_parse_problem_next_graph():
+    prob = parse_problem_text("""
+    (define (problem p) (:domain d)
+      (:objects loc_1_1 loc_1_2 loc_1_3 loc_3_3 - location)
+      (:init (character_at loc_1_1)
+             (next loc_1_1 loc_1_2 up) (next loc_1_2 loc_1_1 down)
+             (next loc_1_2 loc_1_3 up)))
+    """)
+    graph = prob['graph']
+    assert len(graph) == 4
+    assert graph.edge_count == 3
+    assert graph.step((0, 0), 'up') == (0, 1)
+    assert graph.step((0, 2), 'down') is None
+    assert graph.has_edge((0, 1), (0, 2)) and not graph.has_edge((0, 2), (0, 1))
+    assert sorted(graph.neighbors_of((0, 1))) == [((0, 0), 'down'), ((0, 2), 'up')]
+    assert graph.reachable((0, 0)) == {(0, 0), (0, 1), (0, 2)}
+    assert graph.reachable((2, 2)) == {(2, 2)}
+
+def test_parse_problem_graph_covers_grid():
+    prob = parse_problem('pddl/problems/problem-classic.pddl')
+    graph = prob['graph']
+    assert set(graph.coords) == prob['valid_locations']
+    assert graph.reachable(prob['character']) == prob['valid_locations']
+
+def test_parse_problem_rectangular_grid():
+    locs = ' '.join(f'loc_{r}_{c}' for r in (1, 2) for c in range(1, 41) if (r, c) != (2, 7))
+    prob = parse_problem_text(f"""
+    (define (problem p) (:domain d)
+      (:objects {locs} - location)
+      (:init (character_at loc_1_1)))
+    """)
+    grid = prob['grid']
+    assert (grid.rows, grid.cols) == (2, 40)
+    assert prob['grid_size'] == 40
+    assert set(prob['blocked_cells']) == {(1, 6)}
+    assert len(prob['blocked_cells']) == 1
+    assert (1, 6) in prob['blocked_cells'] and (1, 6) not in grid
+    assert (5, 5) not in prob['blocked_cells']
+    assert len(list(grid.iter_valid())) == 79
+
+def test_frame_sequence_random_access():
+    from visualizer.core import iter_frames, build_frames, SUBSTEPS
+    prob = parse_problem('pddl/problems/problem-numeric.pddl')
+    plan = ['move_character loc_3_2 loc_3_1 down',
+            'move_ball ball_0 loc_2_3 loc_1_3 loc_1_2 left',
+            'move_ball ghost loc_1_1 loc_1_2 loc_1_1 left',
+            'dance',
+            'goal ball_0 ball_1 ball_2 loc_3_1']
+    eager = list(iter_frames(prob, plan))
+    frames = build_frames(prob, plan)
+    # The ghost ball has no size, so its move fails after animating.
+    assert len(frames) == len(eager) == 1 + 8 * SUBSTEPS
+    for k in reversed(range(len(frames))):
+        assert frames[k] == eager[k]
+    assert frames[-1] == eager[-1]
+    assert [f['type'] for f in frames][1::SUBSTEPS] == [
+        'char_move', 'char_move', 'ball_move', 'char_move', 'ball_move', 'error', 'static', 'goal']
+    assert frames[1 + 5 * SUBSTEPS]['balls']['ghost'] == (0, 0)
+    assert frames[1 + 2 * SUBSTEPS]['type'] == 'ball_move'
+    assert frames[1 + 2 * SUBSTEPS]['alpha'] == 0
+    melted = frames[1 + 3 * SUBSTEPS]
+    assert melted['balls']['ball_0'] == (0, 1) and melted['snow'][(0, 1)] is False
+    assert frames[0]['snow'][(0, 1)] is prob['snow'][(0, 1)]
@@ -0,0 +1,88 @@
+import re
+
+from shared.planlog import (METRIC_PATTERNS, scan_metrics, read_log_metrics, iter_lower_chunks,
+                            mapped, find_plan_block, iter_plan_block)
+from comparator.core import load_plan_log
+
+LOG = """Parsing...
+Grounding Time: 12
+found plan:
+0.0: (move_character loc_1_1 loc_1_2 up)
+1.0: (move_ball ball_0 loc_1_2 loc_1_3 loc_1_4 right)
+plan-length:2
+Planning Time (msec): 340
+Search Time (msec): 200
+Expanded Nodes:57
+States Evaluated:91
+Number of Dead-Ends detected:3
+Planning Time (msec): 999
+"""
+
+def reference_metrics(content):
+    metrics = {}
+    for key, pat in METRIC_PATTERNS.items():
+        m = re.search(pat, content, re.IGNORECASE)
+        metrics[key] = int(m.group(1)) if m else 0
+    return metrics
+
+def test_scan_matches_independent_searches():
+    metrics = scan_metrics(LOG)
+    assert metrics == reference_metrics(LOG)
+    assert metrics['planning_time'] == 340
+    assert metrics['duplicates'] == 0
+    assert scan_metrics(LOG.encode()) == metrics
+
+def test_chunks_end_on_line_boundaries():
+    data = LOG.encode() * 50
+    chunks = list(iter_lower_chunks(data, chunk_size=64))
+    assert b''.join(chunks) == data.lower()
+    assert all(c.endswith(b'\n') for c in chunks)
+
+def test_read_from_file(tmp_path):
+    path = tmp_path / 'plan.txt'
+    path.write_text(LOG)
+    assert read_log_metrics(path) == reference_metrics(LOG)
+    empty = tmp_path / 'empty.txt'
+    empty.write_text('')
+    assert read_log_metrics(empty) == dict.fromkeys(METRIC_PATTERNS, 0)
+
+def test_load_plan_log(tmp_path):
+    path = tmp_path / 'plan.txt'
+    path.write_text(LOG)
+    actions, metrics = load_plan_log(path)
+    assert len(actions) == 2
+    assert metrics['expanded_nodes'] == 57
+
+def reference_block(content):
+    steps = []
+    block = re.search(r'found plan:(.*?)(?:plan-length|metric|planning time)', content, re.DOTALL | re.IGNORECASE)
+    if block:
+        for ln in block.group(1).splitlines():
+            ln = ln.strip()
+            if not ln or ln.startswith(';'):
+                continue
+            ln = re.sub(r'^\d+\.\d+:\s*', '', ln)
+            if ln.startswith('(') and ln.endswith(')') and ln[1:-1].strip():
+                steps.append(ln[1:-1].strip())
+    return steps
+
+def test_plan_block_matches_regex():
+    variants = [
+        LOG,
+        LOG.replace('found plan:', 'FOUND PLAN:'),
+        'noise\n' * 1000 + LOG,
+        'found plan: (goal b0 b1 b2 loc_1_1) Metric: 3\n',
+        'found plan:\n(move_character loc_1_1 loc_1_2)\n',
+        'no plan here\nplan-length:0\n',
+    ]
+    for content in variants:
+        assert list(iter_plan_block(content)) == reference_block(content)
+
+def test_plan_block_spans_chunks(tmp_path):
+    path = tmp_path / 'big.txt'
+    path.write_text('x' * 100 + '\n' + LOG)
+    with mapped(path) as buf:
+        start, end = find_plan_block(buf, chunk_size=64)
+        assert buf[start:end].startswith(b'\n0.0:')
+        assert (start, end) == find_plan_block(buf)
+        assert list(iter_plan_block(buf)) == reference_block(LOG)
@@ -0,0 +1,272 @@
+import time
+
+import pytest
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from visualizer.core import (PlaybackClock, PlaybackScheduler, FrameBuilder, FrameCache, MetricsCalculator,
+                             Renderer, StageTimer, SUBSTEPS, LOAD_STAGES, LOCK_STEPS, build_frames,
+                             parse_problem, iter_plan_actions, iter_lines, save_metrics_to_csv, speed_from_slider)
+from shared.cache import ParseCache
+
+class FakeTime:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_playback_clock_follows_wall_time():
+    now = FakeTime()
+    clock = PlaybackClock(100, 10, clock=now)
+    now.now = 5
+    assert clock.position == 0 and not clock.running
+    clock.start()
+    now.now = 6
+    assert clock.position == 10
+    # Speed changes apply from the current position on.
+    clock.set_speed(2.0)
+    now.now = 7
+    assert clock.position == 30
+    clock.pause()
+    now.now = 100
+    assert clock.frame == 30
+    clock.start()
+    now.now = 200
+    assert clock.position == 99 and clock.finished
+    clock.seek(-3)
+    assert clock.position == 0
+    assert speed_from_slider(50) == 1.0
+    assert speed_from_slider(0) < 1.0 < speed_from_slider(100)
+
+def run_tcl(interp, seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        interp.update()
+        time.sleep(0.001)
+
+def test_scheduler_runs_one_after_loop():
+    tkinter = pytest.importorskip('tkinter')
+    interp = tkinter.Tcl()
+    positions = []
+    scheduler = PlaybackScheduler(interp, positions.append, interval_ms=5)
+    scheduler.play()
+    assert not scheduler.playing
+    scheduler.load(PlaybackClock(10000, 100))
+    scheduler.play()
+    scheduler.play()
+    run_tcl(interp, 0.2)
+    assert 10 <= len(positions) <= 42 and positions == sorted(positions) and positions[-1] > 0
+    assert len(interp.call('after', 'info')) == 1
+    scheduler.pause()
+    ticks, position = len(positions), scheduler.clock.position
+    assert not interp.call('after', 'info')
+    run_tcl(interp, 0.05)
+    assert len(positions) == ticks and scheduler.clock.position == position
+    # The frame callback can stop the loop itself, e.g. at the end of the plan.
+    scheduler.on_frame = lambda position: scheduler.pause()
+    scheduler.play()
+    run_tcl(interp, 0.05)
+    assert not scheduler.playing and not interp.call('after', 'info')
+
+def test_frame_at_interpolates_substeps():
+    prob = parse_problem('pddl/problems/problem-numeric.pddl')
+    frames = build_frames(prob, iter_plan_actions(["(move_character loc_1_1 loc_1_2 dir_right)"]), substeps=4)
+    assert len(frames) == 5
+    frame = frames.frame_at(2.5)
+    assert frame['type'] == 'char_move' and frame['alpha'] == 0.5
+    assert frame['step_text'].startswith('Step 1:')
+    assert frames.frame_at(99)['alpha'] == 1.0
+    assert frames.frame_at(0.5)['type'] == 'initial'
+
+def test_renderer_updates_persistent_artists():
+    prob = parse_problem('pddl/problems/problem-numeric.pddl')
+    frames = build_frames(prob, iter_plan_actions(["(move_character loc_1_1 loc_1_2 dir_right)"]), substeps=4)
+    ax = Figure().subplots()
+    step_text = ax.text(0.02, 0.98, '', transform=ax.transAxes)
+    renderer = Renderer(ax, step_text)
+    renderer.draw(frames[0])
+    children = list(ax.get_children())
+    frame = frames.frame_at(2.5)
+    renderer.draw(frame)
+    assert ax.get_children() == children
+    assert step_text.get_text().startswith('Step 1:') and step_text.axes is ax
+    assert len(renderer.ball_circles.get_offsets()) == len(frame['balls'])
+    assert len(renderer.ball_letters.get_paths()) == len(frame['balls'])
+    # The character translation sits halfway between loc_1_1 and loc_1_2.
+    assert renderer._char_offset.get_matrix()[0, 2] == 0.5
+    renderer.reset()
+    renderer.draw(frames[-1])
+    assert step_text.axes is ax and renderer._char_offset.get_matrix()[0, 2] == 1
+
+def test_renderer_blits_over_cached_background():
+    prob = parse_problem('pddl/problems/problem-numeric.pddl')
+    frames = build_frames(prob, iter_plan_actions(["(move_character loc_1_1 loc_1_2 dir_right)"]), substeps=4)
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    full_draws = []
+    fig.canvas.mpl_connect('draw_event', full_draws.append)
+    renderer = Renderer(fig.subplots(), blit=True)
+    renderer.draw(frames[0])
+    renderer.show(fig.suptitle('0%'))
+    assert len(full_draws) == 1 and renderer.background is not None
+    for k in range(1, len(frames)):
+        renderer.draw(frames[k])
+        renderer.show(fig.suptitle(f'{k}'))
+    assert len(full_draws) == 1
+    blitted = fig.canvas.buffer_rgba().tobytes()
+    fig.canvas.draw()
+    assert fig.canvas.buffer_rgba().tobytes() == blitted
+    # A snow change is part of the background, so it forces one full draw.
+    frame = frames[-1]
+    frame['world'].snow[0, 0] = not frame['world'].snow[0, 0]
+    renderer.draw(frame)
+    assert renderer.background is None
+    snow_pixel = renderer._terrain_colors[int(frame['world'].snow[0, 0])]
+    assert (renderer.terrain.get_array()[0, 0] == snow_pixel).all()
+    renderer.show()
+    assert len(full_draws) == 3 and renderer.background is not None
+
+def test_renderer_culls_to_view_and_drops_detail():
+    prob = parse_problem('pddl/problems/problem-numeric.pddl')
+    frames = build_frames(prob, iter_plan_actions(["(move_character loc_1_1 loc_1_2 dir_right)"]), substeps=4)
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    renderer = Renderer(fig.subplots())
+    renderer.draw(frames[0])
+    assert sum(label.get_visible() for label in renderer.labels) == prob['grid'].count
+    assert len(renderer.ball_circles.get_offsets()) == len(prob['balls'])
+    # Zoomed onto the top-left corner only its 2x2 cells keep artists.
+    renderer.zoom(0.2, 0, 4)
+    assert renderer.view[:4] == (0, 2, 0, 2)
+    visible = [label.get_text() for label in renderer.labels if label.get_visible()]
+    assert visible == [f"({r+1},{c+1})" for r in range(2) for c in range(2) if (r, c) in prob['grid']]
+    assert len(renderer.ball_circles.get_offsets()) == 0
+    # Tiny cells lose labels, letters and the detailed character.
+    fig.set_size_inches(1, 1)
+    renderer.zoom(100)
+    assert renderer.view[:4] == (0, 5, 0, 5) and not renderer.detail
+    assert not any(label.get_visible() for label in renderer.labels)
+    assert not renderer.ball_letters.get_visible()
+    assert renderer.character_dot.get_visible() and not renderer.character.get_visible()
+
+def test_frame_cache_evicts_least_recently_used():
+    fig = Figure(figsize=(1, 1), dpi=10)
+    canvas = FigureCanvasAgg(fig)
+    canvas.draw()
+    region = canvas.copy_from_bbox(fig.bbox)
+    cache = FrameCache(3 * 400)
+    for key in range(3):
+        cache.put(key, region)
+    assert cache.get(0) is region
+    cache.put(3, region)
+    assert 1 not in cache and 0 in cache and len(cache) == 3 and cache.nbytes == 1200
+    small = FrameCache(100)
+    small.put(0, region)
+    assert len(small) == 0 and small.nbytes == 0
+
+def test_renderer_shows_cached_frames():
+    prob = parse_problem('pddl/problems/problem-numeric.pddl')
+    frames = build_frames(prob, iter_plan_actions(["(move_character loc_1_1 loc_1_2 dir_right)"]), substeps=4)
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    full_draws = []
+    fig.canvas.mpl_connect('draw_event', full_draws.append)
+    renderer = Renderer(fig.subplots(), blit=True, cache_bytes=64 << 20)
+    renderer.draw(frames[0])
+    renderer.show(key=0)
+    first = fig.canvas.buffer_rgba().tobytes()
+    # Rendered off screen: the next frame lands in the cache as a full draw would draw it.
+    assert renderer.render(frames[-1], key=-1) and not renderer.render(frames[-1], key=-1)
+    assert renderer.frame['type'] == 'initial'
+    renderer.draw(frames[-1])
+    fig.canvas.draw()
+    last = fig.canvas.buffer_rgba().tobytes()
+    assert bytes(memoryview(renderer.cache.get(-1))) == last
+    draws = len(full_draws)
+    renderer.draw(frames[0])
+    renderer.show(key=0)
+    assert fig.canvas.buffer_rgba().tobytes() == first and len(full_draws) == draws
+    # Any change of view drops the cache.
+    renderer.zoom(0.5)
+    assert len(renderer.cache) == 0
+
+def test_frame_builder_publishes_chunks(tmp_path):
+    plan = tmp_path / 'plan.txt'
+    moves = ["(move_character loc_1_1 loc_1_2 dir_right)", "(move_character loc_1_2 loc_1_1 dir_left)"]
+    plan.write_text("\n".join(moves * 25) + "\n")
+    builder = FrameBuilder('pddl/problems/problem-numeric.pddl', str(plan), on_done=len, chunk=20)
+    builder.start()
+    messages = []
+    while not messages or messages[-1][0] == 'progress':
+        messages.append(builder.queue.get(timeout=10))
+    assert [m[:2] for m in messages] == [('progress', 20), ('progress', 40), ('done', 50)]
+    assert messages[0][2] == 1 + 20 * SUBSTEPS
+    assert builder.result == len(builder.frames) == 1 + 50 * SUBSTEPS
+    ref = build_frames(builder.problem, iter_plan_actions(moves * 25))
+    assert builder.frames[-1] == ref[-1]
+
+def test_frame_builder_cancels_within_a_chunk(tmp_path):
+    plan = tmp_path / 'plan.txt'
+    plan.write_text("(move_character loc_1_1 loc_1_2 dir_right)\n(move_character loc_1_2 loc_1_1 dir_left)\n" * 100)
+    cancel_at = 10
+    builder = FrameBuilder('pddl/problems/problem-numeric.pddl', str(plan), chunk=1000,
+                           on_step=lambda table, i, state, grew: i == cancel_at and builder.cancel())
+    builder.run()
+    kind, steps, frame_count = builder.queue.get_nowait()
+    assert kind == 'cancelled' and cancel_at < steps <= LOCK_STEPS < 200
+    assert frame_count == 1 + steps * SUBSTEPS
+
+def test_frame_builder_reports_errors(tmp_path):
+    builder = FrameBuilder(str(tmp_path / 'missing.pddl'), str(tmp_path / 'missing.txt'))
+    builder.run()
+    kind, message, _ = builder.queue.get_nowait()
+    assert kind == 'error' and 'missing.pddl' in message
+
+def test_stage_timings_cover_load_and_draws(tmp_path):
+    plan = tmp_path / 'plan.txt'
+    plan.write_text("(move_character loc_1_1 loc_1_2 dir_right)\n" * 3)
+    calculator = MetricsCalculator()
+    builder = FrameBuilder('pddl/problems/problem-numeric.pddl', str(plan), timer=calculator.timer)
+    builder.run()
+    assert builder.queue.get_nowait()[0] == 'done'
+    timer = calculator.timer
+    assert all(timer.samples(stage) for stage in LOAD_STAGES)
+    assert calculator.get_execution_time_ms() == round(timer.total_ms(*LOAD_STAGES))
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    renderer = Renderer(fig.subplots(), blit=True, timer=timer)
+    for k in range(len(builder.frames)):
+        renderer.draw(builder.frames[k])
+        renderer.show()
+    assert len(timer.samples('first_draw')) == 1
+    assert len(timer.samples('frame_draw')) == len(timer.samples('canvas_flush')) == len(builder.frames) - 1
+    metrics = calculator.timing_metrics()
+    assert metrics['frames_drawn'] == len(builder.frames) - 1
+    assert 0 < metrics['frame_draw_mean_ms'] <= metrics['frame_draw_p95_ms']
+
+def test_builder_reads_files_only_on_cache_misses(tmp_path):
+    plan = tmp_path / 'plan.txt'
+    plan.write_text("(move_character loc_1_1 loc_1_2 dir_right)\n" * 3 + "(move_character loc_1_2 loc_1_1 dir_left)")
+    assert list(iter_lines(str(plan), chunk_size=7)) == plan.read_text().splitlines()
+    cache = ParseCache(str(tmp_path / 'cache'))
+    for reads in (True, False):
+        timer = StageTimer()
+        builder = FrameBuilder('pddl/problems/problem-numeric.pddl', str(plan), cache=cache, timer=timer)
+        builder.run()
+        assert builder.queue.get_nowait()[0] == 'done' and builder.total == 4
+        assert bool(timer.samples('file_read')) == reads
+
+    # Reads nested in a parse are not counted as parsing too.
+    timer = StageTimer()
+    with timer.span('plan_parse'):
+        with timer.span('file_read'):
+            time.sleep(0.05)
+    assert timer.total_ms('plan_parse') < 25 <= timer.total_ms('file_read')
+
+def test_save_metrics_to_csv_widens_old_files(tmp_path):
+    csv_path = tmp_path / 'metrics.csv'
+    save_metrics_to_csv({'run_name': 'a', 'plan_length': 1}, str(csv_path))
+    save_metrics_to_csv({'run_name': 'b', 'plan_length': 2}, str(csv_path))
+    save_metrics_to_csv({'run_name': 'c', 'plan_length': 3, 'first_draw_ms': 4.5}, str(csv_path))
+    assert csv_path.read_text().splitlines() == [
+        'run_name,plan_length,first_draw_ms', 'a,1,', 'b,2,', 'c,3,4.5']
@@ -0,0 +1,55 @@
+import random
+
+from shared.actions import ActionTable
+from shared.parsing import iter_plan_actions
+from shared.timeline import StateTimeline
+from shared.world import WorldState, POSITION, SIZE, SNOW, CHARACTER
+from visualizer.core import FrameSequence, parse_problem
+
+def test_timeline_state_at_matches_replay():
+    prob = parse_problem('pddl/problems/problem-numeric.pddl')
+    world = WorldState.from_problem(prob)
+    timeline = StateTimeline(world)
+    rng = random.Random(3)
+    states = [world.copy()]
+    for _ in range(300):
+        target = rng.choice((POSITION, SIZE, SNOW, CHARACTER))
+        if target == SNOW:
+            key, value = rng.randrange(25), rng.random() < 0.5
+        elif target == CHARACTER:
+            key, value = 0, (rng.randrange(5), rng.randrange(5))
+        else:
+            key = world.ball_id(rng.choice(['ball_0', 'ball_1', 'ghost']))
+            value = (rng.randrange(5), rng.randrange(5)) if target == POSITION else rng.randrange(3)
+        timeline.record(target, key, value)
+        world.apply(target, key, value)
+        states.append(world.copy())
+    assert len(timeline) == 300
+    for version in (0, 1, 57, 150, 299, 300):
+        assert timeline.state_at(version) == states[version]
+    for version in (0, 57, 150, 300):
+        assert all(timeline.value_at(SNOW, cell, version) is states[version].get(SNOW, cell) for cell in range(25))
+    assert timeline.value_at(CHARACTER, 0, 0) == prob['character']
+
+def test_frame_sequence_jumps_to_steps():
+    prob = parse_problem('pddl/problems/problem-numeric.pddl')
+    rng = random.Random(5)
+    cells = sorted(prob['valid_locations'])
+    lines = []
+    for i in range(400):
+        a, b = rng.choice(cells), rng.choice(cells)
+        if i % 2:
+            lines.append(f"(move_character loc_{a[0] + 1}_{a[1] + 1} loc_{b[0] + 1}_{b[1] + 1} dir_right)")
+        else:
+            lines.append(f"(move_ball ball_{i % 3} loc_{a[0] + 1}_{a[1] + 1} loc_{b[0] + 1}_{b[1] + 1} "
+                         f"loc_{b[0] + 1}_{b[1] + 1} dir_right)")
+    frames = FrameSequence(prob, ActionTable(iter_plan_actions(lines)))
+    sequential = list(frames)
+    # Jump around far enough for the cursor to be rebuilt from the timeline.
+    for k in (len(frames) - 1, 3, len(frames) // 2, 0, -1):
+        assert frames[k] == sequential[k]
+    assert frames.frame_of_step(0) == 0
+    for step in (1, 2, 200, 400):
+        k = frames.frame_of_step(step)
+        assert frames.step_of_frame(k) == step
+        assert frames.step_of_frame(k - 1) == step - 1
@@ -0,0 +1,30 @@
+import numpy as np
+
+from shared.world import WorldState, POSITION, SIZE, SNOW
+from visualizer.core import parse_problem
+
+def test_world_from_problem():
+    prob = parse_problem('pddl/problems/problem-numeric.pddl')
+    world = WorldState.from_problem(prob)
+    assert world.snow.shape == (5, 5) and world.snow.dtype == np.bool_
+    assert world.character == prob['character']
+    assert dict(world.ball_map) == prob['balls']
+    assert dict(world.size_map) == prob['ball_size']
+    assert world.snow_map == prob['snow']
+    assert world.snow_map.get((9, 9), 'x') == 'x'
+
+def test_world_apply_and_copy():
+    prob = parse_problem('pddl/problems/problem-numeric.pddl')
+    world = WorldState.from_problem(prob)
+    snapshot = world.copy()
+    ghost = world.ball_id('ghost')
+    world.apply(POSITION, ghost, (0, 0))
+    world.apply(SIZE, world.ids['ball_0'], 2)
+    world.apply(SNOW, 0, False)
+    assert list(world.ball_map)[-1] == 'ghost'
+    assert world.size_map['ball_0'] == 2 and not world.has_snow(0, 0)
+    assert 'ghost' not in snapshot.ball_map and snapshot.size_map['ball_0'] == 0
+    assert snapshot.has_snow(0, 0)
+    assert snapshot != world
+    world.apply(POSITION, ghost, None)
+    assert 'ghost' not in world.ball_map